@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""AutoJoin - Join Planner.
+Decides what to do for each touching pair BEFORE changing the model:
+  - every unordered pair is handled once (A-B and B-A are the same pair),
+  - pairs that are already joined the right way are left alone,
+  - only the missing joins and the wrong join orders become operations.
+Asking Revit first is much cheaper than trying every join and catching the
+exception when it already exists (exceptions crossing from .NET into
+IronPython are slow).
+
+Pure Python: the Revit lookups are passed in as functions, so the planner
+can be tested outside Revit.
+"""
+
+
+class JoinPlan(object):
+    """The operations to run, and why the other pairs need nothing."""
+
+    def __init__(self):
+        self.joins = []          # (keeper, other, fix order after joining?)
+        self.switches = []       # (keeper, other): joined, but 'other' cuts 'keeper'
+        self.already_ok = 0      # joined, right order (or order does not matter)
+        self.duplicates = 0      # same pair seen twice
+
+    def __len__(self):
+        return len(self.joins) + len(self.switches)
+
+    def operations(self):
+        """[('join' | 'switch', keeper, other, fix order after joining?)]"""
+        return ([("join", a, b, fix) for a, b, fix in self.joins] +
+                [("switch", a, b, False) for a, b in self.switches])
+
+    def report(self, pair_count, name=None, limit=20):
+        """Text summary of the plan, with the first few operations listed."""
+        name = name or (lambda element: str(element))
+        lines = [
+            "Touching pairs:      {}".format(pair_count),
+            "  duplicates:        {}".format(self.duplicates),
+            "  already correct:   {}".format(self.already_ok),
+            "  to join:           {}".format(len(self.joins)),
+            "  to switch order:   {}".format(len(self.switches)),
+        ]
+        operations = self.operations()
+        for kind, a, b, _ in operations[:limit]:
+            lines.append("  {:<6} {} cuts {}".format(kind.upper(), name(a), name(b)))
+        if len(operations) > limit:
+            lines.append("  ... and {} more".format(len(operations) - limit))
+        return "\n".join(lines)
+
+
+def plan_joins(pairs, joined_partners, is_cutting, key):
+    """Build a JoinPlan.
+    pairs:                 (high group, element, low group, other) as from spatial_index.candidate_pairs,
+                           the element of the higher priority group first
+    joined_partners(e):    keys of the elements e is joined to (asked once per element)
+    is_cutting(a, b):      True if a cuts b (only asked for joined pairs of different groups)
+    key(e):                a hashable id of an element
+    """
+    plan = JoinPlan()
+    partners = {}
+    seen = set()
+
+    def partners_of(element):
+        k = key(element)
+        if k not in partners:
+            partners[k] = set(joined_partners(element))
+        return partners[k]
+
+    for high_group, element, low_group, other in pairs:
+        a, b = key(element), key(other)
+        if a == b:
+            continue
+        pair = (a, b) if a < b else (b, a)
+        if pair in seen:
+            plan.duplicates += 1
+            continue
+        seen.add(pair)
+
+        order_matters = high_group != low_group
+        if b not in partners_of(element):
+            plan.joins.append((element, other, order_matters))
+        elif order_matters and is_cutting(other, element):
+            plan.switches.append((element, other))
+        else:
+            plan.already_ok += 1
+    return plan
@@ -1,4 +1,18 @@
+import os
 from Autodesk.Revit.DB import *
+from spatial_index import candidate_pairs
+from join_planner import plan_joins
+from batch_executor import run_in_transactions  # extension 'lib' folder
+from element_ids import id_value
+
+# Operations per transaction: smaller = smoother progress bar, larger = less overhead
+CHUNK_SIZE = 200
+
+# Shift+Click the button for a dry run (report only, the model is not changed)
+try:
+    DRY_RUN = __shiftclick__  # provided by pyRevit
+except NameError:
+    DRY_RUN = False
 
 # --- Document / View handles ---
 uiapp = __revit__  # provided by pyRevit
@@ -11,38 +25,47 @@ view  = doc.ActiveView
 def elements_in_view_by_category(categories):
     return list(FilteredElementCollector(doc, view.Id).OfCategory(categories).WhereElementIsNotElementType().ToElements())
 	
-# 2. create outline from element's bounding box
-def create_outline(ele):
+# 2. read element's bounding box once, as plain numbers (min x, y, z, max x, y, z)
+def read_box(ele):
     try:
         bb = ele.get_BoundingBox(view)
         if bb and bb.Min and bb.Max:
-            return Outline(bb.Min, bb.Max)
+            return (bb.Min.X, bb.Min.Y, bb.Min.Z, bb.Max.X, bb.Max.Y, bb.Max.Z)
     except:
         pass
     return None
-    
-# 3. checking by bbox
-def checking_by_bbox(category, outline):
-    if outline is None:
-        return []
 
-    bb_filter = BoundingBoxIntersectsFilter(outline, False)
-    return list(FilteredElementCollector(doc, view.Id).OfCategory(category).WherePasses(bb_filter).WhereElementIsNotElementType().ToElements())
-
-# 4. try join
-def try_join(a, b):
-    try:
-        JoinGeometryUtils.JoinGeometry(doc, a, b)
-    except:
-        pass
-
-# 5. try switch order
-def try_switch_order(keeper, cutter):
-    try:
-        if JoinGeometryUtils.IsCuttingElementInJoin(doc, cutter, keeper):
-            JoinGeometryUtils.SwitchJoinOrder(doc, keeper, cutter)
-    except:
-        pass
+# 3. [(element, box)] of the elements that have a bounding box
+def boxes_of(elements):
+    boxes = []
+    for ele in elements:
+        box = read_box(ele)
+        if box is not None:
+            boxes.append((ele, box))
+    return boxes
+
+# 4. element id as a plain number
+def key_of(ele):
+    return id_value(ele.Id)
+
+# 5. ids of the elements 'ele' is already joined to (one call per element, no exceptions)
+def joined_partners(ele):
+    return [id_value(i) for i in JoinGeometryUtils.GetJoinedElements(doc, ele)]
+
+# 6. does 'a' cut 'b'? (only asked for pairs that are already joined)
+def is_cutting(a, b):
+    return JoinGeometryUtils.IsCuttingElementInJoin(doc, a, b)
+
+# 7. run one planned join / switch (an error counts as a failed operation)
+def apply_operation(operation):
+    kind, keeper, other, fix_order = operation
+    if kind == "join":
+        JoinGeometryUtils.JoinGeometry(doc, keeper, other)
+        # Revit picks the cutting element itself: flip it if 'other' won
+        if fix_order and JoinGeometryUtils.IsCuttingElementInJoin(doc, other, keeper):
+            JoinGeometryUtils.SwitchJoinOrder(doc, keeper, other)
+    else:
+        JoinGeometryUtils.SwitchJoinOrder(doc, keeper, other)
 
 
 # ========= Main Logic =========
@@ -60,45 +83,31 @@ def main():
     # 2. Collect elements per category
     buckets = [elements_in_view_by_category(bic) for bic in priority]
 
-    # 3.1 Start one transaction for the whole pass
-    t = Transaction(doc, "Auto-Join (Beginner)")
-    t.Start()
-
-    # 3.2 Walk the priority list downwards (from higher priority to lower priority)
-    # For each element, we join with:
-    #   1) same-category neighbors, then
-    #   2) every LATER category (lower priority) to enforce dominance
-    for group_number, p_cat in enumerate(priority):
-
-        # 3.2.1 Get the current group of elements
-        current_group = buckets[group_number]
-
-        # 3.2.2 Process each element in the current group
-        for ele in current_group:
-            outline = create_outline(ele)
-            if outline is None:
-                continue
-
-            # 1) self-join (same category neighbors)
-            for other in checking_by_bbox(p_cat, outline):
-                if other.Id == ele.Id:
-                    continue
-                # Attempt join; if join exists or invalid, it's fine
-                try_join(ele, other)
-                # If order is wrong (other is cutting ele), flip to make 'ele' the keeper
-                try_switch_order(ele, other)
-
-            # 2) join with every *lower-priority* category to propagate dominance
-            for lower_group_number in range(group_number + 1, len(priority)):
-                lower_cat = priority[lower_group_number]
-                for other in checking_by_bbox(lower_cat, outline):
-                    if other.Id == ele.Id:
-                        continue
-                    try_join(ele, other)
-                    try_switch_order(ele, other)
-
-    t.Commit()
+    # 3. Find every touching pair in one sweep (spatial grid, see spatial_index.py)
+    #    instead of one bounding box search per element and category.
+    #    Each pair comes once, higher priority element first.
+    pairs = list(candidate_pairs([boxes_of(bucket) for bucket in buckets]))
+
+    # 4. Plan first: skip duplicates and pairs that are already joined the right way
+    plan = plan_joins(pairs, joined_partners, is_cutting, key_of)
+    print(plan.report(len(pairs), name=lambda ele: "{} {}".format(ele.Category.Name, ele.Id)))
+
+    # Shift+Click = dry run: only show the plan
+    if DRY_RUN or not len(plan):
+        return
+
+    # 5. Only the planned operations: the higher priority element ends up cutting.
+    #    Committed in chunks (progress bar + Cancel), still one step in Undo.
+    result = run_in_transactions(doc, "Auto-Join (Beginner)", plan.operations(), apply_operation,
+                                 chunk_size=CHUNK_SIZE,
+                                 timings_path=os.path.join(os.path.dirname(__file__), ".chunk_timings.jsonl"))
+    print(result.summary())
+    if result.failed:
+        print("Failed operations: usually the boxes touch but the solids do not.")
 
 # ========= Run =========
 main()
-print("Done! Processed Columns -> Beams -> Floors -> Walls in the Active View.")
\ No newline at end of file
+if DRY_RUN:
+    print("Dry run: nothing was changed. Click without Shift to apply.")
+else:
+    print("Done! Processed Columns -> Beams -> Floors -> Walls in the Active View.")
\ No newline at end of file
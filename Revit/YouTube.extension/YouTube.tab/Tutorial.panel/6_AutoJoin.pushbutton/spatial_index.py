@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+"""AutoJoin - Spatial Index for finding touching elements.
+Instead of asking Revit "what touches this element?" once per element
+(one FilteredElementCollector each), we read every bounding box once and
+drop them into a uniform 3D grid of cells. Only boxes sharing a cell can
+touch, so all touching pairs are found in one sweep over the cells.
+
+Pure Python (IronPython 2.7 / CPython 3), no Revit needed.
+tests/test_spatial_index.py checks that the grid finds exactly the pairs of
+brute force. Run the benchmark (grid vs brute force timing on synthetic boxes):
+    python spatial_index.py --benchmark
+"""
+
+import math
+import time
+import random
+
+MAX_CELLS_PER_AXIS = 64  # Boxes spanning more cells (e.g. a site slab) are checked against everything
+
+# A box is (min_x, min_y, min_z, max_x, max_y, max_z)
+
+
+def boxes_touch(a, b, tolerance=0.0):
+    """True if two boxes overlap or touch (like Revit's BoundingBoxIntersectsFilter)."""
+    return (a[0] <= b[3] + tolerance and b[0] <= a[3] + tolerance and
+            a[1] <= b[4] + tolerance and b[1] <= a[4] + tolerance and
+            a[2] <= b[5] + tolerance and b[2] <= a[5] + tolerance)
+
+
+def suggest_cell_size(boxes):
+    """About the size of a typical element: the median of the boxes' largest side."""
+    sizes = sorted(max(b[3] - b[0], b[4] - b[1], b[5] - b[2]) for b in boxes)
+    if not sizes:
+        return 1.0
+    return max(sizes[len(sizes) // 2], 1e-6)
+
+
+class UniformGrid(object):
+    """Boxes bucketed by the grid cells they overlap: {(i, j, k): [entry, ...]}.
+    An entry is any tuple whose first item is a unique number.
+    """
+
+    def __init__(self, cell_size, tolerance=0.0):
+        self.cell_size = float(cell_size)
+        self.tolerance = tolerance
+        self.cells = {}
+        self.entries = []
+        self.oversized = []
+
+    def _range(self, low, high):
+        first = int(math.floor((low - self.tolerance) / self.cell_size))
+        last = int(math.floor((high + self.tolerance) / self.cell_size))
+        return first, last
+
+    def insert(self, entry, box):
+        self.entries.append(entry)
+        x0, x1 = self._range(box[0], box[3])
+        y0, y1 = self._range(box[1], box[4])
+        z0, z1 = self._range(box[2], box[5])
+        if max(x1 - x0, y1 - y0, z1 - z0) >= MAX_CELLS_PER_AXIS:
+            self.oversized.append(entry)
+            return
+        cells = self.cells
+        for i in range(x0, x1 + 1):
+            for j in range(y0, y1 + 1):
+                for k in range(z0, z1 + 1):
+                    cell = cells.get((i, j, k))
+                    if cell is None:
+                        cells[(i, j, k)] = [entry]
+                    else:
+                        cell.append(entry)
+
+    def pairs(self):
+        """Every pair of entries sharing at least one cell, each pair once."""
+        seen = set()
+        for cell in self.cells.values():
+            n = len(cell)
+            for a in range(n):
+                first = cell[a]
+                for b in range(a + 1, n):
+                    second = cell[b]
+                    key = (first[0], second[0]) if first[0] < second[0] else (second[0], first[0])
+                    if key not in seen:
+                        seen.add(key)
+                        yield first, second
+        big_ids = set(entry[0] for entry in self.oversized)
+        for big in self.oversized:
+            for other in self.entries:
+                if other[0] not in big_ids or other[0] > big[0]:
+                    yield big, other
+
+
+def candidate_pairs(groups, tolerance=0.0, cell_size=None):
+    """All touching pairs across priority-ordered groups of boxes, in one sweep.
+    groups: [[(key, box), ...], ...], highest priority group first.
+    Yields (higher group index, key, lower group index, other key) once per
+    touching pair. Within one group the pair order is arbitrary.
+    """
+    boxes = [box for group in groups for _, box in group]
+    grid = UniformGrid(cell_size or suggest_cell_size(boxes), tolerance)
+    serial = 0
+    for group_index, group in enumerate(groups):
+        for key, box in group:
+            # (serial, group, key, box): the serial number identifies the entry in every cell
+            grid.insert((serial, group_index, key, box), box)
+            serial += 1
+
+    for first, second in grid.pairs():
+        if not boxes_touch(first[3], second[3], tolerance):
+            continue
+        if second[1] < first[1]:
+            first, second = second, first
+        yield first[1], first[2], second[1], second[2]
+
+
+def brute_force_pairs(groups, tolerance=0.0):
+    """Reference result: test every box against every other box (slow)."""
+    flat = [(g, key, box) for g, group in enumerate(groups) for key, box in group]
+    for a in range(len(flat)):
+        for b in range(a + 1, len(flat)):
+            if boxes_touch(flat[a][2], flat[b][2], tolerance):
+                yield flat[a][0], flat[a][1], flat[b][0], flat[b][1]
+
+
+# --- [ BENCHMARK ] ---
+
+def synthetic_floor(columns=20, rng=None):
+    """A structural grid: columns, beams between them, a slab per bay and perimeter walls."""
+    rng = rng or random.Random(7)
+    span, height = 8.0, 4.0
+    cols, beams, floors, walls = [], [], [], []
+    key = 0
+    for i in range(columns):
+        for j in range(columns):
+            x, y = i * span, j * span
+            key += 1
+            cols.append((key, (x - 0.3, y - 0.3, 0.0, x + 0.3, y + 0.3, height)))
+            if i + 1 < columns:
+                key += 1
+                beams.append((key, (x, y - 0.15, height - 0.6, x + span, y + 0.15, height)))
+            if j + 1 < columns:
+                key += 1
+                beams.append((key, (x - 0.15, y, height - 0.6, x + 0.15, y + span, height)))
+            if i + 1 < columns and j + 1 < columns:
+                key += 1
+                floors.append((key, (x, y, height - 0.25, x + span, y + span, height)))
+    edge = (columns - 1) * span
+    for i in range(columns - 1):
+        for x0, y0, x1, y1 in ((i * span, 0, (i + 1) * span, 0.2), (i * span, edge - 0.2, (i + 1) * span, edge),
+                               (0, i * span, 0.2, (i + 1) * span), (edge - 0.2, i * span, edge, (i + 1) * span)):
+            key += 1
+            jitter = rng.uniform(-0.01, 0.01)
+            walls.append((key, (x0 + jitter, y0, 0.0, x1 + jitter, y1, height - 0.25)))
+    return [cols, beams, floors, walls]
+
+
+def benchmark(columns=20, check=True):
+    groups = synthetic_floor(columns)
+    total = sum(len(g) for g in groups)
+    print("Synthetic floor: {} boxes ({} columns, {} beams, {} floors, {} walls)".format(
+        total, *[len(g) for g in groups]))
+
+    start = time.time()
+    fast = list(candidate_pairs(groups))
+    grid_s = time.time() - start
+    print("Grid:        {} pairs in {:.3f}s".format(len(fast), grid_s))
+
+    if check:
+        start = time.time()
+        slow = list(brute_force_pairs(groups))
+        brute_s = time.time() - start
+        print("Brute force: {} pairs in {:.3f}s  ({:.0f}x slower)".format(
+            len(slow), brute_s, brute_s / grid_s if grid_s else 0.0))
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Spatial index for AutoJoin candidate pairs.")
+    parser.add_argument("--benchmark", action="store_true", help="compare the grid with brute force on synthetic boxes")
+    parser.add_argument("--columns", type=int, default=20, help="columns per side of the synthetic floor")
+    parser.add_argument("--no-check", action="store_true", help="skip the (slow) brute force timing")
+    args = parser.parse_args()
+    if args.benchmark:
+        benchmark(args.columns, check=not args.no_check)
+    else:
+        parser.print_help()
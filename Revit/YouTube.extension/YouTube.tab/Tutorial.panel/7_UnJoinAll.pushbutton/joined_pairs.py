@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+"""UnJoinAll - Finding the joins to undo.
+Instead of searching every element's bounding box neighbours and trying to
+unjoin each of them (most were never joined), ask every element for the
+elements it is REALLY joined to. The work then grows with the number of
+joins, not with the number of neighbours.
+
+Pure Python: the Revit lookup is passed in as a function, so it can be
+tested outside Revit.
+"""
+
+
+class JoinedPairs(object):
+    def __init__(self):
+        self.pairs = []        # (element, other element), each join once
+        self.outside = 0       # joins to elements that are not being processed
+        self.elements_with_joins = 0
+
+
+def find_joined_pairs(elements, joined_partners, key):
+    """Every join between two of the given elements, once.
+    joined_partners(e): keys of the elements e is joined to (asked once per element)
+    key(e):             a hashable, sortable id of an element
+    """
+    by_key = dict((key(e), e) for e in elements)
+    result = JoinedPairs()
+    for k, element in by_key.items():
+        partners = list(joined_partners(element))
+        if partners:
+            result.elements_with_joins += 1
+        for other in partners:
+            if other not in by_key:
+                result.outside += 1  # e.g. joined to a wall hidden in this view
+            elif k < other:          # the other side will report the same join: keep one
+                result.pairs.append((element, by_key[other]))
+    return result
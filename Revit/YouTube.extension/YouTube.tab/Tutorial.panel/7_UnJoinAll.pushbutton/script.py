@@ -1,4 +1,11 @@
+import os
 from pyrevit import revit, DB
+from batch_executor import run_in_transactions  # extension 'lib' folder
+from element_ids import id_value
+from joined_pairs import find_joined_pairs
+
+# Unjoins per transaction: smaller = smoother progress bar, larger = less overhead
+CHUNK_SIZE = 200
 
 # 1 Define categories to process
 categories = [
@@ -8,28 +15,28 @@ categories = [
     DB.BuiltInCategory.OST_Walls
 ]
 
-# 2 Start transaction
-with revit.Transaction("Unjoin Elements"):
-    for cate in categories:
-        elems = DB.FilteredElementCollector(revit.doc, revit.active_view.Id)\
-                  .OfCategory(cate)\
-                  .WhereElementIsNotElementType()\
-                  .ToElements()
+# 2 Collect the elements of these categories in the active view
+elements = []
+for cate in categories:
+    elements.extend(DB.FilteredElementCollector(revit.doc, revit.active_view.Id)
+                    .OfCategory(cate)
+                    .WhereElementIsNotElementType()
+                    .ToElements())
+
+# 3 Ask each element what it is really joined to (reading only, no transaction needed).
+#   Every join is found once, so only real joins get unjoined.
+def joined_partners(ele):
+    return [id_value(i) for i in DB.JoinGeometryUtils.GetJoinedElements(revit.doc, ele)]
 
-        for ele in elems:
-            outline = DB.Outline(
-                ele.get_BoundingBox(revit.active_view).Min,
-                ele.get_BoundingBox(revit.active_view).Max)
-            bbFilter = DB.BoundingBoxIntersectsFilter(outline, False)
+found = find_joined_pairs(elements, joined_partners, lambda ele: id_value(ele.Id))
+print("{} elements checked, {} have joins: {} joins to undo ({} joins to other elements are kept).".format(
+    len(elements), found.elements_with_joins, len(found.pairs), found.outside))
 
-            # 3 Find and unjoin intersected elements
-            for other_cate in categories:
-                for target in DB.FilteredElementCollector(revit.doc, revit.active_view.Id)\
-                                 .OfCategory(other_cate)\
-                                 .WherePasses(bbFilter)\
-                                 .ToElements():
-                    try:
-                        DB.JoinGeometryUtils.UnjoinGeometry(revit.doc, ele, target)
-                    except:
-                        pass
+# 4 Unjoin them, committed in chunks (progress bar + Cancel), still one step in Undo
+def unjoin(pair):
+    DB.JoinGeometryUtils.UnjoinGeometry(revit.doc, pair[0], pair[1])
 
+if found.pairs:
+    result = run_in_transactions(revit.doc, "Unjoin Elements", found.pairs, unjoin, chunk_size=CHUNK_SIZE,
+                                 timings_path=os.path.join(os.path.dirname(__file__), ".chunk_timings.jsonl"))
+    print(result.summary())
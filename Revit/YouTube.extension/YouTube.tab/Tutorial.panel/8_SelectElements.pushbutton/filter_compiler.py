@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""SelectElements - Filter Compiler.
+Turns the filters of the window into ONE native Revit filter:
+    (category AND parameter = value)  AND / OR  (category AND parameter = value)
+built from ElementParameterFilter, LogicalAndFilter and LogicalOrFilter.
+Revit then does the matching inside the collector and only the ids of the
+matching elements come back to Python: no element is converted or read.
+
+A filter that cannot be pushed to Revit (e.g. an ElementId parameter, whose
+drop-down shows a name rather than the stored id) is answered from the
+parameter index instead (see parameter_index.py).
+
+Text is compared ignoring case: Revit 2023+ filter rules always do, so
+older versions (and the parameter index) are asked to do the same.
+
+rule_groups() and rule_value() are pure Python, the rest needs Revit.
+"""
+
+try:
+    from pyrevit import DB
+    from System.Collections.Generic import List
+except ImportError:
+    DB = None  # outside Revit (tests): only the pure Python part works
+from element_ids import id_value  # extension 'lib' folder
+
+DOUBLE_TOLERANCE = 1e-6  # Lengths are stored in feet: far below anything visible
+
+
+def rule_value(storage_type, text):
+    """The value a rule compares with, parsed from the drop-down text, or None
+    if this parameter cannot be pushed down."""
+    storage = str(storage_type)
+    try:
+        if storage == "String":
+            return text
+        if storage == "Integer":
+            return int(text)
+        if storage == "Double":
+            return float(text)
+    except ValueError:
+        pass
+    return None
+
+
+def rule_groups(category_keys, parameter_name, value_text, definitions_of):
+    """[(parameter id, storage type, value, [category keys])]: one rule per
+    parameter, shared by the categories that have it. A name with several ids
+    (e.g. a shared and a project parameter) gives one rule per id, ORed later.
+    None if a value cannot be pushed down; empty if no category has the name."""
+    groups = {}
+    for category_key in category_keys:
+        for parameter_id, storage_type in definitions_of(category_key, parameter_name):
+            value = rule_value(storage_type, value_text)
+            if value is None:
+                return None
+            key = (parameter_id, str(storage_type))
+            groups.setdefault(key, (parameter_id, storage_type, value, []))[3].append(category_key)
+    return [groups[key] for key in sorted(groups)]
+
+
+def equals_rule(parameter_id, storage_type, value):
+    factory = DB.ParameterFilterRuleFactory
+    if storage_type == DB.StorageType.String:
+        try:
+            return factory.CreateEqualsRule(parameter_id, value)         # Revit 2023+: ignores case
+        except TypeError:
+            return factory.CreateEqualsRule(parameter_id, value, False)  # older versions: ignore case too
+    if storage_type == DB.StorageType.Double:
+        return factory.CreateEqualsRule(parameter_id, value, DOUBLE_TOLERANCE)
+    return factory.CreateEqualsRule(parameter_id, value)
+
+
+def combine(filters, use_or):
+    if len(filters) == 1:
+        return filters[0]
+    filter_list = List[DB.ElementFilter](filters)
+    return DB.LogicalOrFilter(filter_list) if use_or else DB.LogicalAndFilter(filter_list)
+
+
+class FilterCompiler(object):
+    """Compiles (category types, parameter name, value) clauses for one document.
+    definitions_of(category key, parameter name) returns the [(id number, storage type)]
+    of the parameters with that name in the category (see document_metadata.py):
+    no element has to be opened to build a rule.
+    """
+
+    def __init__(self, doc, definitions_of):
+        self.doc = doc
+        self.definitions_of = definitions_of
+
+    def compile_clause(self, category_types, parameter_name, value_text):
+        """ElementFilter for 'parameter = value' in these categories, or None if it
+        cannot be pushed down (or no element has the parameter at all)."""
+        by_key = dict((int(category_type), category_type) for category_type in category_types)
+        groups = rule_groups([int(c) for c in category_types], parameter_name, value_text, self.definitions_of)
+        if not groups:
+            return None
+
+        filters = []
+        for parameter_id, storage_type, value, category_keys in groups:
+            categories = [by_key[key] for key in category_keys]
+            category_filter = DB.ElementMulticategoryFilter(List[DB.BuiltInCategory](categories))
+            rule = equals_rule(DB.ElementId(parameter_id), storage_type, value)
+            filters.append(DB.LogicalAndFilter(category_filter, DB.ElementParameterFilter(rule)))
+        return combine(filters, use_or=True)
+
+    def element_ids(self, element_filter):
+        """Ids (numbers) of the instances passing the filter, matched inside Revit."""
+        collector = DB.FilteredElementCollector(self.doc).WhereElementIsNotElementType().WherePasses(element_filter)
+        return set(id_value(i) for i in collector.ToElementIds())
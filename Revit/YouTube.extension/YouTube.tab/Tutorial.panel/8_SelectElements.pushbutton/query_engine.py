@@ -0,0 +1,395 @@
+# -*- coding: utf-8 -*-
+"""SelectElements - Query Engine.
+Any number of conditions instead of two fixed filters, e.g.
+
+    Mark = "A-101" OR ("Base Constraint" = "Level 1" AND NOT Comments contains temp)
+    Width >= 0.5 AND Width < 1          (feet: see below)
+
+  - parse():      query text -> a small tree (Clause / And / Or / Not)
+  - QueryPlanner: evaluates the tree on element-id sets. In an AND the most
+    selective condition runs first (estimated from the value counts, without
+    matching anything), and once few elements are left the other conditions
+    only check those elements, stopping as soon as nothing is left.
+
+Operators: =  !=  <  <=  >  >=  contains (case-insensitive).
+Names or values with spaces go in double quotes. <, <=, > and >= compare
+numbers (elements whose value is not a number never match). = and != compare
+numbers as numbers, to the precision typed: Width = 1 matches a stored 1.0,
+Width = 0.656 matches 0.656167979 (anything shown as 0.656). Other values
+are compared as text.
+Numbers are compared as the parameter index stores them, i.e. in Revit's
+internal units, not the project's display units: lengths in feet (a 200 mm
+wall has Width 0.656), areas in square feet, angles in radians.
+
+Pure Python (IronPython 2.7 / CPython 3). An element store provides the data:
+CategoryStore reads the parameter index, FakeElementStore is for testing.
+"""
+
+import re
+
+OPERATORS = ("=", "!=", "<", "<=", ">", ">=", "contains")
+NUMBER_TOLERANCE = 1e-6  # Same as filter_compiler.DOUBLE_TOLERANCE, for whole numbers
+
+
+class QueryError(Exception):
+    pass
+
+
+# --- [ TREE ] ---
+
+class Clause(object):
+    def __init__(self, name, op, value):
+        if op not in OPERATORS:
+            raise QueryError("Unknown operator: {}".format(op))
+        self.name, self.op, self.value = name, op, value
+        self._number = _number(value)
+        self._tolerance = _tolerance(value) if self._number is not None else None
+
+    @property
+    def numeric(self):
+        """True if the value is a number (= and != then compare numbers, not text)."""
+        return self._number is not None
+
+    def equals(self, value):
+        """Is a (present) parameter value equal to the clause's value?"""
+        if self._number is not None:
+            number = _number(value)
+            if number is not None:
+                return abs(number - self._number) <= self._tolerance
+        return value == self.value
+
+    def test(self, value):
+        """Does one parameter value (text, or None if missing) satisfy the condition?"""
+        if value is None:
+            return self.op == "!="
+        if self.op == "=":
+            return self.equals(value)
+        if self.op == "!=":
+            return not self.equals(value)
+        if self.op == "contains":
+            return self.value.lower() in value.lower()
+        number = _number(value)
+        if number is None or self._number is None:
+            return False
+        if self.op == "<":
+            return number < self._number
+        if self.op == "<=":
+            return number <= self._number
+        if self.op == ">":
+            return number > self._number
+        return number >= self._number
+
+    def __repr__(self):
+        return u'{} {} "{}"'.format(self.name, self.op, self.value)
+
+
+class And(object):
+    def __init__(self, children):
+        self.children = list(children)
+
+    def __repr__(self):
+        return "(" + " AND ".join(repr(c) for c in self.children) + ")"
+
+
+class Or(object):
+    def __init__(self, children):
+        self.children = list(children)
+
+    def __repr__(self):
+        return "(" + " OR ".join(repr(c) for c in self.children) + ")"
+
+
+class Not(object):
+    def __init__(self, child):
+        self.child = child
+
+    def __repr__(self):
+        return "NOT " + repr(self.child)
+
+
+def _number(text):
+    try:
+        return float(text)
+    except (TypeError, ValueError):
+        return None
+
+
+def _tolerance(text):
+    """Half a unit of the last decimal typed: '0.656' matches [0.6555, 0.6565].
+    Whole numbers (and exponents) match within NUMBER_TOLERANCE."""
+    text = text.strip().lower()
+    if "." not in text or "e" in text:
+        return NUMBER_TOLERANCE
+    decimals = len(text.split(".", 1)[1])
+    return max(NUMBER_TOLERANCE, 0.5 * 10 ** -decimals + 1e-12)  # + float rounding
+
+
+# --- [ PARSER ] ---
+
+_TOKEN_RE = re.compile(r'\s*(?:(")((?:[^"\\]|\\.)*)"|(<=|>=|!=|=|<|>|\(|\))|([^\s()<>=!"]+))', re.UNICODE)
+_KEYWORDS = ("AND", "OR", "NOT", "CONTAINS")
+
+
+def tokenize(text):
+    """-> [(kind, text)], kind: 'str' (quoted), 'op', 'word', 'kw'"""
+    tokens, position = [], 0
+    text = text.strip()
+    while position < len(text):
+        match = _TOKEN_RE.match(text, position)
+        if not match or match.end() == position:
+            raise QueryError("Cannot read the query at: {}".format(text[position:position + 20]))
+        position = match.end()
+        if match.group(1):
+            tokens.append(("str", match.group(2).replace('\\"', '"')))
+        elif match.group(3):
+            tokens.append(("op", match.group(3)))
+        elif match.group(4).upper() in _KEYWORDS:
+            tokens.append(("kw", match.group(4).upper()))
+        else:
+            tokens.append(("word", match.group(4)))
+    return tokens
+
+
+class _Parser(object):
+    # query  := or
+    # or     := and ("OR" and)*
+    # and    := unary ("AND" unary)*
+    # unary  := "NOT" unary | "(" or ")" | clause
+    # clause := name operator value
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.position = 0
+
+    def peek(self):
+        return self.tokens[self.position] if self.position < len(self.tokens) else (None, None)
+
+    def take(self):
+        token = self.peek()
+        if token[0] is None:
+            raise QueryError("The query ends too early.")
+        self.position += 1
+        return token
+
+    def parse(self):
+        node = self.parse_or()
+        if self.position != len(self.tokens):
+            raise QueryError("Unexpected '{}'.".format(self.peek()[1]))
+        return node
+
+    def parse_or(self):
+        children = [self.parse_and()]
+        while self.peek() == ("kw", "OR"):
+            self.take()
+            children.append(self.parse_and())
+        return children[0] if len(children) == 1 else Or(children)
+
+    def parse_and(self):
+        children = [self.parse_unary()]
+        while self.peek() == ("kw", "AND"):
+            self.take()
+            children.append(self.parse_unary())
+        return children[0] if len(children) == 1 else And(children)
+
+    def parse_unary(self):
+        kind, text = self.peek()
+        if (kind, text) == ("kw", "NOT"):
+            self.take()
+            return Not(self.parse_unary())
+        if (kind, text) == ("op", "("):
+            self.take()
+            node = self.parse_or()
+            if self.take() != ("op", ")"):
+                raise QueryError("Missing ')'.")
+            return node
+        return self.parse_clause()
+
+    def parse_clause(self):
+        kind, name = self.take()
+        if kind not in ("word", "str"):
+            raise QueryError("Expected a parameter name, got '{}'.".format(name))
+        kind, op = self.take()
+        if kind == "kw" and op == "CONTAINS":
+            op = "contains"
+        elif kind != "op" or op in ("(", ")"):
+            raise QueryError("Expected an operator after '{}'.".format(name))
+        kind, value = self.take()
+        if kind not in ("word", "str"):
+            raise QueryError("Expected a value after '{} {}'.".format(name, op))
+        return Clause(name, op, value)
+
+
+def parse(text):
+    """Query text -> tree (raises QueryError with a readable message)."""
+    tokens = tokenize(text)
+    if not tokens:
+        raise QueryError("The query is empty.")
+    return _Parser(tokens).parse()
+
+
+# --- [ ELEMENT STORES ] ---
+# ids()              -> set of every element id
+# value_map(name)    -> {value: set(ids)} of one parameter
+# value_counts(name) -> {value: number of ids} of one parameter (no sets copied)
+# value(id, name)    -> the element's value, or None
+
+class FakeElementStore(object):
+    """Elements as {id: {parameter name: value}}, for testing."""
+
+    def __init__(self, elements):
+        self.elements = elements
+
+    def ids(self):
+        return set(self.elements)
+
+    def value_map(self, name):
+        values = {}
+        for element_id, params in self.elements.items():
+            if name in params:
+                values.setdefault(params[name], set()).add(element_id)
+        return values
+
+    def value_counts(self, name):
+        return dict((value, len(ids)) for value, ids in self.value_map(name).items())
+
+    def value(self, element_id, name):
+        return self.elements.get(element_id, {}).get(name)
+
+
+class CategoryStore(object):
+    """Some categories of a parameter_index.ParameterIndex."""
+
+    def __init__(self, index, category_keys):
+        self.index = index
+        self.category_keys = list(category_keys)
+
+    def ids(self):
+        category_keys = set(self.category_keys)
+        return set(i for i, (category, _) in self.index.elements.items() if category in category_keys)
+
+    def value_map(self, name):
+        values = {}
+        for category in self.category_keys:
+            for value, ids in self.index.categories.get(category, {}).get(name, {}).items():
+                values.setdefault(value, set()).update(ids)
+        return values
+
+    def value_counts(self, name):
+        counts = {}
+        for category in self.category_keys:
+            for value, ids in self.index.categories.get(category, {}).get(name, {}).items():
+                counts[value] = counts.get(value, 0) + len(ids)
+        return counts
+
+    def value(self, element_id, name):
+        entry = self.index.elements.get(element_id)
+        return entry[1].get(name) if entry else None
+
+
+# --- [ PLANNER ] ---
+
+class QueryPlanner(object):
+    """Evaluates a query tree on a store, most selective conditions first."""
+
+    def __init__(self, store):
+        self.store = store
+        self._universe = None
+        self._matches = {}    # clause -> matching ids (each clause is looked up once)
+        self._counts = {}     # parameter name -> {value: number of elements}
+        self._estimates = {}  # clause -> estimated number of matches
+
+    def universe(self):
+        if self._universe is None:
+            self._universe = self.store.ids()
+        return self._universe
+
+    def matches(self, clause):
+        """Ids matching a clause, from the distinct values (not element by element)."""
+        key = (clause.name, clause.op, clause.value)
+        if key not in self._matches:
+            found = set()
+            if clause.op == "=" and not clause.numeric:
+                # Text: one dictionary lookup
+                found = set(self.store.value_map(clause.name).get(clause.value, ()))
+            else:
+                for value, ids in self.store.value_map(clause.name).items():
+                    if clause.test(value):
+                        found.update(ids)
+                if clause.op == "!=":
+                    # elements without the parameter count as 'different' too
+                    has_param = set()
+                    for ids in self.store.value_map(clause.name).values():
+                        has_param.update(ids)
+                    found.update(self.universe() - has_param)
+            self._matches[key] = found
+        return self._matches[key]
+
+    def value_counts(self, name):
+        if name not in self._counts:
+            self._counts[name] = self.store.value_counts(name)
+        return self._counts[name]
+
+    def estimate(self, node):
+        """Expected number of matching elements (smaller = run first), counted from
+        the distinct values of each parameter: no id set is built or matched."""
+        if isinstance(node, Clause):
+            key = (node.name, node.op, node.value)
+            if key not in self._estimates:
+                counts = self.value_counts(node.name)
+                if node.op in ("=", "!=") and not node.numeric:
+                    count = counts.get(node.value, 0)
+                elif node.op in ("=", "!="):
+                    count = sum(n for value, n in counts.items() if node.equals(value))
+                else:
+                    count = sum(n for value, n in counts.items() if node.test(value))
+                if node.op == "!=":
+                    count = len(self.universe()) - count
+                self._estimates[key] = count
+            return self._estimates[key]
+        if isinstance(node, And):
+            return min(self.estimate(c) for c in node.children)
+        if isinstance(node, Or):
+            return min(len(self.universe()), sum(self.estimate(c) for c in node.children))
+        return len(self.universe()) - self.estimate(node.child)
+
+    def evaluate(self, node, candidates=None):
+        """Ids matching the node, limited to candidates (a set) when given."""
+        if isinstance(node, Clause):
+            if candidates is not None and len(candidates) < self.estimate(node):
+                # Fewer elements left than would match: check just those, one by one
+                return set(i for i in candidates if node.test(self.store.value(i, node.name)))
+            found = self.matches(node)
+            return found if candidates is None else candidates & found
+        if isinstance(node, And):
+            result = candidates
+            for child in sorted(node.children, key=self.estimate):
+                result = self.evaluate(child, result)
+                if not result:
+                    return set()  # nothing left: skip the other conditions
+            return result
+        if isinstance(node, Or):
+            result = set()
+            for child in node.children:
+                remaining = None if candidates is None else candidates - result
+                if remaining is not None and not remaining:
+                    break
+                result |= self.evaluate(child, remaining)
+            return result
+        base = self.universe() if candidates is None else candidates
+        return base - self.evaluate(node.child, base)
+
+    def explain(self, node, depth=0):
+        """The plan as text: conditions in the order they run, with estimates."""
+        pad = "  " * depth
+        if isinstance(node, Clause):
+            return "{}{!r}  (~{} elements)".format(pad, node, self.estimate(node))
+        if isinstance(node, Not):
+            return "{}NOT\n{}".format(pad, self.explain(node.child, depth + 1))
+        children = sorted(node.children, key=self.estimate) if isinstance(node, And) else node.children
+        label = "AND (most selective first)" if isinstance(node, And) else "OR"
+        return "\n".join([pad + label] + [self.explain(c, depth + 1) for c in children])
+
+
+def run_query(text, store):
+    """Parse and evaluate: returns the set of matching element ids."""
+    return QueryPlanner(store).evaluate(parse(text))
@@ -2,6 +2,12 @@ from pyrevit import revit, DB, script
 import wpf
 from System import Windows
 from System.Collections.Generic import List
+from parameter_index import session_index, document_key  # extension 'lib' folder
+from document_metadata import DocumentMetadata
+import session_cache
+from element_ids import id_value
+from filter_compiler import FilterCompiler, combine
+from query_engine import QueryPlanner, CategoryStore, QueryError, parse
 
 # Get document handles
 uidoc = revit.uidoc
@@ -20,10 +26,22 @@ ALLOWED_CATEGORIES = [
 ]
 
 
-def get_category_name(category_type):
-    """Get category name from BuiltInCategory"""
-    category = DB.Category.GetCategory(doc, category_type)
-    return category.Name if category else str(category_type)
+def get_document_metadata():
+    """Category names, element counts and parameter definitions of this document.
+    Read from Revit once per session; counts again only after the model changed."""
+    metadata = session_cache.get(document_key(doc), "metadata", DocumentMetadata)
+    if not metadata.loaded:
+        for category_type in ALLOWED_CATEGORIES:
+            category = DB.Category.GetCategory(doc, category_type)
+            if category:
+                metadata.add_category(category_type, category.Name)
+    if metadata.counts_stale:
+        counts = {}
+        for category_type in metadata.category_names:
+            collector = DB.FilteredElementCollector(doc).OfCategory(category_type).WhereElementIsNotElementType()
+            counts[category_type] = collector.GetElementCount()
+        metadata.set_counts(counts)
+    return metadata
 
 
 def get_parameter_value_string(param):
@@ -38,87 +56,102 @@ def get_parameter_value_string(param):
         return param.AsValueString() or ""
 
 
-def load_parameters_for_category(category_type, sample_elements):
-    """Load all parameters from elements in a category"""
-    parameters_by_name = {}
-    
-    for element in sample_elements[:100]:  # Limit to first 100 for performance
-        for param in element.Parameters:
-            if param and param.StorageType != DB.StorageType.None:
-                parameter_name = param.Definition.Name
-                if parameter_name not in parameters_by_name:
-                    parameters_by_name[parameter_name] = set()
-                
-                parameter_value = get_parameter_value_string(param)
-                if parameter_value:
-                    parameters_by_name[parameter_name].add(parameter_value)
-    
-    # Convert to list of tuples (parameter_name, parameter_values)
-    parameter_list = []
-    for parameter_name in sorted(parameters_by_name.keys()):
-        parameter_values = sorted(list(parameters_by_name[parameter_name]))
-        parameter_list.append((parameter_name, parameter_values))
-    
-    return parameter_list
+def read_parameter_values(element, definitions=None):
+    """{parameter name: value text} of one element (empty values skipped).
+    definitions (a dict) also collects {parameter name: set((id number, storage type))}."""
+    values = {}
+    for param in element.Parameters:
+        if param and param.StorageType != DB.StorageType.None:
+            if definitions is not None:
+                definitions.setdefault(param.Definition.Name, set()).add((id_value(param.Id), param.StorageType))
+            parameter_value = get_parameter_value_string(param)
+            if parameter_value:
+                values[param.Definition.Name] = parameter_value
+    return values
+
+
+def read_element(metadata, element_id):
+    """(category key, values) of one element, or None if it is gone or not indexed."""
+    element = doc.GetElement(DB.ElementId(element_id))
+    if element is None or element.Category is None or isinstance(element, DB.ElementType):
+        return None
+    category_key = id_value(element.Category.Id)
+    return category_key, read_parameter_values(element, metadata.definitions.setdefault(category_key, {}))
+
+
+def read_category(metadata, category_type):
+    """(element id, values) of every element of a category: ONE pass (one collector)."""
+    definitions = metadata.definitions.setdefault(int(category_type), {})
+    collector = DB.FilteredElementCollector(doc).OfCategory(category_type).WhereElementIsNotElementType()
+    for element in collector:
+        yield id_value(element.Id), read_parameter_values(element, definitions)
+
+
+def get_parameter_index(metadata):
+    """This document's parameter index, kept for the whole Revit session.
+    Elements changed since the last use (see hooks/doc-changed.py) are read again."""
+    index = session_index(document_key(doc))
+    index.refresh(lambda element_id: read_element(metadata, element_id))
+    return index
 
 
-def load_parameters_all_categories():
+def index_categories(index, metadata, category_types):
+    """Index the categories not indexed yet. Returns their keys."""
+    category_keys = []
+    for category_type in category_types:
+        category_key = int(category_type)
+        index.ensure_loaded(category_key, lambda: read_category(metadata, category_type))
+        category_keys.append(category_key)
+    return category_keys
+
+
+def load_parameters_for_category(index, metadata, category_type):
+    """All parameters (and all their values) of the elements in a category"""
+    return index.parameters(index_categories(index, metadata, [category_type]))
+
+
+def load_parameters_all_categories(index, metadata):
     """Load parameters from all allowed categories"""
-    parameters_by_name = {}
-    
-    for category_type in ALLOWED_CATEGORIES:
-        collector = DB.FilteredElementCollector(doc).OfCategory(category_type).WhereElementIsNotElementType()
-        collected_elements = list(collector.ToElements())
-        sample_elements = collected_elements[:50]  # Limit to first 50 for performance
-        
-        for element in sample_elements:
-            for param in element.Parameters:
-                if param and param.StorageType != DB.StorageType.None:
-                    parameter_name = param.Definition.Name
-                    if parameter_name not in parameters_by_name:
-                        parameters_by_name[parameter_name] = set()
-                    
-                    parameter_value = get_parameter_value_string(param)
-                    if parameter_value:
-                        parameters_by_name[parameter_name].add(parameter_value)
-    
-    # Convert to list of tuples (parameter_name, parameter_values)
-    parameter_list = []
-    for parameter_name in sorted(parameters_by_name.keys()):
-        parameter_values = sorted(list(parameters_by_name[parameter_name]))
-        parameter_list.append((parameter_name, parameter_values))
-    
-    return parameter_list
+    return index.parameters(index_categories(index, metadata, ALLOWED_CATEGORIES))
 
 
-def get_elements_for_filter(category_type, parameter_name, parameter_value):
-    """Get elements matching filter criteria"""
+def get_elements_for_filter(index, metadata, category_type, parameter_name, parameter_value):
+    """Ids (numbers) of the elements matching filter criteria: an index lookup"""
     if category_type is None:
         # "Any category" - search all allowed categories
-        collected_elements = []
-        for allowed_category in ALLOWED_CATEGORIES:
-            category_elements = list(DB.FilteredElementCollector(doc)
-                                    .OfCategory(allowed_category)
-                                    .WhereElementIsNotElementType()
-                                    .ToElements())
-            collected_elements.extend(category_elements)
+        category_keys = index_categories(index, metadata, ALLOWED_CATEGORIES)
     else:
         # Specific category
-        collected_elements = list(DB.FilteredElementCollector(doc)
-                                 .OfCategory(category_type)
-                                 .WhereElementIsNotElementType()
-                                 .ToElements())
-    
-    # Filter by parameter
-    matching_elements = []
-    for element in collected_elements:
-        param = element.LookupParameter(parameter_name)
-        if param:
-            element_value = get_parameter_value_string(param)
-            if element_value == parameter_value:
-                matching_elements.append(element)
-    
-    return matching_elements
+        category_keys = index_categories(index, metadata, [category_type])
+    # Text is matched ignoring case, like Revit's own filter rules (see filter_compiler.py)
+    return index.element_ids(parameter_name, parameter_value, category_keys, ignore_case=True)
+
+
+def select_element_ids(index, metadata, filters, use_or):
+    """Ids of the elements matching [(category type or None, parameter name, value)],
+    combined with AND or OR. Filters are matched natively by Revit (one collector)
+    when possible; the others are looked up in the parameter index."""
+    compiler = FilterCompiler(doc, metadata.definitions_of)
+    clauses = []
+    for category_type, parameter_name, parameter_value in filters:
+        category_types = ALLOWED_CATEGORIES if category_type is None else [category_type]
+        index_categories(index, metadata, category_types)  # the compiler needs the parameter definitions
+        clauses.append(compiler.compile_clause(category_types, parameter_name, parameter_value))
+
+    if all(clause is not None for clause in clauses):
+        return compiler.element_ids(combine(clauses, use_or))
+
+    # Mixed: evaluate each filter on its own, then combine the id sets
+    id_sets = []
+    for clause, (category_type, parameter_name, parameter_value) in zip(clauses, filters):
+        if clause is not None:
+            id_sets.append(compiler.element_ids(clause))
+        else:
+            id_sets.append(get_elements_for_filter(index, metadata, category_type, parameter_name, parameter_value))
+    selected = id_sets[0]
+    for ids in id_sets[1:]:
+        selected = selected.union(ids) if use_or else selected.intersection(ids)
+    return selected
 
 
 class MyWindow(Windows.Window):
@@ -131,6 +164,11 @@ class MyWindow(Windows.Window):
         # Initialize parameter data dictionaries for filter 1 and filter 2
         self.filter1_parameters = {}
         self.filter2_parameters = {}
+        
+        # Category names / counts / parameter definitions, and
+        # parameter name -> value -> element ids (both built once, kept for the session)
+        self.metadata = get_document_metadata()
+        self.parameter_index = get_parameter_index(self.metadata)
 
         # Load categories and set up events
         self.load_categories()
@@ -138,14 +176,8 @@ class MyWindow(Windows.Window):
     
     def load_categories(self):
         """Load allowed categories into ComboBoxes"""
-        category_names = []
-        for category_type in ALLOWED_CATEGORIES:
-            category = DB.Category.GetCategory(doc, category_type)
-            if category:
-                # Check if category has elements
-                collector = DB.FilteredElementCollector(doc).OfCategory(category_type).WhereElementIsNotElementType()
-                if collector.GetElementCount() > 0:
-                    category_names.append(category.Name)
+        # Only categories that have elements (counted once, see get_document_metadata)
+        category_names = self.metadata.non_empty_names(ALLOWED_CATEGORIES)
         
         # Set the ComboBox items
         self.CbCat1.ItemsSource = category_names
@@ -168,11 +200,7 @@ class MyWindow(Windows.Window):
     
     def get_category_type_from_name(self, category_name):
         """Get BuiltInCategory from category name"""
-        for category_type in ALLOWED_CATEGORIES:
-            category = DB.Category.GetCategory(doc, category_type)
-            if category and category.Name == category_name:
-                return category_type
-        return None
+        return self.metadata.category_from_name(category_name)
     
     def on_any1_checked(self, sender, args):
         """Handle Any category checkbox 1 checked"""
@@ -200,7 +228,7 @@ class MyWindow(Windows.Window):
     
     def load_all_parameters1(self):
         """Load parameters from all allowed categories for filter 1"""
-        parameter_list = load_parameters_all_categories()
+        parameter_list = load_parameters_all_categories(self.parameter_index, self.metadata)
         parameter_names = [param_name for param_name, param_values in parameter_list]
         self.CbParam1.ItemsSource = parameter_names
         self.CbParam1.IsEnabled = True
@@ -210,7 +238,7 @@ class MyWindow(Windows.Window):
     
     def load_all_parameters2(self):
         """Load parameters from all allowed categories for filter 2"""
-        parameter_list = load_parameters_all_categories()
+        parameter_list = load_parameters_all_categories(self.parameter_index, self.metadata)
         parameter_names = [param_name for param_name, param_values in parameter_list]
         self.CbParam2.ItemsSource = parameter_names
         self.CbParam2.IsEnabled = True
@@ -233,10 +261,7 @@ class MyWindow(Windows.Window):
         
         category_type = self.get_category_type_from_name(category_name)
         if category_type:
-            collector = DB.FilteredElementCollector(doc).OfCategory(category_type).WhereElementIsNotElementType()
-            collected_elements = list(collector.ToElements())
-            sample_elements = collected_elements[:100]  # Limit to first 100 for performance
-            parameter_list = load_parameters_for_category(category_type, sample_elements)
+            parameter_list = load_parameters_for_category(self.parameter_index, self.metadata, category_type)
             parameter_names = [param_name for param_name, param_values in parameter_list]
             self.CbParam1.ItemsSource = parameter_names
             self.CbParam1.IsEnabled = True
@@ -259,10 +284,7 @@ class MyWindow(Windows.Window):
         
         category_type = self.get_category_type_from_name(category_name)
         if category_type:
-            collector = DB.FilteredElementCollector(doc).OfCategory(category_type).WhereElementIsNotElementType()
-            collected_elements = list(collector.ToElements())
-            sample_elements = collected_elements[:100]  # Limit to first 100 for performance
-            parameter_list = load_parameters_for_category(category_type, sample_elements)
+            parameter_list = load_parameters_for_category(self.parameter_index, self.metadata, category_type)
             parameter_names = [param_name for param_name, param_values in parameter_list]
             self.CbParam2.ItemsSource = parameter_names
             self.CbParam2.IsEnabled = True
@@ -307,9 +329,44 @@ class MyWindow(Windows.Window):
         self.CbCat2.IsEnabled = True
         
         self.ChkUseOr.IsChecked = False
+        self.TxtQuery.Text = ""
+    
+    def select_ids(self, element_ids):
+        """Select elements in Revit"""
+        if element_ids:
+            element_id_collection = List[DB.ElementId]([DB.ElementId(i) for i in element_ids])
+            uidoc.Selection.SetElementIds(element_id_collection)
+            print("Selected {} element(s)".format(len(element_ids)))
+        else:
+            print("No elements found matching the criteria")
+    
+    def run_query(self, query_text):
+        """Advanced query: any number of conditions, searched in the parameter index"""
+        try:
+            query = parse(query_text)
+        except QueryError as e:
+            print("Query error: {}".format(e))
+            return
+        
+        # Scope: the category of filter 1, or all allowed categories
+        category_type = None
+        if not self.ChkAny1.IsChecked and self.CbCat1.SelectedItem:
+            category_type = self.get_category_type_from_name(self.CbCat1.SelectedItem)
+        category_types = [category_type] if category_type else ALLOWED_CATEGORIES
+        category_keys = index_categories(self.parameter_index, self.metadata, category_types)
+        
+        # Most selective condition first, the others only check what is left
+        planner = QueryPlanner(CategoryStore(self.parameter_index, category_keys))
+        print(planner.explain(query))
+        self.select_ids(planner.evaluate(query))
     
     def on_select(self, sender, args):
         """Select elements based on filters"""
+        query_text = self.TxtQuery.Text.strip()
+        if query_text:
+            self.run_query(query_text)
+            return
+        
         # Get filter 1 settings
         if not self.CbParam1.SelectedItem:
             return
@@ -327,49 +384,25 @@ class MyWindow(Windows.Window):
             if category1_name:
                 selected_category1 = self.get_category_type_from_name(category1_name)
         
-        # Get elements matching filter 1
-        matching_elements_filter1 = get_elements_for_filter(selected_category1, parameter1_name, parameter1_value)
-        matching_ids_filter1 = {element.Id for element in matching_elements_filter1}
+        filters = [(selected_category1, parameter1_name, parameter1_value)]
         
         # Get filter 2 if configured
-        has_second_filter = False
-        matching_elements_filter2 = []
-        matching_ids_filter2 = set()
-        
         if self.CbParam2.SelectedItem:
             parameter2_name = self.CbParam2.SelectedItem
             parameter2_value = self.CbValue2.SelectedItem or self.CbValue2.Text
             
             if parameter2_value:
-                has_second_filter = True
                 selected_category2 = None
                 if not self.ChkAny2.IsChecked:
                     category2_name = self.CbCat2.SelectedItem
                     if category2_name:
                         selected_category2 = self.get_category_type_from_name(category2_name)
-                
-                matching_elements_filter2 = get_elements_for_filter(selected_category2, parameter2_name, parameter2_value)
-                matching_ids_filter2 = {element.Id for element in matching_elements_filter2}
-        
-        # Combine filters
-        if has_second_filter:
-            combine_with_or = self.ChkUseOr.IsChecked
-            if combine_with_or:
-                # OR: union of both filters (elements that match filter 1 OR filter 2)
-                selected_element_ids = matching_ids_filter1.union(matching_ids_filter2)
-            else:
-                # AND: intersection of both filters (elements that match filter 1 AND filter 2)
-                selected_element_ids = matching_ids_filter1.intersection(matching_ids_filter2)
-        else:
-            selected_element_ids = matching_ids_filter1
+                filters.append((selected_category2, parameter2_name, parameter2_value))
         
-        # Select elements in Revit
-        if selected_element_ids:
-            element_id_collection = List[DB.ElementId](selected_element_ids)
-            uidoc.Selection.SetElementIds(element_id_collection)
-            print("Selected {} element(s)".format(len(selected_element_ids)))
-        else:
-            print("No elements found matching the criteria")
+        # Combine filters: OR = union (match filter 1 OR filter 2), AND = intersection.
+        # Revit matches them inside one collector; only the matching ids come back.
+        selected_element_ids = select_element_ids(self.parameter_index, self.metadata, filters, bool(self.ChkUseOr.IsChecked))
+        self.select_ids(selected_element_ids)
 
 
 # Show the window
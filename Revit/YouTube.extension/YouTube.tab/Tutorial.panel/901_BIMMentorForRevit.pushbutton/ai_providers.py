@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+"""Revit Usage Chatbox - AI Provider Callers.
+One function per provider (Gemini, Claude, OpenAI, local Ollama) plus the
+Gemini question embedding. They all share one pooled HTTP client, so
+repeated questions reuse the same open connection to each API.
+To test offline, point the URLs below at fake_ai_server.py, or swap the
+client's transport: http.transport = StubTransport(handler).
+Works on both IronPython 2.7 and CPython 3.
+"""
+
+from http_client import HttpClient, EndpointResolver
+from streaming import SSE, NDJSON, collect_stream, gemini_delta, openai_delta, claude_delta, ollama_delta
+
+# --- [ PROVIDER ENDPOINTS ] ---
+# Point these at fake_ai_server.py (e.g. "http://localhost:8765") to test offline
+GEMINI_BASE_URL = "https://generativelanguage.googleapis.com"
+OPENAI_URL = "https://api.openai.com/v1/chat/completions"
+CLAUDE_URL = "https://api.anthropic.com/v1/messages"
+OLLAMA_URL = "http://localhost:11434/api/chat"
+
+EMBEDDING_MODEL = "models/gemini-embedding-001"
+
+# Index = position in the provider drop-down
+PROVIDER_NAMES = ("Gemini", "Claude", "OpenAI", "Local AI")
+
+# Responses starting with these are errors and must never be cached
+ERROR_PREFIXES = ("Gemini Error", "Gemini Format Error", "OpenAI Error", "Claude Error",
+                  "Local AI Error", "Connection Error", "Invalid provider", "No response from")
+
+def is_error_response(text):
+    """True for an error message, and for an empty answer: a stream that ended
+    before its first word is no answer either, so the backup is asked."""
+    return not (text or "").strip() or text.startswith(ERROR_PREFIXES)
+
+def _session_object(name, factory):
+    """One object for the whole Revit session (lib/session_cache.py): pyRevit runs
+    every click in a fresh scope, so a module-level object would only last one
+    window. Outside Revit (lib not on the path) it lives as long as this module."""
+    try:
+        import session_cache
+    except ImportError:
+        return factory()
+    return session_cache.get(None, name, factory)
+
+
+# Shared by every call (keep-alive connections are reused)
+http = _session_object("bim_mentor_http_client", HttpClient)
+
+# Gemini models live on 'v1' or only on 'v1beta': the first 404 is remembered per model
+gemini_versions = _session_object("bim_mentor_gemini_versions", lambda: EndpointResolver(("v1", "v1beta")))
+
+
+def _connection_error(name, res):
+    return "Connection Error: could not reach {}. {}".format(name, res.text)
+
+
+def get_query_embedding(text, api_key):
+    """Gets embedding for the user's question using Gemini."""
+    url = "{}/v1beta/{}:embedContent?key={}".format(GEMINI_BASE_URL, EMBEDDING_MODEL, api_key)
+    payload = {
+        "model": EMBEDDING_MODEL,
+        "content": {"parts": [{"text": text}]},
+        "taskType": "RETRIEVAL_QUERY"
+    }
+    res = http.post(url, json=payload, timeout=10)
+    if res.status_code == 200:
+        return res.json()["embedding"]["values"]
+    return None
+
+# Each caller takes an optional on_delta(piece): when given, the answer is
+# streamed and on_delta is called as each piece arrives. The full text is
+# returned either way.
+# 'history' holds earlier turns as [{'role': 'user'|'assistant', 'content': ...}]
+# (see conversation.py); each caller sends it in its provider's own format.
+
+def call_gemini(api_key, model, system_prompt, user_prompt, on_delta=None, history=None):
+    # Ensure model starts with 'models/' if it doesn't already
+    if "/" not in model:
+        model = "models/" + model
+
+    method = "streamGenerateContent?alt=sse&key=" if on_delta else "generateContent?key="
+
+    # Universal multi-turn payload structure (Most compatible)
+    contents = [
+        {"role": "user", "parts": [{"text": "SYSTEM INSTRUCTION: " + system_prompt}]},
+        {"role": "model", "parts": [{"text": "Understood. I am your BIM Mentor AI assistant. I will strictly follow those guidelines."}]}
+    ]
+    for message in history or []:
+        role = "model" if message["role"] == "assistant" else "user"
+        contents.append({"role": role, "parts": [{"text": message["content"]}]})
+    contents.append({"role": "user", "parts": [{"text": user_prompt}]})
+    payload = {"contents": contents, "generationConfig": {"temperature": 0.2}}
+
+    # v1 first for better stability, v1beta if this model is not on v1.
+    # Once a version answers, later calls go straight to it.
+    for version in gemini_versions.candidates(model):
+        url = "{}/{}/{}:{}{}".format(GEMINI_BASE_URL, version, model, method, api_key)
+        res = http.post(url, json=payload, timeout=30, stream=bool(on_delta))
+        if res.status_code != 404:
+            break
+
+    if res.status_code == 0:
+        return _connection_error("Gemini", res)
+    if res.status_code == 200:
+        gemini_versions.remember(model, version)
+        if on_delta:
+            return collect_stream(res.iter_lines(), SSE, gemini_delta, on_delta)
+        try:
+            data = res.json()
+            return data["candidates"][0]["content"]["parts"][0]["text"]
+        except Exception:
+            return "Gemini Format Error. Raw response: " + res.text
+
+    return "Gemini Error ({}). Info: {}".format(res.status_code, res.text)
+
+def call_openai(api_key, model, system_prompt, user_prompt, on_delta=None, history=None):
+    headers = {"Authorization": "Bearer " + api_key}
+    messages = [{"role": "system", "content": system_prompt}] + list(history or [])
+    messages.append({"role": "user", "content": user_prompt})
+    payload = {
+        "model": model,
+        "messages": messages,
+        "temperature": 0.2, "stream": bool(on_delta)
+    }
+    response = http.post(OPENAI_URL, headers=headers, json=payload, timeout=30, stream=bool(on_delta))
+    if response.status_code == 0:
+        return _connection_error("OpenAI", response)
+    if response.status_code == 200:
+        if on_delta:
+            return collect_stream(response.iter_lines(), SSE, openai_delta, on_delta)
+        return response.json()["choices"][0]["message"]["content"]
+    return "OpenAI Error ({}): {}".format(response.status_code, response.text)
+
+def call_claude(api_key, model, system_prompt, user_prompt, on_delta=None, history=None):
+    headers = {"x-api-key": api_key, "anthropic-version": "2023-06-01"}
+    payload = {
+        "model": model, "system": system_prompt,
+        "messages": list(history or []) + [{"role": "user", "content": user_prompt}],
+        "max_tokens": 2048, "temperature": 0.2, "stream": bool(on_delta)
+    }
+    response = http.post(CLAUDE_URL, headers=headers, json=payload, timeout=30, stream=bool(on_delta))
+    if response.status_code == 0:
+        return _connection_error("Claude", response)
+    if response.status_code == 200:
+        if on_delta:
+            return collect_stream(response.iter_lines(), SSE, claude_delta, on_delta)
+        return response.json()["content"][0]["text"]
+    return "Claude Error ({}): {}".format(response.status_code, response.text)
+
+def ollama_chat_url(custom_url=""):
+    """Ollama's multi-turn endpoint: accepts 'http://host:11434', '.../api/generate' or '.../api/chat'."""
+    if not (custom_url and custom_url.startswith("http")):
+        return OLLAMA_URL
+    url = custom_url.rstrip("/")
+    if url.endswith("/api/generate"):
+        return url[:-len("generate")] + "chat"
+    if "/api/" not in url:
+        return url + "/api/chat"
+    return url
+
+def call_local_llm(model, system_prompt, user_prompt, custom_url="", on_delta=None, history=None):
+    """
+    Calls a local LLM (Ollama) through its chat endpoint.
+    Default URL: http://localhost:11434/api/chat
+    """
+    url = ollama_chat_url(custom_url)
+
+    messages = [{"role": "system", "content": system_prompt}] + list(history or [])
+    messages.append({"role": "user", "content": user_prompt})
+    payload = {
+        "model": model if model else "llama3",
+        "messages": messages,
+        "stream": bool(on_delta)
+    }
+
+    response = http.post(url, json=payload, timeout=60, stream=bool(on_delta))
+    if response.status_code == 0:
+        return "Connection Error: Ensure Ollama is running at {}. Error: {}".format(url, response.text)
+    if response.status_code == 200:
+        if on_delta:
+            return collect_stream(response.iter_lines(), NDJSON, ollama_delta, on_delta)
+        return response.json().get("message", {}).get("content") or "No response from Local AI."
+    return "Local AI Error ({}): {}".format(response.status_code, response.text)
+
+def call_provider(provider_idx, api_key, model, system_prompt, user_prompt, on_delta=None, history=None):
+    """Call the provider at this drop-down index (for a Local AI, api_key is the custom URL)."""
+    if provider_idx == 0: return call_gemini(api_key, model, system_prompt, user_prompt, on_delta, history)
+    elif provider_idx == 1: return call_claude(api_key, model, system_prompt, user_prompt, on_delta, history)
+    elif provider_idx == 2: return call_openai(api_key, model, system_prompt, user_prompt, on_delta, history)
+    elif provider_idx == 3: return call_local_llm(model, system_prompt, user_prompt, api_key, on_delta, history)
+    return "Invalid provider."
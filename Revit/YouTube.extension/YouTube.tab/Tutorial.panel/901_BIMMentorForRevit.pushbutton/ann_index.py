@@ -0,0 +1,266 @@
+# -*- coding: utf-8 -*-
+"""Revit Usage Chatbox - Approximate Nearest-Neighbour (IVF) Index.
+Groups the knowledge base vectors into clusters ("inverted lists") with k-means.
+At question time we only score the few clusters closest to the question,
+instead of every single topic. 'nprobe' is the recall/latency knob:
+more probed clusters = closer to exact search, but slower.
+
+Building uses NumPy when it is installed (rag_builder.py runs in normal Python),
+otherwise pure Python. Searching is always pure Python (IronPython 2.7 / CPython 3).
+
+Run the benchmark (exact vs IVF on a synthetic corpus):
+    python ann_index.py --benchmark
+"""
+
+import os
+import io
+import json
+import time
+import heapq
+import random
+
+from vector_store import VectorStore, dot, normalize, read_matrix, write_matrix, session_dict
+
+try:
+    import numpy as np
+except ImportError:
+    # IronPython (inside Revit) has no NumPy - the pure Python path is used
+    np = None
+
+INDEX_VERSION = 1
+CENTROIDS_EXT = ".ivf.vec"
+IDS_EXT = ".ivf.ids"
+META_EXT = ".ivf.json"
+
+DEFAULT_NPROBE = 8
+
+
+# --- [ FILE LAYOUT ] ---
+
+def index_paths(kb_path):
+    """'revit_knowledge.json' -> centroids, member ids and metadata file paths."""
+    base = os.path.splitext(kb_path)[0]
+    return base + CENTROIDS_EXT, base + IDS_EXT, base + META_EXT
+
+def has_index(kb_path):
+    return all(os.path.exists(p) for p in index_paths(kb_path))
+
+def suggested_list_count(count):
+    """Rule of thumb: about sqrt(N) clusters (500k chunks -> ~700 lists)."""
+    return max(1, int(round(count ** 0.5)))
+
+
+# --- [ K-MEANS (BUILD TIME) ] ---
+
+def _kmeans_python(rows, n_lists, iterations, rng):
+    """Spherical k-means on unit vectors, pure Python."""
+    centroids = [list(rows[i]) for i in rng.sample(range(len(rows)), n_lists)]
+    for _ in range(iterations):
+        sums = [None] * n_lists
+        for row in rows:
+            best = max(range(n_lists), key=lambda c: dot(row, centroids[c]))
+            if sums[best] is None:
+                sums[best] = list(row)
+            else:
+                sums[best] = [a + b for a, b in zip(sums[best], row)]
+        for c in range(n_lists):
+            # Empty cluster: re-seed it with a random vector
+            centroids[c] = normalize(sums[c] if sums[c] is not None else rows[rng.randrange(len(rows))])
+    return centroids
+
+def _assign_python(store, centroids):
+    lists = [[] for _ in centroids]
+    for i in range(len(store)):
+        row = store.row(i)
+        best = max(range(len(centroids)), key=lambda c: dot(row, centroids[c]))
+        lists[best].append(i)
+    return lists
+
+def _kmeans_numpy(data, n_lists, iterations, rng):
+    """Same algorithm as _kmeans_python, vectorised with NumPy."""
+    centroids = data[rng.sample(range(len(data)), n_lists)].copy()
+    for _ in range(iterations):
+        labels = np.argmax(data.dot(centroids.T), axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, data)
+        empty = ~sums.any(axis=1)
+        for c in np.nonzero(empty)[0]:
+            sums[c] = data[rng.randrange(len(data))]
+        centroids = sums / np.linalg.norm(sums, axis=1, keepdims=True)
+    return centroids
+
+def _assign_numpy(data, centroids, batch_size=4096):
+    labels = np.empty(len(data), dtype=np.int64)
+    for start in range(0, len(data), batch_size):
+        chunk = data[start:start + batch_size]
+        labels[start:start + batch_size] = np.argmax(chunk.dot(centroids.T), axis=1)
+    return [np.nonzero(labels == c)[0].tolist() for c in range(len(centroids))]
+
+
+# --- [ INDEX ] ---
+
+class IvfIndex(object):
+    """Cluster centroids + the store row ids that belong to each cluster."""
+
+    def __init__(self, dim, centroids, lists):
+        self.dim = dim
+        self.centroids = centroids   # list of unit vectors
+        self.lists = lists           # list of row-id lists, one per centroid
+
+    @property
+    def count(self):
+        return sum(len(members) for members in self.lists)
+
+    @classmethod
+    def build(cls, store, n_lists=None, iterations=10, train_per_list=64, seed=42):
+        """Train k-means on a sample of the store, then file every row into a list.
+        About 64 training vectors per cluster is plenty for good centroids.
+        """
+        count = len(store)
+        if not count:
+            raise ValueError("Cannot build an index for an empty store.")
+        n_lists = min(count, n_lists or suggested_list_count(count))
+        rng = random.Random(seed)
+        sample_ids = sorted(rng.sample(range(count), min(count, n_lists * train_per_list)))
+
+        if np is not None:
+            data = np.frombuffer(store.matrix, dtype=np.float32).reshape(count, store.dim)
+            centroids = _kmeans_numpy(data[sample_ids], n_lists, iterations, rng)
+            lists = _assign_numpy(data, centroids)
+            centroids = centroids.tolist()
+        else:
+            sample = [store.row(i) for i in sample_ids]
+            centroids = _kmeans_python(sample, n_lists, iterations, rng)
+            lists = _assign_python(store, centroids)
+        return cls(store.dim, centroids, lists)
+
+    def save(self, kb_path):
+        centroids_path, ids_path, meta_path = index_paths(kb_path)
+        write_matrix(centroids_path, [v for centroid in self.centroids for v in centroid])
+        write_matrix(ids_path, [i for members in self.lists for i in members], "i")
+        meta = {
+            "version": INDEX_VERSION,
+            "dim": self.dim,
+            "count": self.count,
+            "list_sizes": [len(members) for members in self.lists],
+        }
+        with open(meta_path, "w") as f:
+            f.write(json.dumps(meta))
+
+    @classmethod
+    def load(cls, kb_path):
+        centroids_path, ids_path, meta_path = index_paths(kb_path)
+        with io.open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("version") != INDEX_VERSION:
+            raise ValueError("Unsupported ANN index version: {}".format(meta.get("version")))
+
+        dim, sizes = meta["dim"], meta["list_sizes"]
+        flat = read_matrix(centroids_path, len(sizes), dim)
+        centroids = [flat[c * dim:(c + 1) * dim] for c in range(len(sizes))]
+        ids = read_matrix(ids_path, meta["count"], 1, "i")
+
+        lists, start = [], 0
+        for size in sizes:
+            lists.append(ids[start:start + size])
+            start += size
+        return cls(dim, centroids, lists)
+
+    def probe(self, query_vector, nprobe=DEFAULT_NPROBE):
+        """Row ids from the 'nprobe' clusters closest to the query."""
+        query = normalize(query_vector)
+        nearest = heapq.nlargest(nprobe, range(len(self.centroids)),
+                                 key=lambda c: dot(query, self.centroids[c]))
+        rows = []
+        for c in nearest:
+            rows.extend(self.lists[c])
+        return rows
+
+    def search_rows(self, store, query_vector, top_k=3, nprobe=DEFAULT_NPROBE):
+        """Same output as VectorStore.search_rows, but only scores the probed clusters."""
+        return store.search_rows(query_vector, top_k, rows=self.probe(query_vector, nprobe))
+
+    def search(self, store, query_vector, top_k=3, nprobe=DEFAULT_NPROBE):
+        """Same output as VectorStore.search, but only scores the probed clusters."""
+        return store.search(query_vector, top_k, rows=self.probe(query_vector, nprobe))
+
+
+def load_index(kb_path, store=None):
+    """Load the IVF index next to kb_path once per session.
+    Returns None when there is no index, or when it is out of date for 'store'
+    (the caller then falls back to exact search).
+    """
+    if not has_index(kb_path):
+        return None
+    key = os.path.abspath(kb_path)
+    mtime = os.path.getmtime(index_paths(kb_path)[2])
+
+    loaded = session_dict("bim_mentor_ivf_indexes")  # path -> (modified time, index)
+    cached = loaded.get(key)
+    if cached and cached[0] == mtime:
+        index = cached[1]
+    else:
+        index = IvfIndex.load(kb_path)
+        loaded[key] = (mtime, index)
+
+    if store is not None and (index.count != len(store) or index.dim != store.dim):
+        return None
+    return index
+
+
+# --- [ BENCHMARK ] ---
+
+def _synthetic_store(count, dim, clusters, rng):
+    """Clustered random unit vectors, a rough stand-in for real embeddings."""
+    centers = [[rng.gauss(0, 1) for _ in range(dim)] for _ in range(clusters)]
+    items = []
+    for i in range(count):
+        center = centers[rng.randrange(clusters)]
+        items.append({"title": "Topic {}".format(i),
+                      "vector": [c + rng.gauss(0, 0.6) for c in center]})
+    return VectorStore.from_items(items), centers
+
+def benchmark(count=10000, dim=48, queries=50, top_k=10, nprobes=(1, 2, 4, 8, 16, 32), seed=7):
+    rng = random.Random(seed)
+    print("Building synthetic corpus: {} vectors x {} dims...".format(count, dim))
+    store, centers = _synthetic_store(count, dim, max(8, count // 500), rng)
+
+    start = time.time()
+    index = IvfIndex.build(store, seed=seed)
+    print("IVF build: {} lists in {:.1f}s ({})".format(
+        len(index.lists), time.time() - start, "NumPy" if np is not None else "pure Python"))
+
+    query_set = []
+    for _ in range(queries):
+        center = centers[rng.randrange(len(centers))]
+        query_set.append([c + rng.gauss(0, 0.6) for c in center])
+
+    start = time.time()
+    exact = [set(item["title"] for _, item in store.search(q, top_k)) for q in query_set]
+    exact_ms = (time.time() - start) * 1000.0 / queries
+    print("\n{:>9} | {:>10} | {:>9} | {:>7}".format("mode", "recall@{}".format(top_k), "ms/query", "speedup"))
+    print("{:>9} | {:>10.3f} | {:>9.2f} | {:>6.1f}x".format("exact", 1.0, exact_ms, 1.0))
+
+    for nprobe in nprobes:
+        if nprobe > len(index.lists):
+            break
+        start = time.time()
+        found = [set(item["title"] for _, item in index.search(store, q, top_k, nprobe)) for q in query_set]
+        ivf_ms = (time.time() - start) * 1000.0 / queries
+        recall = sum(len(f & e) for f, e in zip(found, exact)) / float(top_k * queries)
+        print("{:>9} | {:>10.3f} | {:>9.2f} | {:>6.1f}x".format(
+            "nprobe={}".format(nprobe), recall, ivf_ms, exact_ms / ivf_ms if ivf_ms else 0.0))
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="IVF index tools for the BIM Mentor knowledge base.")
+    parser.add_argument("--benchmark", action="store_true", help="compare exact vs IVF search on synthetic data")
+    parser.add_argument("--count", type=int, default=10000)
+    parser.add_argument("--dim", type=int, default=48)
+    parser.add_argument("--queries", type=int, default=50)
+    args = parser.parse_args()
+    if args.benchmark:
+        benchmark(count=args.count, dim=args.dim, queries=args.queries)
+    else:
+        parser.print_help()
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""Revit Usage Chatbox - BM25 Keyword Index.
+A classic search-engine 'inverted index': for every word, the list of
+knowledge base rows that contain it. BM25 scores rows by how many of the
+question's words they contain, favouring rare words and shorter chunks.
+No API call needed, so keyword questions like "VG dialog" are answered instantly.
+Row numbers match the vector store rows. Works on IronPython 2.7 and CPython 3.
+"""
+
+import os
+import io
+import re
+import json
+import math
+import heapq
+
+from vector_store import session_dict
+
+INDEX_VERSION = 1
+BM25_EXT = ".bm25.json"
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+STOPWORDS = set("""a an and are as at be by can do does for from has have how i if in into is it
+its me my of on or our should so than that the their then there these this to was we what when
+where which who why will with you your""".split())
+
+
+def tokenize(text):
+    """Lower-case words without stopwords, with a light plural trim (walls -> wall)."""
+    tokens = []
+    for word in _TOKEN_RE.findall(text.lower()):
+        if word in STOPWORDS or (len(word) < 2 and not word.isdigit()):
+            continue
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        tokens.append(word)
+    return tokens
+
+
+def index_path(kb_path):
+    """'revit_knowledge.json' -> 'revit_knowledge.bm25.json'"""
+    return os.path.splitext(kb_path)[0] + BM25_EXT
+
+
+class Bm25Index(object):
+    """Inverted index: term -> flat [row, term frequency, row, tf, ...] list."""
+
+    def __init__(self, postings, doc_lengths, k1=1.5, b=0.75):
+        self.postings = postings
+        self.doc_lengths = doc_lengths
+        self.k1 = k1
+        self.b = b
+        self.avgdl = (sum(doc_lengths) / float(len(doc_lengths))) if doc_lengths else 0.0
+
+    def __len__(self):
+        return len(self.doc_lengths)
+
+    @classmethod
+    def build(cls, texts, k1=1.5, b=0.75):
+        postings, doc_lengths = {}, []
+        for row, text in enumerate(texts):
+            tokens = tokenize(text)
+            doc_lengths.append(len(tokens))
+            counts = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for token, tf in counts.items():
+                postings.setdefault(token, []).extend((row, tf))
+        return cls(postings, doc_lengths, k1, b)
+
+    @classmethod
+    def from_items(cls, items):
+        """Index title + text of knowledge base items (same order as the vector store)."""
+        return cls.build(u"{} {}".format(item.get("title", ""), item.get("text", "")) for item in items)
+
+    def save(self, kb_path):
+        data = {"version": INDEX_VERSION, "k1": self.k1, "b": self.b,
+                "doc_lengths": self.doc_lengths, "postings": self.postings}
+        with open(index_path(kb_path), "w") as f:
+            f.write(json.dumps(data))
+
+    @classmethod
+    def load(cls, kb_path):
+        with io.open(index_path(kb_path), "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != INDEX_VERSION:
+            raise ValueError("Unsupported BM25 index version: {}".format(data.get("version")))
+        return cls(data["postings"], data["doc_lengths"], data["k1"], data["b"])
+
+    def idf(self, term):
+        df = len(self.postings.get(term, ())) // 2
+        return math.log(1.0 + (len(self) - df + 0.5) / (df + 0.5))
+
+    def search(self, query, top_k=10):
+        """Return the top_k (bm25 score, row) pairs, best first."""
+        scores = {}
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = self.idf(term)
+            for i in range(0, len(postings), 2):
+                row, tf = postings[i], postings[i + 1]
+                norm = tf + self.k1 * (1 - self.b + self.b * self.doc_lengths[row] / (self.avgdl or 1.0))
+                scores[row] = scores.get(row, 0.0) + idf * tf * (self.k1 + 1) / norm
+        best = heapq.nlargest(top_k, scores.items(), key=lambda pair: pair[1])
+        return [(score, row) for row, score in best]
+
+
+def load_index(kb_path, store=None):
+    """Load the BM25 index next to kb_path once per session.
+    Without an index file (older knowledge bases), one is built in memory from
+    the store. Returns None if neither is available or the file is out of date.
+    """
+    path = index_path(kb_path)
+    key = os.path.abspath(kb_path)
+    mtime = os.path.getmtime(path) if os.path.exists(path) else None
+
+    loaded = session_dict("bim_mentor_bm25_indexes")  # path -> ((modified time, store id), index)
+    cached = loaded.get(key)
+    if cached and cached[0] == (mtime, id(store)):
+        return cached[1]
+
+    if mtime is not None:
+        index = Bm25Index.load(kb_path)
+    elif store is not None:
+        index = Bm25Index.from_items(store.items)
+    else:
+        return None
+
+    if store is not None and len(index) != len(store):
+        return None
+    loaded[key] = ((mtime, id(store)), index)
+    return index
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""Revit Usage Chatbox - Chunking Engine (used by rag_builder.py).
+Long manual pages make blurry embeddings and huge prompts, so we split them:
+  1. Heading-aware: text is first cut into sections at headings
+     ('# Title', '1.2 Title', 'ALL CAPS TITLE', 'Title:' lines).
+  2. Token-aware sliding window: each section is packed sentence by sentence
+     into chunks of at most 'max_tokens', repeating ~'overlap_tokens' of the
+     previous chunk so no instruction is cut in half.
+Every chunk keeps a back-reference to its source title ('source' + 'chunk').
+Works on both IronPython 2.7 and CPython 3.
+"""
+
+import re
+
+DEFAULT_MAX_TOKENS = 200
+DEFAULT_OVERLAP_TOKENS = 40
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+_SENTENCE_RE = re.compile(r"(?<=[.!?;])\s+|\n+")
+_HEADING_RES = [
+    re.compile(r"^\s*#{1,6}\s+(.+?)\s*#*\s*$"),                  # Markdown: '## Levels'
+    re.compile(r"^\s*(\d+(?:\.\d+)+\s+[A-Z][^.!?]{0,60})\s*$"),   # Numbered: '2.1 Wall Types'
+    re.compile(r"^\s*([A-Z][A-Z0-9 &/\-]{3,80})\s*$"),          # ALL CAPS line
+    re.compile(r"^\s*([A-Z][^.!?:]{0,60}):\s*$"),               # 'Naming Rules:'
+]
+
+
+def count_tokens(text):
+    """Rough token count (words + punctuation) - close enough to size chunks
+    without shipping a real tokenizer.
+    """
+    return len(_TOKEN_RE.findall(text))
+
+
+def split_sections(text):
+    """Cut text at heading lines. Returns a list of (heading, body) pairs."""
+    sections = []
+    heading, lines = "", []
+    for line in text.splitlines():
+        match = None
+        for pattern in _HEADING_RES:
+            match = pattern.match(line)
+            if match:
+                break
+        if match:
+            if "".join(lines).strip():
+                sections.append((heading, "\n".join(lines).strip()))
+            heading, lines = match.group(1).strip(), []
+        else:
+            lines.append(line)
+    if "".join(lines).strip():
+        sections.append((heading, "\n".join(lines).strip()))
+    return sections
+
+
+def split_sentences(text, max_tokens):
+    """Sentences (or lines), with over-long ones hard-split by words."""
+    sentences = []
+    for sentence in _SENTENCE_RE.split(text):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        words = sentence.split()
+        while count_tokens(sentence) > max_tokens and len(words) > 1:
+            # Take as many words as fit, keep the rest for the next round
+            size = len(words) // 2
+            while size < len(words) - 1 and count_tokens(" ".join(words[:size + 1])) <= max_tokens:
+                size += 1
+            while size > 1 and count_tokens(" ".join(words[:size])) > max_tokens:
+                size -= 1
+            sentences.append(" ".join(words[:size]))
+            words = words[size:]
+            sentence = " ".join(words)
+        sentences.append(sentence)
+    return sentences
+
+
+def window(sentences, max_tokens, overlap_tokens):
+    """Pack sentences into chunks of <= max_tokens with a sentence-level overlap."""
+    chunks, current, size = [], [], 0
+    for sentence in sentences:
+        tokens = count_tokens(sentence)
+        if current and size + tokens > max_tokens:
+            chunks.append(" ".join(current))
+            # Carry the last sentences (up to overlap_tokens) into the next chunk
+            carried, carried_size = [], 0
+            for previous in reversed(current):
+                previous_size = count_tokens(previous)
+                if carried_size + previous_size > overlap_tokens or carried_size + previous_size + tokens > max_tokens:
+                    break
+                carried.insert(0, previous)
+                carried_size += previous_size
+            current, size = carried, carried_size
+        current.append(sentence)
+        size += tokens
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+
+def chunk_text(text, max_tokens=DEFAULT_MAX_TOKENS, overlap_tokens=DEFAULT_OVERLAP_TOKENS):
+    """Split one manual entry. Returns a list of (heading, chunk_text) pairs.
+    Short entries come back as a single chunk, untouched.
+    """
+    if count_tokens(text) <= max_tokens:
+        return [("", text)]
+    chunks = []
+    for heading, body in split_sections(text):
+        for piece in window(split_sentences(body, max_tokens), max_tokens, overlap_tokens):
+            chunks.append((heading, piece))
+    return chunks
+
+
+def chunk_topics(topics, max_tokens=DEFAULT_MAX_TOKENS, overlap_tokens=DEFAULT_OVERLAP_TOKENS):
+    """Turn (title, text) topics into knowledge base chunks.
+    Each chunk: {'title', 'text', 'source', 'chunk'} where 'source' is the
+    original title and 'chunk' its position, for de-duplication at query time.
+    """
+    chunks = []
+    for title, text in topics:
+        for i, (heading, piece) in enumerate(chunk_text(text, max_tokens, overlap_tokens)):
+            chunks.append({
+                "title": "{} > {}".format(title, heading) if heading else title,
+                "text": piece,
+                "source": title,
+                "chunk": i,
+            })
+    return chunks
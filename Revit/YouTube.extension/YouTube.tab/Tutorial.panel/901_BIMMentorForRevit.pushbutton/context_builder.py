@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""Revit Usage Chatbox - Context Budget Manager.
+Decides what goes into the prompt, within a token budget:
+  1. MMR (Maximal Marginal Relevance): pick chunks that are relevant to the
+     question but not near-copies of chunks already picked, and only the best
+     chunk(s) of each source page so one page cannot fill the whole budget.
+  2. Extractive trimming: a chunk that does not fit is cut down to its
+     sentences that share the most (rare) words with the question.
+Smaller prompts mean faster and cheaper answers. Runs locally, no API call.
+Works on both IronPython 2.7 and CPython 3.
+"""
+
+from chunker import count_tokens, split_sentences
+from bm25_index import tokenize
+from vector_store import dot, source_of
+
+DEFAULT_BUDGET_TOKENS = 1200  # Whole context (all chunks together)
+MAX_CHUNKS = 6                # Never more chunks than this
+MAX_PER_SOURCE = 1            # Chunks of the same source page
+MMR_LAMBDA = 0.7              # 1.0 = relevance only, 0.0 = diversity only
+DUPLICATE_SIMILARITY = 0.95   # Chunks this similar to a picked one are skipped
+MIN_CHUNK_TOKENS = 25         # Don't bother adding a chunk trimmed below this
+CHUNK_SHARE = 0.5             # One chunk may use at most this share of the budget
+SOURCE_OVERHEAD_TOKENS = 8    # 'Source: ... Content:' labels around each chunk
+
+
+def trim_to_query(text, question, max_tokens, idf=None):
+    """Keep the sentences sharing the most (rare) words with the question,
+    in their original order, within max_tokens. Gaps are marked with '...'.
+    """
+    if count_tokens(text) <= max_tokens:
+        return text
+    terms = set(tokenize(question))
+    idf = idf or (lambda term: 1.0)
+    sentences = split_sentences(text, max_tokens)
+
+    def score(index):
+        words = set(tokenize(sentences[index]))
+        return sum(idf(term) for term in terms & words)
+
+    ranked = sorted(range(len(sentences)), key=lambda i: (-score(i), i))
+    keep, used = set(), 0
+    for i in ranked:
+        size = count_tokens(sentences[i])
+        if used + size <= max_tokens:
+            keep.add(i)
+            used += size
+    if not keep:
+        return ""
+
+    parts, previous = [], None
+    for i in sorted(keep):
+        if previous is not None and i != previous + 1:
+            parts.append("...")
+        parts.append(sentences[i])
+        previous = i
+    return " ".join(parts)
+
+
+class ContextBuilder(object):
+    """Builds the prompt context from retrieved (score, row) hits.
+    similarity(row_a, row_b) compares two chunks (cosine of stored vectors by default).
+    """
+
+    def __init__(self, store, budget_tokens=DEFAULT_BUDGET_TOKENS, max_chunks=MAX_CHUNKS,
+                 mmr_lambda=MMR_LAMBDA, idf=None, similarity=None, max_per_source=MAX_PER_SOURCE):
+        self.store = store
+        self.budget_tokens = budget_tokens
+        self.max_chunks = max_chunks
+        self.max_per_source = max_per_source
+        self.mmr_lambda = mmr_lambda
+        self.idf = idf
+        self.similarity = similarity or (lambda a, b: dot(store.row(a), store.row(b)))
+
+    def select(self, hits):
+        """MMR order of the hits: [(row, relevance 0..1)], near-duplicates removed
+        and at most max_per_source chunks of each source."""
+        if not hits:
+            return []
+        best = max(score for score, _ in hits) or 1.0
+        remaining = [(row, score / best) for score, row in hits]
+        picked, per_source = [], {}
+        while remaining and len(picked) < self.max_chunks:
+            best_index, best_value, best_overlap = None, None, 0.0
+            for index, (row, relevance) in enumerate(remaining):
+                overlap = max([self.similarity(row, chosen) for chosen, _ in picked] or [0.0])
+                value = self.mmr_lambda * relevance - (1 - self.mmr_lambda) * overlap
+                if best_value is None or value > best_value:
+                    best_index, best_value, best_overlap = index, value, overlap
+            row, relevance = remaining.pop(best_index)
+            if best_overlap >= DUPLICATE_SIMILARITY:
+                continue
+            picked.append((row, relevance))
+            source = source_of(self.store.items[row])
+            per_source[source] = per_source.get(source, 0) + 1
+            if per_source[source] >= self.max_per_source:
+                remaining = [(r, rel) for r, rel in remaining if source_of(self.store.items[r]) != source]
+        return picked
+
+    def build(self, question, hits):
+        """Returns (context parts [(item, text)], tokens used)."""
+        parts, used = [], 0
+        per_chunk = max(MIN_CHUNK_TOKENS, int(self.budget_tokens * CHUNK_SHARE))
+        for row, _ in self.select(hits):
+            room = min(per_chunk, self.budget_tokens - used - SOURCE_OVERHEAD_TOKENS)
+            if room < MIN_CHUNK_TOKENS:
+                break
+            item = self.store.items[row]
+            text = trim_to_query(item.get("text", ""), question, room, self.idf)
+            size = count_tokens(text)
+            if size < min(MIN_CHUNK_TOKENS, count_tokens(item.get("text", ""))):
+                continue
+            parts.append((item, text))
+            used += size + SOURCE_OVERHEAD_TOKENS
+        return parts, used
+
+
+def count_sources(parts):
+    """Number of distinct source pages in build()'s context parts."""
+    return len(set(source_of(item) for item, _ in parts))
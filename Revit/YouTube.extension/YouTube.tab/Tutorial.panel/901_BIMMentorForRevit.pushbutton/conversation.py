@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""Revit Usage Chatbox - Conversation Memory.
+Lets the user ask follow-ups ("and for doors?") without pasting old answers.
+  - The most recent turns are sent word for word, in each provider's own
+    multi-turn format (see ai_providers.py).
+  - Older turns are rolled into a short summary, so the history never grows
+    past its token budget however long the chat gets.
+The default summary is extractive (the question + the first sentences of
+the answer): instant and free. Pass summarize=fn to use an AI call instead.
+Works on both IronPython 2.7 and CPython 3.
+"""
+
+import re
+import threading
+
+from chunker import count_tokens, split_sentences
+
+HISTORY_TOKEN_BUDGET = 1500  # Recent turns + summary together
+SUMMARY_TOKEN_BUDGET = 300   # The summary alone
+RECENT_TURNS = 4             # Turns kept word for word (if they fit the budget)
+GIST_TOKENS = 40             # Answer text kept per summarised turn
+
+# Words that make a question lean on earlier turns ("and for doors?", "how do I undo it?")
+_FOLLOW_UP_START_RE = re.compile(r"^\s*(and|also|but|or|so|then|what about|how about|same)\b", re.IGNORECASE)
+_FOLLOW_UP_WORD_RE = re.compile(r"\b(it|its|that|this|these|those|them|they|there|same|above|previous|"
+                                r"earlier|again|instead|else)\b", re.IGNORECASE)
+
+
+def gist(text, max_tokens=GIST_TOKENS):
+    """First sentences of a text, up to max_tokens."""
+    kept, used = [], 0
+    for sentence in split_sentences(text, max_tokens):
+        size = count_tokens(sentence)
+        if kept and used + size > max_tokens:
+            break
+        kept.append(sentence)
+        used += size
+    return " ".join(kept)
+
+
+def summarize_turns(turns, previous_summary=""):
+    """Extractive summary: one line per turn."""
+    lines = [previous_summary] if previous_summary else []
+    for question, answer in turns:
+        lines.append("- User asked: {} | Answer: {}".format(gist(question, 25), gist(answer)))
+    return "\n".join(lines)
+
+
+def _trim_summary(summary, max_tokens):
+    # Drop the oldest lines first
+    lines = summary.split("\n")
+    while len(lines) > 1 and count_tokens("\n".join(lines)) > max_tokens:
+        lines.pop(0)
+    text = "\n".join(lines)
+    return text if count_tokens(text) <= max_tokens else gist(text, max_tokens)
+
+
+def is_follow_up(question):
+    """Does the question need the earlier turns to make sense? Errs on the side of
+    'yes': very short questions, questions starting with 'and', 'what about'...
+    or pointing back with 'it', 'that', 'the same'..."""
+    if len(question.split()) <= 3:
+        return True
+    return bool(_FOLLOW_UP_START_RE.search(question) or _FOLLOW_UP_WORD_RE.search(question))
+
+
+class Conversation(object):
+    """Recent (question, answer) turns + a rolling summary of older ones."""
+
+    def __init__(self, budget_tokens=HISTORY_TOKEN_BUDGET, summary_tokens=SUMMARY_TOKEN_BUDGET,
+                 recent_turns=RECENT_TURNS, summarize=None):
+        self.budget_tokens = budget_tokens
+        self.summary_tokens = summary_tokens
+        self.recent_turns = recent_turns
+        self.summarize = summarize or summarize_turns
+        self.turns = []
+        self.summary = ""
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.turns)
+
+    def clear(self):
+        with self._lock:
+            self.turns = []
+            self.summary = ""
+
+    def add_turn(self, question, answer):
+        with self._lock:
+            self.turns.append((question, answer))
+            self._compact()
+
+    def _turn_tokens(self):
+        return sum(count_tokens(q) + count_tokens(a) for q, a in self.turns)
+
+    def _compact(self):
+        """Roll the oldest turns into the summary until everything fits."""
+        while True:
+            rolled = []
+            while len(self.turns) > 1 and (
+                    len(self.turns) > self.recent_turns or
+                    self._turn_tokens() + count_tokens(self.summary) > self.budget_tokens):
+                rolled.append(self.turns.pop(0))
+            if not rolled:
+                break
+            # The summary grows with the rolled turns: check the budget again
+            self.summary = _trim_summary(self.summarize(rolled, self.summary), self.summary_tokens)
+        if self.turns and self._turn_tokens() + count_tokens(self.summary) > self.budget_tokens:
+            # A single huge answer: keep only its beginning
+            question, answer = self.turns[0]
+            room = max(GIST_TOKENS, self.budget_tokens - count_tokens(self.summary) - count_tokens(question))
+            self.turns[0] = (question, gist(answer, room))
+
+    def messages(self):
+        """History as [{'role': 'user'|'assistant', 'content': text}], oldest first."""
+        with self._lock:
+            history = []
+            for question, answer in self.turns:
+                history.append({"role": "user", "content": question})
+                history.append({"role": "assistant", "content": answer})
+            return history
+
+    def summary_text(self):
+        with self._lock:
+            return self.summary
+
+    def tokens(self):
+        with self._lock:
+            return self._turn_tokens() + count_tokens(self.summary)
@@ -0,0 +1,267 @@
+# -*- coding: utf-8 -*-
+"""Revit Usage Chatbox - Embedding Pipeline (used by rag_builder.py).
+Turns thousands of texts into vectors quickly, without upsetting the API:
+  - Batching: up to 100 texts per 'batchEmbedContents' call.
+  - Concurrency: a small pool of worker threads sends batches in parallel.
+    (If the batch endpoint does not exist (404/405), texts are sent one by one.
+    A rejected batch (400) is retried text by text, so one bad text does not
+    sink the rest of the batch.)
+  - Rate limiting: a token bucket caps the number of requests per minute.
+  - Retries: 429 / 5xx / network errors are retried with exponential backoff.
+  - Caching: every vector is saved in a local .jsonl file, keyed by a hash of
+    (model, taskType, text). Rebuilds only call the API for new or edited
+    texts, and an interrupted run resumes where it stopped.
+Runs in normal Python 3 (not inside Revit).
+"""
+
+import os
+import json
+import time
+import random
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+
+GEMINI_BASE_URL = "https://generativelanguage.googleapis.com/v1beta"
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
+
+class EmbeddingError(Exception):
+    """Raised when a text could not be embedded (after all retries)."""
+    def __init__(self, message, status=None):
+        Exception.__init__(self, message)
+        self.status = status
+
+
+class TokenBucket(object):
+    """Thread-safe rate limiter: 'rate' requests per second, bursts up to 'capacity'."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or max(1.0, rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        """Block until 'tokens' are available, then spend them."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait = (tokens - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+# --- [ API CLIENT ] ---
+
+class EmbeddingClient(object):
+    """Gemini embedding calls with rate limiting and retry/backoff."""
+
+    def __init__(self, api_key, model="models/gemini-embedding-001", task_type="RETRIEVAL_DOCUMENT",
+                 base_url=GEMINI_BASE_URL, requests_per_minute=100, max_retries=5,
+                 backoff=1.0, max_backoff=60.0, timeout=30):
+        self.api_key = api_key
+        self.model = model if model.startswith("models/") else "models/" + model
+        self.task_type = task_type
+        self.base_url = base_url.rstrip("/")
+        self.bucket = TokenBucket(requests_per_minute / 60.0, capacity=max(1, requests_per_minute // 10))
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.use_batch = True
+        self.lock = threading.Lock()
+        self.session = requests.Session()  # re-uses connections between calls
+
+    def _url(self, method):
+        return "{}/{}:{}?key={}".format(self.base_url, self.model, method, self.api_key)
+
+    def _request(self, text):
+        return {"model": self.model, "content": {"parts": [{"text": text}]}, "taskType": self.task_type}
+
+    def _post(self, url, payload):
+        """POST with retries on 429 / 5xx / connection errors."""
+        for attempt in range(self.max_retries + 1):
+            self.bucket.acquire()
+            retry_after = None
+            try:
+                response = self.session.post(url, json=payload, timeout=self.timeout)
+            except requests.RequestException as e:
+                status, message = None, str(e)
+            else:
+                if response.status_code == 200:
+                    return response.json()
+                status, message = response.status_code, response.text
+                if status not in RETRY_STATUS:
+                    raise EmbeddingError(message, status)
+                retry_after = response.headers.get("Retry-After")
+
+            if attempt == self.max_retries:
+                raise EmbeddingError("Gave up after {} retries: {}".format(self.max_retries, message), status)
+
+            # Exponential backoff with jitter (or what the server asked for)
+            try:
+                delay = float(retry_after)
+            except (TypeError, ValueError):
+                delay = self.backoff * (2 ** attempt)
+            time.sleep(min(self.max_backoff, delay + random.uniform(0, delay * 0.25)))
+
+    def embed_one(self, text):
+        data = self._post(self._url("embedContent"), self._request(text))
+        return data["embedding"]["values"]
+
+    def embed_batch(self, texts):
+        """Embed a list of texts, using the batch endpoint when it exists.
+        Returns one vector per text; None for a text the API rejected (400)."""
+        if self.use_batch:
+            try:
+                data = self._post(self._url("batchEmbedContents"),
+                                  {"requests": [self._request(t) for t in texts]})
+                return [e["values"] for e in data["embeddings"]]
+            except EmbeddingError as e:
+                if e.status == 400:
+                    # Usually one bad text, not a missing endpoint: retry this batch text by text
+                    return [self._embed_or_none(t) for t in texts]
+                if e.status not in (404, 405):
+                    raise
+                # No batch endpoint for this model/provider: fall back to single calls
+                with self.lock:
+                    if self.use_batch:
+                        print("  ⚠️ Batch endpoint unavailable ({}), switching to single requests.".format(e.status))
+                        self.use_batch = False
+        return [self._embed_or_none(t) for t in texts]
+
+    def _embed_or_none(self, text):
+        try:
+            return self.embed_one(text)
+        except EmbeddingError as e:
+            if e.status != 400:
+                raise
+            print("  ❌ Rejected text ({}...): {}".format(text[:40], e))
+            return None
+
+
+# --- [ EMBEDDING CACHE ] ---
+
+def cache_key(model, task_type, text):
+    """Content address of one embedding: same model + task + text = same vector."""
+    raw = u"{}\n{}\n{}".format(model, task_type, text)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache(object):
+    """Local 'cache_key -> vector' store, saved as one JSON line per vector.
+    New vectors are appended (and flushed) as soon as they arrive, so the
+    file also works as a checkpoint if a run is interrupted.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.vectors = {}
+        self._file = None
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                        self.vectors[entry["key"]] = entry["vector"]
+                    except (ValueError, KeyError):
+                        continue  # half-written last line after a crash
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def __contains__(self, key):
+        return key in self.vectors
+
+    def get(self, key):
+        return self.vectors.get(key)
+
+    def add(self, key, vector):
+        self.vectors[key] = vector
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write(json.dumps({"key": key, "vector": vector}) + "\n")
+
+    def flush(self):
+        if self._file:
+            self._file.flush()
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def prune(self, keep_keys):
+        """Drop vectors of deleted/edited texts and rewrite the file compactly
+        (only if something was dropped). Returns the number of removed vectors.
+        """
+        self.close()
+        keep_keys = set(keep_keys)
+        removed = [k for k in self.vectors if k not in keep_keys]
+        if not removed:
+            return 0
+        for key in removed:
+            del self.vectors[key]
+
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            for key, vector in self.vectors.items():
+                f.write(json.dumps({"key": key, "vector": vector}) + "\n")
+        os.replace(temp_path, self.path)
+        return len(removed)
+
+
+# --- [ PIPELINE ] ---
+
+def embed_texts(client, texts, cache, batch_size=100, max_workers=4):
+    """Embed many texts concurrently, calling the API only for cache misses.
+    texts: list of strings. Returns a dict 'text -> vector'.
+    Texts that fail after all retries are missing from the result (re-run to retry them).
+    When every text succeeded, vectors no longer used by 'texts' are pruned from the cache.
+    """
+    keys = dict((text, cache_key(client.model, client.task_type, text)) for text in texts)
+    pending = [(key, text) for text, key in keys.items() if key not in cache]
+
+    print("♻️ {} of {} texts unchanged (cached), {} to embed.".format(
+        len(keys) - len(pending), len(keys), len(pending)))
+
+    batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+    embedded, failed = 0, 0
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = dict((pool.submit(client.embed_batch, [t for _, t in batch]), batch) for batch in batches)
+            for future in as_completed(futures):
+                batch = futures[future]
+                try:
+                    vectors = future.result()
+                except EmbeddingError as e:
+                    failed += len(batch)
+                    print("  ❌ Embedding Error ({} texts): {}".format(len(batch), e))
+                    continue
+
+                for (key, _), vector in zip(batch, vectors):
+                    if vector is None:
+                        failed += 1  # rejected by the API (see embed_batch)
+                    else:
+                        cache.add(key, vector)
+                        embedded += 1
+                cache.flush()
+                print("📦 Vectorized {}/{}".format(embedded, len(pending)))
+    finally:
+        cache.close()
+
+    # Only prune after a clean run, so a partial run never loses finished work
+    if not failed:
+        removed = cache.prune(keys.values())
+        if removed:
+            print("🧹 Pruned {} cached vectors of deleted or edited texts.".format(removed))
+
+    return dict((text, cache.get(key)) for text, key in keys.items() if key in cache)
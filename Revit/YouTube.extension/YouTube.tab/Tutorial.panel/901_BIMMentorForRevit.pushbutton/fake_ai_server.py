@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+"""Revit Usage Chatbox - Fake AI Server (for offline testing).
+A tiny local stand-in for the AI APIs, so you can try rag_builder.py and
+the chat window without an API key, quota or internet connection.
+  - Gemini embeddings: fake but deterministic (same text -> same vector).
+  - Chat answers for Gemini / OpenAI / Claude / Ollama, normal or streamed
+    (SSE for the first three, NDJSON for Ollama) word by word.
+
+Usage:
+    python fake_ai_server.py --port 8765 --fail-rate 0.2
+Then set EMBEDDING_BASE_URL = "http://localhost:8765/v1beta" in rag_builder.py,
+or point the provider URLs at the top of script.py to "http://localhost:8765".
+
+Options:
+    --fail-rate 0.2   answer 20% of requests with '429 Too Many Requests'
+    --no-batch        pretend 'batchEmbedContents' does not exist (404)
+    --delay 0.05      seconds to wait before answering (simulate latency)
+    --token-delay 0.05  seconds between streamed words
+"""
+
+import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def fake_vector(text, dim):
+    """Deterministic pseudo-random vector for a text."""
+    seed = int(hashlib.sha256(text.encode("utf-8")).hexdigest()[:16], 16)
+    rng = random.Random(seed)
+    return [rng.uniform(-1.0, 1.0) for _ in range(dim)]
+
+
+def fake_answer(provider, question):
+    return "Fake {} answer. You asked: '{}'. Step 1: open the view. Step 2: click the tool.".format(
+        provider, question[-200:])
+
+
+class FakeAIHandler(BaseHTTPRequestHandler):
+    server_version = "FakeAI/1.0"
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real APIs
+
+    def log_message(self, fmt, *args):
+        if self.server.verbose:
+            BaseHTTPRequestHandler.log_message(self, fmt, *args)
+
+    def _send_json(self, status, data, headers=None):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _stream(self, content_type, chunks):
+        """Send chunks as they are 'generated' (connection closes at the end)."""
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        for chunk in chunks:
+            self.wfile.write(chunk.encode("utf-8"))
+            self.wfile.flush()
+            if self.server.token_delay:
+                time.sleep(self.server.token_delay)
+
+    def _sse(self, events):
+        self._stream("text/event-stream", ("data: {}\n\n".format(
+            e if isinstance(e, str) else json.dumps(e)) for e in events))
+
+    def _words(self, text):
+        words = text.split(" ")
+        return [w + (" " if i < len(words) - 1 else "") for i, w in enumerate(words)]
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length).decode("utf-8") or "{}")
+
+    def do_POST(self):
+        srv = self.server
+        with srv.lock:
+            srv.request_count += 1
+        payload = self._read_json()
+        if srv.delay:
+            time.sleep(srv.delay)
+
+        if srv.fail_rate and random.random() < srv.fail_rate:
+            return self._send_json(429, {"error": {"code": 429, "message": "Resource exhausted (fake)."}},
+                                   {"Retry-After": "0.1"})
+
+        path = self.path.split("?", 1)[0]
+        if path.endswith(":embedContent"):
+            text = payload["content"]["parts"][0]["text"]
+            return self._send_json(200, {"embedding": {"values": fake_vector(text, srv.dim)}})
+
+        if path.endswith(":batchEmbedContents"):
+            if srv.no_batch:
+                return self._send_json(404, {"error": {"code": 404, "message": "Not found (fake)."}})
+            with srv.lock:
+                srv.batch_count += 1
+            values = [fake_vector(r["content"]["parts"][0]["text"], srv.dim) for r in payload["requests"]]
+            return self._send_json(200, {"embeddings": [{"values": v} for v in values]})
+
+        # --- Chat endpoints ---
+        if path.endswith(":generateContent") or path.endswith(":streamGenerateContent"):
+            answer = fake_answer("Gemini", payload["contents"][-1]["parts"][0]["text"])
+            if path.endswith(":streamGenerateContent"):
+                return self._sse({"candidates": [{"content": {"parts": [{"text": w}], "role": "model"}}]}
+                                 for w in self._words(answer))
+            return self._send_json(200, {"candidates": [{"content": {"parts": [{"text": answer}], "role": "model"}}]})
+
+        if path.endswith("/chat/completions"):
+            answer = fake_answer("OpenAI", payload["messages"][-1]["content"])
+            if payload.get("stream"):
+                events = [{"choices": [{"delta": {"content": w}}]} for w in self._words(answer)]
+                return self._sse(events + ["[DONE]"])
+            return self._send_json(200, {"choices": [{"message": {"role": "assistant", "content": answer}}]})
+
+        if path.endswith("/messages"):
+            answer = fake_answer("Claude", payload["messages"][-1]["content"])
+            if payload.get("stream"):
+                events = [{"type": "message_start"}, {"type": "content_block_start", "index": 0}]
+                events += [{"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": w}}
+                           for w in self._words(answer)]
+                events += [{"type": "content_block_stop", "index": 0}, {"type": "message_stop"}]
+                return self._sse(events)
+            return self._send_json(200, {"content": [{"type": "text", "text": answer}]})
+
+        if path.endswith("/api/chat"):
+            answer = fake_answer("Ollama", payload["messages"][-1]["content"])
+            answer += " ({} earlier messages)".format(len(payload["messages"]) - 2)
+            if payload.get("stream", True):
+                lines = [json.dumps({"message": {"role": "assistant", "content": w}, "done": False}) + "\n"
+                         for w in self._words(answer)]
+                return self._stream("application/x-ndjson", lines + [json.dumps({"done": True}) + "\n"])
+            return self._send_json(200, {"message": {"role": "assistant", "content": answer}, "done": True})
+
+        if path.endswith("/api/generate"):
+            answer = fake_answer("Ollama", payload.get("prompt", ""))
+            if payload.get("stream", True):
+                lines = [json.dumps({"response": w, "done": False}) + "\n" for w in self._words(answer)]
+                return self._stream("application/x-ndjson", lines + [json.dumps({"response": "", "done": True}) + "\n"])
+            return self._send_json(200, {"response": answer, "done": True})
+
+        self._send_json(404, {"error": {"code": 404, "message": "Unknown path: " + path}})
+
+
+def make_server(port=8765, dim=768, fail_rate=0.0, no_batch=False, delay=0.0, token_delay=0.0, verbose=False):
+    server = ThreadingHTTPServer(("127.0.0.1", port), FakeAIHandler)
+    server.dim = dim
+    server.fail_rate = fail_rate
+    server.no_batch = no_batch
+    server.delay = delay
+    server.token_delay = token_delay
+    server.verbose = verbose
+    server.lock = threading.Lock()
+    server.request_count = 0
+    server.batch_count = 0
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake Gemini-style AI server for offline testing.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--no-batch", action="store_true")
+    parser.add_argument("--delay", type=float, default=0.0)
+    parser.add_argument("--token-delay", type=float, default=0.05)
+    args = parser.parse_args()
+
+    server = make_server(args.port, args.dim, args.fail_rate, args.no_batch, args.delay,
+                         args.token_delay, verbose=True)
+    print("Fake AI server running on http://127.0.0.1:{} (Ctrl+C to stop)".format(args.port))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
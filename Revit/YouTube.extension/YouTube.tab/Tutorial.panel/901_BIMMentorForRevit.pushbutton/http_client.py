@@ -0,0 +1,263 @@
+# -*- coding: utf-8 -*-
+"""Revit Usage Chatbox - Small Pooled HTTP Client.
+A minimal 'requests'-style post() with pluggable transports:
+  - DotNetTransport: HttpWebRequest (IronPython / pyRevit). Keep-alive
+    connections are reused between calls, timeouts are really applied and
+    the real HTTP status code is reported.
+  - PythonTransport: http.client with a small connection pool (CPython).
+  - StubTransport: answers from a Python function, for testing offline.
+Failures before a response arrives (refused, DNS, timeout, bad URL, dropped
+connection) come back as status_code 0 instead of raising.
+Works on both IronPython 2.7 and CPython 3.
+"""
+
+import json
+import time
+import socket
+import threading
+
+try:
+    import httplib as http_lib                 # IronPython 2.7
+    from urlparse import urlsplit
+except ImportError:
+    import http.client as http_lib             # CPython 3
+    from urllib.parse import urlsplit
+
+try:
+    from System.Net import HttpWebRequest, WebException, WebExceptionStatus
+    from System.Net import ServicePointManager, SecurityProtocolType
+    from System.IO import StreamReader
+    from System.Text import Encoding
+    HAS_DOTNET = True
+except ImportError:
+    HAS_DOTNET = False
+
+MAX_CONNECTIONS_PER_HOST = 8
+
+if HAS_DOTNET:
+    # Modern APIs need TLS 1.2. Skipping 'Expect: 100-continue' saves a round trip per POST.
+    ServicePointManager.SecurityProtocol = SecurityProtocolType.Tls12
+    ServicePointManager.Expect100Continue = False
+    ServicePointManager.DefaultConnectionLimit = max(ServicePointManager.DefaultConnectionLimit,
+                                                     MAX_CONNECTIONS_PER_HOST)
+
+
+class Response(object):
+    def __init__(self, status_code, text="", lines=None, elapsed=0.0):
+        self.status_code = status_code
+        self.text = text
+        self.elapsed = elapsed
+        self._lines = lines
+
+    @property
+    def ok(self):
+        return 200 <= self.status_code < 300
+
+    def json(self):
+        return json.loads(self.text)
+
+    def iter_lines(self):
+        """Body lines as they arrive (stream=True), or the buffered text split into lines."""
+        return self._lines if self._lines is not None else iter(self.text.splitlines())
+
+
+# --- [ TRANSPORTS ] ---
+# send(method, url, headers, body, timeout, stream) -> Response
+
+class DotNetTransport(object):
+    """HttpWebRequest with keep-alive. .NET pools the connections per host
+    (ServicePoint), as long as every response is read and closed."""
+
+    def send(self, method, url, headers, body, timeout, stream):
+        start = time.time()
+        try:
+            request = HttpWebRequest.Create(url)
+            request.Method = method
+            request.KeepAlive = True
+            request.Timeout = int(timeout * 1000)           # until the response starts
+            request.ReadWriteTimeout = int(timeout * 1000)  # between chunks of the body
+            for k, v in headers.items():
+                if k.lower() == "content-type":
+                    request.ContentType = v
+                else:
+                    request.Headers.Add(k, v)
+            data = Encoding.UTF8.GetBytes(body)
+            request.ContentLength = data.Length
+            request_stream = request.GetRequestStream()
+            request_stream.Write(data, 0, data.Length)
+            request_stream.Close()
+            response = request.GetResponse()
+        except WebException as e:
+            if e.Response is None:
+                message = "Timed out" if e.Status == WebExceptionStatus.Timeout else str(e.Message)
+                return Response(0, message, elapsed=time.time() - start)
+            # 4xx / 5xx: .NET throws, but the body explains the error
+            return Response(int(e.Response.StatusCode), self._read_all(e.Response), elapsed=time.time() - start)
+        except Exception as e:
+            # Not a WebException: bad URL (UriFormatException), dropped stream (IOException),
+            # disposed connection (ObjectDisposedException)...
+            return Response(0, str(e), elapsed=time.time() - start)
+
+        status = int(response.StatusCode)
+        if not stream:
+            return Response(status, self._read_all(response), elapsed=time.time() - start)
+
+        def read_lines():
+            reader = StreamReader(response.GetResponseStream(), Encoding.UTF8)
+            try:
+                while True:
+                    line = reader.ReadLine()
+                    if line is None:
+                        break
+                    yield line
+            finally:
+                reader.Close()
+                response.Close()
+        return Response(status, "", read_lines(), elapsed=time.time() - start)
+
+    @staticmethod
+    def _read_all(response):
+        reader = StreamReader(response.GetResponseStream(), Encoding.UTF8)
+        try:
+            return reader.ReadToEnd()
+        finally:
+            reader.Close()
+            response.Close()
+
+
+class PythonTransport(object):
+    """http.client with up to MAX_CONNECTIONS_PER_HOST idle keep-alive connections per host."""
+
+    def __init__(self):
+        self._pool = {}
+        self._lock = threading.Lock()
+
+    def _acquire(self, key, timeout):
+        with self._lock:
+            idle = self._pool.get(key)
+            conn = idle.pop() if idle else None
+        if conn is not None:
+            conn.timeout = timeout
+            if conn.sock is not None:
+                conn.sock.settimeout(timeout)
+            return conn, True
+        scheme, netloc = key
+        cls = http_lib.HTTPSConnection if scheme == "https" else http_lib.HTTPConnection
+        return cls(netloc, timeout=timeout), False
+
+    def _release(self, key, conn, response):
+        if response.will_close:
+            conn.close()
+            return
+        with self._lock:
+            idle = self._pool.setdefault(key, [])
+            if len(idle) < MAX_CONNECTIONS_PER_HOST:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def send(self, method, url, headers, body, timeout, stream):
+        start = time.time()
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.netloc)
+        path = (parts.path or "/") + ("?" + parts.query if parts.query else "")
+        while True:
+            conn, reused = self._acquire(key, timeout)
+            try:
+                conn.request(method, path, body.encode("utf-8"), headers)
+                response = conn.getresponse()
+                break
+            except (socket.error, http_lib.HTTPException) as e:
+                conn.close()
+                if not reused:
+                    message = "Timed out" if isinstance(e, socket.timeout) else str(e)
+                    return Response(0, message, elapsed=time.time() - start)
+                # The server closed an idle pooled connection: retry on a fresh one
+
+        if not stream or response.status != 200:
+            # An error is never streamed: read its body (it explains the error) and release
+            text = response.read().decode("utf-8")
+            self._release(key, conn, response)
+            return Response(response.status, text, elapsed=time.time() - start)
+
+        def read_lines():
+            finished = False
+            try:
+                while True:
+                    line = response.readline()
+                    if not line:
+                        finished = True
+                        break
+                    yield line.decode("utf-8").rstrip("\r\n")
+            finally:
+                if finished:
+                    self._release(key, conn, response)
+                else:
+                    conn.close()  # stopped early: the rest of the body is still on the socket
+        return Response(response.status, "", read_lines(), elapsed=time.time() - start)
+
+
+class StubTransport(object):
+    """Offline transport for tests: handler(method, url, headers, payload) returns
+    (status, body), where body is a dict (sent as JSON), text, or a list of lines
+    (streamed). Every request is recorded in .requests.
+    """
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.requests = []
+
+    def send(self, method, url, headers, body, timeout, stream):
+        payload = json.loads(body) if body else None
+        self.requests.append({"method": method, "url": url, "headers": headers,
+                              "payload": payload, "timeout": timeout, "stream": stream})
+        status, result = self.handler(method, url, headers, payload)
+        if isinstance(result, list):
+            return Response(status, "\n".join(result), iter(result) if stream else None)
+        if isinstance(result, dict):
+            result = json.dumps(result)
+        return Response(status, result)
+
+
+def default_transport():
+    return DotNetTransport() if HAS_DOTNET else PythonTransport()
+
+
+class HttpClient(object):
+    """requests-style post() on top of a transport (shared, thread-safe)."""
+
+    def __init__(self, transport=None, default_timeout=30):
+        self.transport = transport or default_transport()
+        self.default_timeout = default_timeout
+
+    def post(self, url, json=None, headers=None, timeout=None, stream=False):
+        all_headers = {"Content-Type": "application/json"}
+        all_headers.update(headers or {})
+        body = _dumps(json) if json is not None else ""
+        return self.transport.send("POST", url, all_headers, body, timeout or self.default_timeout, stream)
+
+
+def _dumps(payload):
+    # 'json' is a post() argument name (like requests), so the module is used from here
+    return json.dumps(payload)
+
+
+class EndpointResolver(object):
+    """Remembers which API version works for each model, so a fallback
+    (e.g. Gemini v1 -> v1beta) is only paid once per session."""
+
+    def __init__(self, versions):
+        self.versions = tuple(versions)
+        self._known = {}
+
+    def candidates(self, model):
+        known = self._known.get(model)
+        if known:
+            return (known,)
+        return self.versions
+
+    def remember(self, model, version):
+        self._known[model] = version
+
+    def forget(self, model):
+        self._known.pop(model, None)
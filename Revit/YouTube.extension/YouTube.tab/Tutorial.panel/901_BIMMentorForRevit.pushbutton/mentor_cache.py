@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""Revit Usage Chatbox - Local Caches for repeated questions.
+  - EmbeddingCache: remembers question vectors (LRU), keyed by the normalised
+    question text, so "How to set up levels?" and "how to set up levels"
+    never pay for a second embedding call.
+  - AnswerCache: remembers AI answers keyed by (provider, model, prompt hash,
+    knowledge base version), with an expiry time (TTL) and a size limit.
+Both are saved as small JSON files next to the script, so they survive
+closing Revit. Works on both IronPython 2.7 and CPython 3.
+"""
+
+import os
+import io
+import re
+import json
+import time
+import array
+import base64
+import hashlib
+from collections import OrderedDict
+
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_query(text):
+    """'  How to set up LEVELS? ' -> 'how to set up levels'"""
+    return _SPACE_RE.sub(" ", text.lower()).strip().strip("?!. ")
+
+def sha256(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def kb_version(*paths):
+    """A cheap version stamp for the knowledge base: size + modified time of its files.
+    Rebuilding the knowledge base changes it, which retires old cached answers.
+    """
+    parts = []
+    for path in paths:
+        if path and os.path.exists(path):
+            stat = os.stat(path)
+            parts.append("{}:{}".format(stat.st_size, int(stat.st_mtime)))
+    return sha256("|".join(parts))[:16] if parts else "none"
+
+def _pack_vector(vector):
+    # float32 + base64 is ~4x smaller than a JSON list of floats
+    values = array.array("f", vector)
+    raw = values.tobytes() if hasattr(values, "tobytes") else values.tostring()
+    return base64.b64encode(raw).decode("ascii")
+
+def _unpack_vector(text):
+    values = array.array("f")
+    raw = base64.b64decode(text)
+    if hasattr(values, "frombytes"):
+        values.frombytes(raw)
+    else:
+        values.fromstring(raw)
+    return list(values)
+
+
+class _JsonCache(object):
+    """OrderedDict (oldest first) persisted to a JSON file, with hit/miss counters."""
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        if path and os.path.exists(path):
+            try:
+                with io.open(path, "r", encoding="utf-8") as f:
+                    for key, value in json.load(f):
+                        self.entries[key] = value
+            except Exception as e:
+                print("Cache load error ({}): {}".format(os.path.basename(path), e))
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _touch(self, key):
+        # Move to the 'most recently used' end
+        value = self.entries.pop(key)
+        self.entries[key] = value
+        return value
+
+    def save(self):
+        if not self.path:
+            return
+        try:
+            with open(self.path, "w") as f:
+                f.write(json.dumps(list(self.entries.items())))
+        except Exception as e:
+            print("Cache save error ({}): {}".format(os.path.basename(self.path), e))
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = self.misses = 0
+        self.save()
+
+    def stats_text(self, label):
+        total = self.hits + self.misses
+        rate = (100.0 * self.hits / total) if total else 0.0
+        return "{}: {} hits / {} misses ({:.0f}%)".format(label, self.hits, self.misses, rate)
+
+
+class EmbeddingCache(_JsonCache):
+    """LRU of question vectors, keyed by model + normalised question."""
+
+    def __init__(self, path, max_items=200):
+        _JsonCache.__init__(self, path)
+        self.max_items = max_items
+
+    def _key(self, model, text):
+        return sha256(model + "\n" + normalize_query(text))
+
+    def get(self, model, text):
+        key = self._key(model, text)
+        if key in self.entries:
+            self.hits += 1
+            return _unpack_vector(self._touch(key))
+        self.misses += 1
+        return None
+
+    def put(self, model, text, vector):
+        self.entries[self._key(model, text)] = _pack_vector(vector)
+        self._touch(self._key(model, text))
+        while len(self.entries) > self.max_items:
+            self.entries.popitem(last=False)
+
+
+class AnswerCache(_JsonCache):
+    """AI answers keyed by (provider, model, prompt hash, KB version).
+    Entries expire after ttl_seconds; the least recently used ones are
+    evicted once the cache grows past max_bytes.
+    """
+
+    def __init__(self, path, ttl_seconds=7 * 24 * 3600, max_bytes=5 * 1024 * 1024):
+        _JsonCache.__init__(self, path)
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def make_key(provider, model, prompt, version):
+        return sha256(u"{}\n{}\n{}\n{}".format(provider, model, version, sha256(prompt)))
+
+    def get(self, key):
+        return self.get_first([key])[1]
+
+    def get_first(self, keys):
+        """(key, answer) for the first of these keys with a cached answer, or (None, None).
+        Counts as ONE hit or miss, however many keys are tried."""
+        for key in keys:
+            entry = self.entries.get(key)
+            if entry and time.time() - entry["created"] <= self.ttl_seconds:
+                self.hits += 1
+                return key, self._touch(key)["answer"]
+            if entry:
+                del self.entries[key]  # expired
+        self.misses += 1
+        return None, None
+
+    def put(self, key, answer):
+        self.entries[key] = {"answer": answer, "created": time.time(), "size": len(answer.encode("utf-8"))}
+        self._touch(key)
+        self.evict()
+
+    def evict(self):
+        """Drop expired answers, then the least recently used until under max_bytes."""
+        now = time.time()
+        for key in [k for k, e in self.entries.items() if now - e["created"] > self.ttl_seconds]:
+            del self.entries[key]
+        total = sum(e["size"] for e in self.entries.values())
+        while total > self.max_bytes and self.entries:
+            _, oldest = self.entries.popitem(last=False)
+            total -= oldest["size"]
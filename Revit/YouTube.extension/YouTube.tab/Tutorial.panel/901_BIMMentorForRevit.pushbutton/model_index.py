@@ -0,0 +1,315 @@
+# -*- coding: utf-8 -*-
+"""Revit Usage Chatbox - Live Model Index.
+Lets BIM Mentor answer questions about the OPEN model ("which wall types
+break our naming standard?", "which sheets are on Level 2?"), not only
+about the manual:
+  - Element types, sheets, levels and rooms are snapshotted into small
+    records (category, name, parameter values) and keyword (BM25) indexed.
+  - The index is saved per document. Next time only the elements changed
+    since the saved version are read again from Revit.
+  - The best matching records are added to the prompt as extra context.
+Reading the model is done by an 'element source': RevitElementSource in
+model_source.py inside Revit, FakeElementSource here for testing.
+Works on both IronPython 2.7 and CPython 3.
+"""
+
+import os
+import io
+import json
+import hashlib
+import threading
+
+from bm25_index import Bm25Index
+from chunker import count_tokens
+
+INDEX_VERSION = 1
+MODEL_CONTEXT_TOKENS = 600  # Model records put into the prompt (on top of the manual context)
+MAX_RECORDS = 40            # Never more records than this per question
+SUMMARY_CATEGORIES = 12     # Categories listed in the model summary
+
+# A record is a plain dict:
+#   {"id": 123, "kind": "Type", "category": "Walls", "name": "Basic Wall: Generic - 200mm",
+#    "params": {"Function": "Exterior", "Width": "200"}}
+# Element instances are not indexed one by one; they only count towards their type.
+
+
+def record_text(record, instances=None):
+    """One searchable line: 'Type: Basic Wall: Generic - 200mm | Walls | Function=Exterior | Instances: 45'"""
+    parts = [u"{}: {}".format(record.get("kind", ""), record.get("name", ""))]
+    if record.get("category"):
+        parts.append(record["category"])
+    params = record.get("params") or {}
+    if params:
+        parts.append(u"; ".join(u"{}={}".format(k, params[k]) for k in sorted(params)))
+    if instances is not None:
+        parts.append(u"Instances: {}".format(instances))
+    return u" | ".join(parts)
+
+
+def document_key(title, path=""):
+    """File name of a document's saved index (same model, same file)."""
+    return hashlib.sha1((path or title).encode("utf-8")).hexdigest()[:16]
+
+
+class ModelIndex(object):
+    """Records of one document + instance counts, searchable with BM25."""
+
+    def __init__(self):
+        self.records = {}         # element id -> record
+        self.instance_types = {}  # instance id -> type id (for 'Instances: n')
+        self.doc_version = None   # source version the index matches
+        self.recheck = []         # ids with unsaved edits: read again next time
+        self._counts = None
+        self._search = None       # (ids, Bm25Index), rebuilt after changes
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.records)
+
+    def _changed(self):
+        self._counts = None
+        self._search = None
+
+    def instance_counts(self):
+        if self._counts is None:
+            counts = {}
+            for type_id in self.instance_types.values():
+                counts[type_id] = counts.get(type_id, 0) + 1
+            self._counts = counts
+        return self._counts
+
+    def text(self, record):
+        count = self.instance_counts().get(record["id"], 0) if record.get("kind") == "Type" else None
+        return record_text(record, count)
+
+    def rebuild(self, records, instance_types):
+        with self._lock:
+            self.records = dict((r["id"], r) for r in records)
+            self.instance_types = dict(instance_types)
+            self._changed()
+        return len(self.records)
+
+    def apply_changes(self, records, instance_types, deleted_ids=()):
+        """Merge re-read elements. Returns (added, updated, removed) record counts."""
+        added = updated = removed = 0
+        with self._lock:
+            for element_id in deleted_ids:
+                if self.records.pop(element_id, None) is not None:
+                    removed += 1
+                self.instance_types.pop(element_id, None)
+            for record in records:
+                old = self.records.get(record["id"])
+                if old is None:
+                    added += 1
+                elif old != record:
+                    updated += 1
+                self.records[record["id"]] = record
+            self.instance_types.update(instance_types)
+            self._changed()
+        return added, updated, removed
+
+    def search(self, question, top_k=MAX_RECORDS):
+        """The top_k (score, record) pairs for the question, best first."""
+        with self._lock:
+            if self._search is None:
+                ids = sorted(self.records)
+                self._search = (ids, Bm25Index.build(self.text(self.records[i]) for i in ids))
+            ids, bm25 = self._search
+            return [(score, self.records[ids[row]]) for score, row in bm25.search(question, top_k)]
+
+    def summary_text(self):
+        """'Model: 12 Levels, 40 Sheets, 310 Types (Walls 35, Doors 20, ...)'"""
+        with self._lock:
+            kinds, categories = {}, {}
+            for record in self.records.values():
+                kinds[record["kind"]] = kinds.get(record["kind"], 0) + 1
+                if record["kind"] == "Type" and record.get("category"):
+                    categories[record["category"]] = categories.get(record["category"], 0) + 1
+        if not kinds:
+            return ""
+        text = "Model: " + ", ".join("{} {}s".format(kinds[k], k) for k in sorted(kinds))
+        top = sorted(categories.items(), key=lambda pair: (-pair[1], pair[0]))[:SUMMARY_CATEGORIES]
+        if top:
+            text += u" (types: " + u", ".join(u"{} {}".format(name, n) for name, n in top) + ")"
+        return text
+
+    def context_text(self, question, max_tokens=MODEL_CONTEXT_TOKENS, top_k=MAX_RECORDS):
+        """Summary + best matching records, within max_tokens."""
+        lines = [self.summary_text()]
+        used = count_tokens(lines[0])
+        for _, record in self.search(question, top_k):
+            line = u"- " + self.text(record)
+            size = count_tokens(line)
+            if used + size > max_tokens:
+                break
+            lines.append(line)
+            used += size
+        return u"\n".join(line for line in lines if line)
+
+    # --- [ SAVE / LOAD ] ---
+
+    def save(self, path):
+        with self._lock:
+            data = {"version": INDEX_VERSION, "doc_version": self.doc_version, "recheck": self.recheck,
+                    "records": list(self.records.values()),
+                    "instance_types": [[k, v] for k, v in self.instance_types.items()]}
+        folder = os.path.dirname(path)
+        if folder and not os.path.isdir(folder):
+            os.makedirs(folder)
+        with open(path, "w") as f:
+            f.write(json.dumps(data))
+
+    @classmethod
+    def load(cls, path):
+        """The saved index, or an empty one if missing or unreadable."""
+        index = cls()
+        if not os.path.exists(path):
+            return index
+        try:
+            with io.open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != INDEX_VERSION:
+                return index
+            index.rebuild(data["records"], data["instance_types"])
+            index.doc_version = data.get("doc_version")
+            index.recheck = data.get("recheck", [])
+        except Exception as e:
+            print("Model index load error: {}".format(e))
+        return index
+
+
+class ModelIndexer(object):
+    """Keeps a ModelIndex in step with an element source.
+    snapshot() reads the model (it must run where the Revit API may be used,
+    i.e. the UI thread); apply(update) updates the index (any thread).
+    Both can run at the same time: the index state they share is locked.
+    """
+
+    def __init__(self, source, path=None):
+        self.source = source
+        self.path = path
+        self.index = ModelIndex.load(path) if path else ModelIndex()
+        self._lock = threading.Lock()
+
+    def snapshot(self):
+        """Read what changed since the index was built: None if nothing did,
+        else an update dict for apply()."""
+        with self._lock:
+            indexed, doc_version, recheck = len(self.index), self.index.doc_version, list(self.index.recheck)
+        version = self.source.version()
+        changes = None
+        if indexed and doc_version is not None and version is not None:
+            changes = self.source.changes_since(doc_version)
+        if changes is None:
+            records, instance_types = self.source.all_records()
+            return {"full": True, "records": records, "instance_types": instance_types,
+                    "deleted": [], "version": version, "recheck": self._unsaved_ids(version)}
+
+        changed, deleted = changes
+        ids = set(changed) | set(recheck)
+        if not ids and not deleted and version == doc_version:
+            return None
+        records, instance_types = self.source.read(sorted(ids))
+        # An id that was asked for but not read back has been deleted (or is no longer indexed)
+        read = set(r["id"] for r in records) | set(instance_types)
+        deleted = set(deleted) | (ids - read)
+        return {"full": False, "records": records, "instance_types": instance_types,
+                "deleted": sorted(deleted), "version": version, "recheck": self._unsaved_ids(version)}
+
+    def _unsaved_ids(self, version):
+        """Ids edited since the last save. The edits may still be discarded, so
+        they are read again next time. None = unknown (rebuild next time)."""
+        if version is None or not self.source.is_modified():
+            return []
+        changes = self.source.changes_since(version)
+        if changes is None:
+            return None
+        return sorted(set(changes[0]) | set(changes[1]))
+
+    def apply(self, update):
+        """Apply a snapshot() result and save. Returns a short status text."""
+        if update is None:
+            return "{} model elements, up to date".format(len(self.index))
+        with self._lock:
+            if update["full"]:
+                self.index.rebuild(update["records"], update["instance_types"])
+                status = "{} model elements indexed".format(len(self.index))
+            else:
+                added, updated, removed = self.index.apply_changes(
+                    update["records"], update["instance_types"], update["deleted"])
+                status = "{} model elements, {} added, {} updated, {} removed".format(
+                    len(self.index), added, updated, removed)
+            recheck = update["recheck"]
+            self.index.doc_version = update["version"] if recheck is not None else None
+            self.index.recheck = recheck or []
+        if self.path:
+            try:
+                self.index.save(self.path)
+            except Exception as e:
+                print("Model index save error: {}".format(e))
+        return status
+
+    def refresh(self):
+        return self.apply(self.snapshot())
+
+
+def _copy(record):
+    return dict(record, params=dict(record.get("params") or {}))
+
+
+class FakeElementSource(object):
+    """In-memory element source, for testing the index outside Revit.
+    Edits are unsaved until save(), which starts a new version (like Revit).
+    """
+
+    def __init__(self, records=(), instance_types=None):
+        self.elements = dict((r["id"], _copy(r)) for r in records)
+        self.instances = dict(instance_types or {})
+        self._version = 1
+        self._log = {}         # version -> ids changed to reach it
+        self._unsaved = set()
+
+    def put(self, record):
+        self.elements[record["id"]] = _copy(record)
+        self._unsaved.add(record["id"])
+
+    def put_instance(self, instance_id, type_id):
+        self.instances[instance_id] = type_id
+        self._unsaved.add(instance_id)
+
+    def delete(self, element_id):
+        self.elements.pop(element_id, None)
+        self.instances.pop(element_id, None)
+        self._unsaved.add(element_id)
+
+    def save(self):
+        self._version += 1
+        self._log[self._version] = self._unsaved
+        self._unsaved = set()
+
+    # --- element source interface ---
+
+    def version(self):
+        return self._version
+
+    def is_modified(self):
+        return bool(self._unsaved)
+
+    def all_records(self):
+        return [_copy(r) for r in self.elements.values()], dict(self.instances)
+
+    def changes_since(self, version):
+        """(changed or added ids, deleted ids) since a saved version, unsaved edits
+        included, or None if the version is unknown."""
+        if version not in self._log and version != 1:
+            return None
+        ids = set(self._unsaved)
+        for v in range(version + 1, self._version + 1):
+            ids |= self._log.get(v, set())
+        deleted = [i for i in ids if i not in self.elements and i not in self.instances]
+        return [i for i in ids if i not in deleted], deleted
+
+    def read(self, ids):
+        records = [_copy(self.elements[i]) for i in ids if i in self.elements]
+        instance_types = dict((i, self.instances[i]) for i in ids if i in self.instances)
+        return records, instance_types
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""Revit Usage Chatbox - Reading the Open Model.
+The Revit side of model_index.py: turns element types, sheets, levels and
+rooms of a document into plain records, with bulk FilteredElementCollectors,
+never one query per element.
+Only call it from Revit's UI thread (the Revit API is not thread-safe).
+"""
+
+from Autodesk.Revit.DB import (FilteredElementCollector, BuiltInCategory, ElementId, Element,
+                               ElementType, ViewSheet, Level, StorageType, Document)
+
+from element_ids import id_value  # extension 'lib' folder
+
+MAX_PARAMS = 25        # Parameters kept per element
+MAX_VALUE_LENGTH = 80  # Longer values are cut
+
+
+def element_name(element):
+    try:
+        return element.Name
+    except AttributeError:
+        return Element.Name.__get__(element)  # ElementType.Name is hidden in IronPython
+
+
+def parameter_values(element, max_params=MAX_PARAMS):
+    """{parameter name: display value} of the filled-in parameters."""
+    values = {}
+    for p in element.Parameters:
+        if not p.HasValue:
+            continue
+        if p.StorageType == StorageType.String:
+            value = p.AsString()
+        else:
+            value = p.AsValueString()
+        if not value:
+            continue
+        values[p.Definition.Name] = value[:MAX_VALUE_LENGTH]
+    if len(values) > max_params:
+        values = dict((k, values[k]) for k in sorted(values)[:max_params])
+    return values
+
+
+class RevitElementSource(object):
+    """Element source for model_index.ModelIndexer, reading a Revit document."""
+
+    def __init__(self, doc):
+        self.doc = doc
+
+    def _record(self, element):
+        """The record of an indexed element, or None for anything else."""
+        if isinstance(element, ElementType):
+            if element.Category is None:
+                return None  # internal types (e.g. view families, line patterns)
+            family = getattr(element, "FamilyName", "")
+            name = element_name(element)
+            kind, label = "Type", u"{}: {}".format(family, name) if family else name
+        elif isinstance(element, ViewSheet):
+            kind, label = "Sheet", u"{} - {}".format(element.SheetNumber, element.Name)
+        elif isinstance(element, Level):
+            kind, label = "Level", element.Name
+        elif element.Category is not None and id_value(element.Category.Id) == int(BuiltInCategory.OST_Rooms):
+            kind, label = "Room", u"{} {}".format(element.Number, element_name(element))
+        else:
+            return None
+        return {"id": id_value(element.Id), "kind": kind,
+                "category": element.Category.Name if element.Category else "",
+                "name": label, "params": parameter_values(element)}
+
+    def _type_id(self, element):
+        """Type id of a model instance (for instance counts), or None."""
+        if isinstance(element, ElementType) or element.Category is None:
+            return None
+        type_id = element.GetTypeId()
+        return id_value(type_id) if type_id != ElementId.InvalidElementId else None
+
+    def _records(self, elements):
+        """(records, {instance id: type id}) of these elements. The one place both
+        all_records() and read() build them, so a full read and an update agree."""
+        records, instance_types = [], {}
+        for element in elements:
+            record = self._record(element)
+            if record is not None:
+                records.append(record)
+            type_id = self._type_id(element)
+            if type_id is not None:
+                instance_types[id_value(element.Id)] = type_id
+        return records, instance_types
+
+    # --- element source interface ---
+
+    def version(self):
+        """Changes every time the document is saved (Revit 2021+), None if unknown."""
+        try:
+            return str(Document.GetDocumentVersion(self.doc).VersionGUID)
+        except Exception:
+            return None
+
+    def is_modified(self):
+        return self.doc.IsModified
+
+    def changes_since(self, version):
+        """(created or modified ids, deleted ids) since a saved version (Revit 2023+),
+        None if Revit cannot tell."""
+        try:
+            from System import Guid
+            changed = self.doc.GetChangedElements(Guid(version))
+        except Exception:
+            return None
+        ids = [id_value(i) for i in changed.GetCreatedElementIds()]
+        ids.extend(id_value(i) for i in changed.GetModifiedElementIds())
+        return ids, [id_value(i) for i in changed.GetDeletedElementIds()]
+
+    def all_records(self):
+        """Every indexed element + {instance id: type id}, in two bulk collectors
+        (types, then instances: sheets, levels and rooms are instances too)."""
+        type_records, _ = self._records(FilteredElementCollector(self.doc).WhereElementIsElementType())
+        records, instance_types = self._records(FilteredElementCollector(self.doc).WhereElementIsNotElementType())
+        return type_records + records, instance_types
+
+    def read(self, ids):
+        """Records and instance types of these element ids (missing ones are skipped)."""
+        elements = (self.doc.GetElement(ElementId(element_id)) for element_id in ids)
+        return self._records(e for e in elements if e is not None)
@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+"""Revit Usage Chatbox - Provider Racing & Failover.
+Waiting 30 seconds for a provider that is down is no fun. The router:
+  - Failover: if the first provider answers with an error, the next one is
+    asked straight away.
+  - Hedging: if the first provider has not started answering within
+    hedge_after seconds, the next one is asked too. The first one to start
+    streaming wins; the other is cancelled.
+  - Statistics: latency (time to the first word) and errors per provider,
+    saved next to the script. Providers that keep failing are skipped for a
+    while, and 'prefer fastest' puts the quickest healthy one first.
+Works on both IronPython 2.7 and CPython 3.
+"""
+
+import os
+import io
+import json
+import time
+import threading
+
+try:
+    import Queue as queue  # IronPython 2.7
+except ImportError:
+    import queue
+
+from request_worker import CancelToken, CancelledError
+
+LATENCY_SMOOTHING = 0.3      # Weight of the newest sample in the moving average
+FAILURES_BEFORE_COOLDOWN = 2 # Consecutive failures before a provider is skipped
+COOLDOWN_SECONDS = 120       # How long it is skipped for
+
+
+class ProviderStats(object):
+    """Per-provider latency (moving average) and success/error counts."""
+
+    def __init__(self, path=None):
+        self.path = path
+        self.stats = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            try:
+                with io.open(path, "r", encoding="utf-8") as f:
+                    self.stats = json.load(f)
+            except Exception as e:
+                print("Provider stats load error: {}".format(e))
+
+    def _entry(self, name):
+        return self.stats.setdefault(name, {"latency": None, "ok": 0, "errors": 0, "streak": 0, "down_until": 0})
+
+    def record_success(self, name, latency):
+        with self._lock:
+            entry = self._entry(name)
+            previous = entry["latency"]
+            entry["latency"] = latency if previous is None else (
+                LATENCY_SMOOTHING * latency + (1 - LATENCY_SMOOTHING) * previous)
+            entry["ok"] += 1
+            entry["streak"] = 0
+            entry["down_until"] = 0
+
+    def record_failure(self, name):
+        with self._lock:
+            entry = self._entry(name)
+            entry["errors"] += 1
+            entry["streak"] += 1
+            if entry["streak"] >= FAILURES_BEFORE_COOLDOWN:
+                entry["down_until"] = time.time() + COOLDOWN_SECONDS
+
+    def healthy(self, name):
+        return self.stats.get(name, {}).get("down_until", 0) <= time.time()
+
+    def latency(self, name):
+        return self.stats.get(name, {}).get("latency")
+
+    def order(self, names, prefer_fastest=False):
+        """Healthy providers first (fastest first if prefer_fastest), then the
+        cooling-down ones as a last resort. Otherwise the given order is kept."""
+        def rank(pair):
+            index, name = pair
+            latency = self.latency(name)
+            speed = (latency if latency is not None else float("inf")) if prefer_fastest else 0
+            return (not self.healthy(name), speed, index)
+        return [name for _, name in sorted(enumerate(names), key=rank)]
+
+    def stats_text(self):
+        parts = []
+        for name in sorted(self.stats):
+            entry = self.stats[name]
+            latency = "{:.1f}s".format(entry["latency"]) if entry["latency"] is not None else "-"
+            state = "" if self.healthy(name) else " (paused)"
+            parts.append("{} {} {}ok/{}err{}".format(name, latency, entry["ok"], entry["errors"], state))
+        return "  |  ".join(parts)
+
+    def save(self):
+        if not self.path:
+            return
+        try:
+            with open(self.path, "w") as f:
+                f.write(json.dumps(self.stats))
+        except Exception as e:
+            print("Provider stats save error: {}".format(e))
+
+
+class _Attempt(object):
+    def __init__(self, name, call):
+        self.name = name
+        self.call = call
+        self.token = CancelToken()
+        self.started = time.time()
+        self.first_token = None
+
+
+class ProviderRouter(object):
+    """Ask several providers for one answer, racing and failing over between them.
+    is_error(text) tells whether a returned text is an error message.
+    """
+
+    def __init__(self, stats, is_error, hedge_after=8.0):
+        self.stats = stats
+        self.is_error = is_error
+        self.hedge_after = hedge_after
+
+    def ask(self, candidates, on_delta=None, token=None):
+        """candidates: [(name, call)] in order of preference, where
+        call(on_delta) returns the full answer text.
+        Returns (answer, name of the provider that gave it). If every provider
+        fails, returns the last error message (or raises the last exception).
+        """
+        events = queue.Queue()
+        waiting = list(candidates)
+        running = []
+        winner = None
+        last_error, last_name = None, None
+
+        def launch():
+            name, call = waiting.pop(0)
+            attempt = _Attempt(name, call)
+            running.append(attempt)
+            thread = threading.Thread(target=self._run, args=(attempt, events), name="Provider-" + name)
+            thread.daemon = True
+            thread.start()
+            return time.time() + self.hedge_after
+
+        hedge_at = launch()
+        while running:
+            if token is not None and token.cancelled:
+                for attempt in running:
+                    attempt.token.cancel()
+                raise CancelledError()
+            can_hedge = winner is None and waiting and self.hedge_after > 0
+            wait = max(0.01, min(0.25, hedge_at - time.time())) if can_hedge else 0.25
+            try:
+                kind, attempt, data = events.get(timeout=wait)
+            except queue.Empty:
+                if can_hedge and time.time() >= hedge_at:
+                    hedge_at = launch()  # first provider is slow: ask the next one as well
+                continue
+            if attempt.token.cancelled:
+                continue
+
+            if kind == "delta":
+                if winner is None:
+                    winner = attempt
+                    attempt.first_token = time.time()
+                    self._cancel_others(running, winner)
+                if attempt is winner and on_delta:
+                    try:
+                        on_delta(data)
+                    except CancelledError:
+                        attempt.token.cancel()  # the user cancelled the question
+                        raise
+                continue
+
+            running.remove(attempt)
+            if kind == "done" and not self.is_error(data):
+                latency = (attempt.first_token or time.time()) - attempt.started
+                self.stats.record_success(attempt.name, latency)
+                self._cancel_others(running, attempt)
+                return data, attempt.name
+
+            # Failed (error text or exception)
+            self.stats.record_failure(attempt.name)
+            last_error, last_name = data, attempt.name
+            if attempt is winner:
+                break  # failed half-way through an answer the user is already reading
+            if not running and waiting:
+                hedge_at = launch()  # failover: nothing else is running, try the next one now
+
+        if isinstance(last_error, Exception):
+            raise last_error
+        return last_error, last_name
+
+    @staticmethod
+    def _cancel_others(running, keep):
+        for attempt in running:
+            if attempt is not keep:
+                attempt.token.cancel()
+
+    @staticmethod
+    def _run(attempt, events):
+        def on_delta(piece):
+            attempt.token.check()
+            events.put(("delta", attempt, piece))
+        try:
+            events.put(("done", attempt, attempt.call(on_delta)))
+        except CancelledError:
+            pass
+        except Exception as e:
+            events.put(("error", attempt, e))
@@ -6,8 +6,12 @@ into an AI-ready vector database using the Gemini Embedding API.
 
 import os
 import json
-import time
-import requests
+
+from vector_store import save_store, load_store, quant_path
+from ann_index import IvfIndex, index_paths
+from embedding_pipeline import EmbeddingClient, EmbeddingCache, embed_texts
+from chunker import chunk_topics
+from bm25_index import Bm25Index
 
 # --- [ CONFIGURATION ] ---
 # Get your API key from: https://aistudio.google.com/app/apikey
@@ -16,28 +20,32 @@ GEMINI_API_KEY = "YOUR_GEMINI_API_KEY_HERE"
 INPUT_FILE = "revit_operations_manual.json"
 OUTPUT_FILE = "revit_knowledge.json"
 
+# Big knowledge bases (all standards, manuals, past RFIs...) also get an
+# approximate (IVF) index. Below this size exact search is already instant.
+ANN_MIN_TOPICS = 2000
+
+# Long manual pages are split into smaller chunks (heading-aware, overlapping)
+# so each vector stays sharp and the prompt sent to the AI stays small
+CHUNK_MAX_TOKENS = 200
+CHUNK_OVERLAP_TOKENS = 40
+
+# "int8" also writes a 4x smaller copy of the vectors that Revit scans first
+# (the best matches are re-checked in full precision). None = float32 only.
+VECTOR_QUANTIZATION = "int8"
+
+# --- [ EMBEDDING SPEED SETTINGS ] ---
+# Point this at "http://localhost:8765/v1beta" to test with fake_ai_server.py
+EMBEDDING_BASE_URL = "https://generativelanguage.googleapis.com/v1beta"
+EMBEDDING_MODEL = "models/gemini-embedding-001"
+BATCH_SIZE = 100            # Texts per request (Gemini accepts up to 100)
+MAX_WORKERS = 4             # Requests running at the same time
+REQUESTS_PER_MINUTE = 100   # Stay within your quota (free tier friendly)
+CACHE_FILE = "revit_knowledge.embcache.jsonl"  # Only new/edited topics are re-embedded
+
 cwd = os.path.dirname(__file__)
 _INPUT_FILE = os.path.join(cwd, INPUT_FILE)
 _OUTPUT_FILE = os.path.join(cwd, OUTPUT_FILE)
-
-def get_embedding(text, api_key):
-    """Call Google Gemini API to get a 768-dimensional vector."""
-    url = "https://generativelanguage.googleapis.com/v1beta/models/gemini-embedding-001:embedContent?key=" + api_key
-    payload = {
-        "model": "models/gemini-embedding-001",
-        "content": {"parts": [{"text": text}]},
-        "taskType": "RETRIEVAL_DOCUMENT"
-    }
-    try:
-        response = requests.post(url, json=payload, timeout=30)
-        if response.status_code == 200:
-            return response.json()["embedding"]["values"]
-        else:
-            print(f"  ❌ Embedding Error: {response.text}")
-            return None
-    except Exception as e:
-        print(f"  ❌ Connection Error: {e}")
-        return None
+_CACHE_FILE = os.path.join(cwd, CACHE_FILE)
 
 def build_rag():
     if GEMINI_API_KEY == "YOUR_GEMINI_API_KEY_HERE":
@@ -54,36 +62,68 @@ def build_rag():
 
     print(f"🚀 Found {len(source_data)} standard topics. Starting vectorization...")
     
-    knowledge_base = []
-
-    for item in source_data:
-        title = item.get("title", "Untitled")
-        text = item.get("text", "")
+    # 2. Vectorize new/edited topics in batches (parallel, rate limited, cached)
+    topics = [(item.get("title", "Untitled"), item.get("text", "")) for item in source_data]
+    topics = [(title, text) for title, text in topics if text]
 
-        if not text:
-            continue
+    # Short topics stay as one chunk (one standard = one vector)
+    chunks = chunk_topics(topics, CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS)
+    print(f"✂️ Split into {len(chunks)} chunks (max {CHUNK_MAX_TOKENS} tokens each).")
 
-        print(f"📦 Vectorizing: {title}...")
+    client = EmbeddingClient(GEMINI_API_KEY, model=EMBEDDING_MODEL, base_url=EMBEDDING_BASE_URL,
+                             requests_per_minute=REQUESTS_PER_MINUTE)
+    vectors = embed_texts(client, [chunk["text"] for chunk in chunks], EmbeddingCache(_CACHE_FILE),
+                          batch_size=BATCH_SIZE, max_workers=MAX_WORKERS)
 
-        # We can also split long text into smaller chunks here if needed
-        # But for the tutorial, we'll keep it simple (one standard = one vector)
-        vector = get_embedding(text, GEMINI_API_KEY)
-        
+    knowledge_base = []
+    for chunk in chunks:
+        vector = vectors.get(chunk["text"])
         if vector:
-            knowledge_base.append({
-                "title": title,
-                "text": text,
-                "vector": vector
-            })
-            
-        time.sleep(0.5) # Gentle throttling to stay within free tier limits
-
-    # 2. Save the AI-ready version
+            chunk["vector"] = vector
+            knowledge_base.append(chunk)
+
+    missing = len(chunks) - len(knowledge_base)
+    if missing:
+        print(f"⚠️ {missing} chunks failed. Run the builder again to retry only those.")
+
+    # 3. Save the vectors as a binary store (pre-normalised float32 matrix + metadata sidecar)
+    # Revit loads this once per session instead of parsing thousands of JSON numbers
+    vec_path, meta_path = save_store(_OUTPUT_FILE, knowledge_base, quantization=VECTOR_QUANTIZATION)
+
+    # 4. Save a readable copy of the chunks (the vectors only live in the binary store)
     with open(_OUTPUT_FILE, 'w', encoding='utf-8') as f:
-        json.dump(knowledge_base, f, ensure_ascii=False)
+        json.dump([dict((k, v) for k, v in chunk.items() if k != "vector") for chunk in knowledge_base],
+                  f, ensure_ascii=False, indent=1)
+
+    # Keyword (BM25) index, so keyword questions need no embedding call at all
+    Bm25Index.from_items(knowledge_base).save(_OUTPUT_FILE)
+
+    # 5. Cluster the vectors for approximate search (only worth it for large bases)
+    ann_lists = 0
+    if len(knowledge_base) >= ANN_MIN_TOPICS:
+        print("🧭 Building ANN index (k-means clusters)...")
+        index = IvfIndex.build(load_store(_OUTPUT_FILE))
+        index.save(_OUTPUT_FILE)
+        ann_lists = len(index.lists)
+    else:
+        # Remove an index left over from an older, bigger build
+        for path in index_paths(_OUTPUT_FILE):
+            if os.path.exists(path):
+                os.remove(path)
 
     print(f"\n✅ COMPLETED!")
-    print(f"Generated '{OUTPUT_FILE}' with {len(knowledge_base)} AI-ready topics.")
+    print(f"Generated '{OUTPUT_FILE}' with {len(knowledge_base)} chunks from {len(topics)} topics (readable copy, no vectors).")
+    print(f"Generated '{os.path.basename(vec_path)}' + '{os.path.basename(meta_path)}' (fast vector store).")
+    if VECTOR_QUANTIZATION:
+        q_path = quant_path(_OUTPUT_FILE)
+        q_kb, vec_kb = os.path.getsize(q_path) / 1024, os.path.getsize(vec_path) / 1024
+        # The .q8 is an extra copy: searches scan less, the files take more room
+        print(f"Generated '{os.path.basename(q_path)}' ({VECTOR_QUANTIZATION}): each search scans "
+              f"{q_kb:.0f} KB instead of {vec_kb:.0f} KB; on disk {q_kb + vec_kb:.0f} KB "
+              f"(the float32 file is kept for the final re-check).")
+    print(f"Generated keyword (BM25) index.")
+    if ann_lists:
+        print(f"Generated ANN index with {ann_lists} clusters.")
     print("👉 You can now run the BIM Mentor inside Revit!")
 
 if __name__ == "__main__":
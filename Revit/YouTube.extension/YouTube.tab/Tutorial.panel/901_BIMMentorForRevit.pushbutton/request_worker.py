@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""Revit Usage Chatbox - Background Request Worker.
+Searching the knowledge base and waiting for the AI can take 20+ seconds.
+Doing that on the WPF UI thread freezes the whole Revit window, so questions
+are queued here and answered one at a time on a background thread.
+  - dispatch(fn) brings results back to the UI thread (in Revit:
+    Dispatcher.BeginInvoke). Job code never touches WPF controls directly.
+  - Every job has a CancelToken. Cancelling hides its result at once; the job
+    itself stops at its next token.check() (e.g. the next streamed piece).
+Only for work that does NOT use the Revit API, which must stay on Revit's thread.
+Works on both IronPython 2.7 and CPython 3.
+"""
+
+import threading
+
+
+class CancelledError(Exception):
+    """Raised inside a job once its token has been cancelled."""
+
+
+class CancelToken(object):
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def check(self):
+        if self.cancelled:
+            raise CancelledError()
+
+
+class Job(object):
+    """One queued request.
+    work(job) runs on the worker thread and returns the result.
+    on_start(job), on_done(job, result), on_error(job, error) and
+    on_cancel(job) run on the UI thread.
+    """
+
+    def __init__(self, label, work, on_start=None, on_done=None, on_error=None, on_cancel=None):
+        self.label = label
+        self.work = work
+        self.on_start = on_start
+        self.on_done = on_done
+        self.on_error = on_error
+        self.on_cancel = on_cancel
+        self.token = CancelToken()
+        self.worker = None
+
+    def ui(self, fn, *args):
+        """Run fn(*args) on the UI thread, unless the job is cancelled by then."""
+        def run():
+            if not self.token.cancelled:
+                fn(*args)
+        self.worker.dispatch(run)
+
+
+class RequestWorker(object):
+    """A single background thread answering queued jobs in order.
+    on_change() runs on the UI thread whenever the running/queued jobs change.
+    """
+
+    def __init__(self, dispatch, max_pending=5, on_change=None):
+        self.dispatch = dispatch
+        self.max_pending = max_pending
+        self.on_change = on_change
+        self.current = None
+        self._pending = []
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="ChatboxRequestWorker")
+        self._thread.daemon = True  # never keeps Revit alive on exit
+        self._thread.start()
+
+    @property
+    def pending_count(self):
+        with self._cond:
+            return len(self._pending)
+
+    @property
+    def busy(self):
+        return self.current is not None
+
+    def submit(self, job):
+        """Queue a job. Returns how many jobs are ahead of it (0 = starts now),
+        or None if the queue is full.
+        """
+        with self._cond:
+            if self._stopped or len(self._pending) >= self.max_pending:
+                return None
+            ahead = len(self._pending) + (1 if self.current else 0)
+            job.worker = self
+            self._pending.append(job)
+            self._cond.notify()
+        self._changed()
+        return ahead
+
+    def cancel(self, job):
+        with self._cond:
+            if job in self._pending:
+                self._pending.remove(job)
+        if not job.token.cancelled:
+            job.token.cancel()
+            if job.on_cancel:
+                self.dispatch(lambda: job.on_cancel(job))
+        self._changed()
+
+    def cancel_current(self):
+        job = self.current
+        if job:
+            self.cancel(job)
+
+    def cancel_all(self):
+        with self._cond:
+            jobs = list(self._pending)
+        for job in jobs + ([self.current] if self.current else []):
+            self.cancel(job)
+
+    def shutdown(self):
+        """Cancel everything and let the thread finish (e.g. when the window closes)."""
+        self.cancel_all()
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+
+    # --- [ WORKER THREAD ] ---
+
+    def _changed(self):
+        if self.on_change:
+            self.dispatch(self.on_change)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._stopped:
+                    self._cond.wait()
+                if self._stopped:
+                    return
+                job = self._pending.pop(0)
+                self.current = job
+            self._changed()
+            try:
+                self._execute(job)
+            finally:
+                with self._cond:
+                    self.current = None
+                self._changed()
+
+    def _execute(self, job):
+        if job.token.cancelled:
+            return
+        if job.on_start:
+            job.ui(job.on_start, job)
+        try:
+            result = job.work(job)
+            job.token.check()
+        except CancelledError:
+            return  # on_cancel was already sent by cancel()
+        except Exception as e:
+            if job.on_error:
+                job.ui(job.on_error, job, e)
+            return
+        if job.on_done:
+            job.ui(job.on_done, job, result)
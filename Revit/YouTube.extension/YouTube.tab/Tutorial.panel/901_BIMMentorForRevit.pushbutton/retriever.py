@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""Revit Usage Chatbox - Hybrid Retriever.
+Finds the knowledge base chunks for a question with two searches:
+  - Keyword search (BM25): local and instant, great for tool names ("VG dialog").
+  - Vector search: understands meaning, but needs an embedding API call.
+Both rankings are merged with Reciprocal Rank Fusion (RRF).
+Short keyword questions skip the embedding call entirely, and if the
+embedding call fails we still answer from the keyword results.
+Works on both IronPython 2.7 and CPython 3.
+"""
+
+from vector_store import load_store
+from ann_index import load_index as load_ann_index, DEFAULT_NPROBE
+from bm25_index import load_index as load_bm25_index, tokenize
+
+SHORT_QUERY_TERMS = 3    # Up to this many keywords: keyword search only
+CANDIDATES = 12          # Results taken from each search before merging
+VECTOR_THRESHOLD = 0.6   # Min cosine similarity for a vector hit to count
+KEYWORD_RATIO = 0.5      # Min share of the best BM25 score for a keyword hit to count
+RRF_K = 60               # Standard RRF damping constant
+
+
+def reciprocal_rank_fusion(rankings, k=RRF_K):
+    """Merge several best-first lists of row ids into one.
+    Each list adds 1 / (k + rank) to a row's score. Returns [(score, row)] best first.
+    """
+    scores = {}
+    for ranking in rankings:
+        for rank, row in enumerate(ranking):
+            scores[row] = scores.get(row, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(((score, row) for row, score in scores.items()), key=lambda pair: (-pair[0], pair[1]))
+
+
+class KnowledgeRetriever(object):
+    """Keyword + vector search over one knowledge base (indexes cached per session)."""
+
+    def __init__(self, kb_path, nprobe=DEFAULT_NPROBE):
+        self.store = load_store(kb_path)
+        self.ann = load_ann_index(kb_path, self.store)
+        self.bm25 = load_bm25_index(kb_path, self.store)
+        self.nprobe = nprobe
+        self.last_mode = ""
+
+    def keyword_search(self, question):
+        return self.bm25.search(question, CANDIDATES) if self.bm25 else []
+
+    def vector_search(self, q_vec):
+        if self.ann:
+            # Big knowledge bases: only search the closest clusters (ANN index)
+            return self.ann.search_rows(self.store, q_vec, CANDIDATES, self.nprobe)
+        return self.store.search_rows(q_vec, CANDIDATES)
+
+    def search_rows(self, question, embed_fn):
+        """All relevant (fused score, row) pairs, best first.
+        embed_fn(question) must return the question's vector, or None on failure.
+        """
+        keyword_hits = self.keyword_search(question)
+        relevant = set()
+        if keyword_hits:
+            best = keyword_hits[0][0]
+            relevant.update(row for score, row in keyword_hits if score >= best * KEYWORD_RATIO)
+
+        vector_hits = []
+        if keyword_hits and len(tokenize(question)) <= SHORT_QUERY_TERMS:
+            # Short keyword query: no embedding round trip needed
+            self.last_mode = "keyword"
+        else:
+            q_vec = None
+            try:
+                q_vec = embed_fn(question)
+            except Exception as e:
+                print("Embedding Error: " + str(e))
+            if q_vec:
+                vector_hits = self.vector_search(q_vec)
+                relevant.update(row for score, row in vector_hits if score > VECTOR_THRESHOLD)
+                self.last_mode = "hybrid" if keyword_hits else "vector"
+            else:
+                self.last_mode = "keyword (embedding unavailable)"
+
+        fused = reciprocal_rank_fusion([[row for _, row in keyword_hits], [row for _, row in vector_hits]])
+        return [(score, row) for score, row in fused if row in relevant]
+
@@ -8,52 +8,18 @@ from System import Windows
 import json
 import os
 import System
-from System.Net import WebClient, ServicePointManager, SecurityProtocolType
-from System.Text import Encoding
-
-# --- [ IRONPYTHON HTTP COMPATIBILITY ] ---
-# Manually enable TLS 1.2 for modern API connections
-ServicePointManager.SecurityProtocol = SecurityProtocolType.Tls12
-
-class RequestsWrapper:
-    """A minimal 'requests' replacement using .NET WebClient for IronPython."""
-    class Response:
-        def __init__(self, status_code, text):
-            self.status_code = status_code
-            self.text = text
-        def json(self):
-            return json.loads(self.text)
-
-    def post(self, url, json=None, headers=None, timeout=30):
-        # Use simple mapping to avoid shadowing the 'json' module
-        json_payload = json 
-        import json as json_module
-        
-        client = WebClient()
-        if headers:
-            for k, v in headers.items():
-                client.Headers.Add(k, v)
-        if "Content-Type" not in [str(h) for h in client.Headers]:
-            client.Headers.Add("Content-Type", "application/json")
-        
-        try:
-            body = json_module.dumps(json_payload)
-            response_bytes = client.UploadData(url, "POST", Encoding.UTF8.GetBytes(body))
-            return self.Response(200, Encoding.UTF8.GetString(response_bytes))
-        except Exception as e:
-            # Extract actual HTTP status code for fallbacks if possible
-            status = 400
-            error_msg = str(e)
-            if "404" in error_msg: status = 404
-            elif "401" in error_msg: status = 401
-            elif "403" in error_msg: status = 403
-            return self.Response(status, error_msg)
-
-
-
-# Replace requests with our wrapper
-requests = RequestsWrapper()
+from System.Windows.Threading import DispatcherPriority
 
+from vector_store import has_store, store_paths
+from ann_index import DEFAULT_NPROBE
+from retriever import KnowledgeRetriever
+from context_builder import ContextBuilder, DEFAULT_BUDGET_TOKENS, count_sources
+from mentor_cache import EmbeddingCache, AnswerCache, kb_version
+from ai_providers import EMBEDDING_MODEL, PROVIDER_NAMES, is_error_response, get_query_embedding, call_provider
+from provider_router import ProviderRouter, ProviderStats
+from request_worker import RequestWorker, Job
+from conversation import Conversation, is_follow_up
+from model_index import ModelIndexer, document_key
 
 # --- [ SYSTEM PROMPT ] ---
 SYSTEM_PROMPT = """You are an expert Revit Support Assistant.
@@ -64,111 +30,15 @@ Maintain a professional and approachable tone.
 
 LIMITATION: If the context does not contain the answer, politely state: 'I am sorry, I could not find specific guidance for that topic in our manual database.'"""
 
-# --- [ VECTOR MATH HELPERS ] ---
-
-def cosine_similarity(v1, v2):
-    """Calculates similarity between two vectors."""
-    dot = sum(a * b for a, b in zip(v1, v2))
-    mag1 = sum(a*a for a in v1)**0.5
-    mag2 = sum(a*a for a in v2)**0.5
-    if not mag1 or not mag2: return 0
-    return dot / (mag1 * mag2)
-
-# --- [ AI API CALLERS ] ---
-
-def get_query_embedding(text, api_key):
-    """Gets embedding for the user's question using Gemini."""
-    url = "https://generativelanguage.googleapis.com/v1beta/models/gemini-embedding-001:embedContent?key=" + api_key
-    payload = {
-        "model": "models/gemini-embedding-001",
-        "content": {"parts": [{"text": text}]},
-        "taskType": "RETRIEVAL_QUERY"
-    }
-    res = requests.post(url, json=payload, timeout=10)
-    if res.status_code == 200:
-        return res.json()["embedding"]["values"]
-    return None
-
-def call_gemini(api_key, model, system_prompt, user_prompt):
-    # Ensure model starts with 'models/' if it doesn't already
-    if "/" not in model:
-        model = "models/" + model
-    
-    # Using v1 for better stability
-    url = "https://generativelanguage.googleapis.com/v1/{}:generateContent?key={}".format(model, api_key)
-    
-    # Universal multi-turn payload structure (Most compatible)
-    payload = {
-        "contents": [
-            {"role": "user", "parts": [{"text": "SYSTEM INSTRUCTION: " + system_prompt}]},
-            {"role": "model", "parts": [{"text": "Understood. I am your BIM Mentor AI assistant. I will strictly follow those guidelines."}]},
-            {"role": "user", "parts": [{"text": user_prompt}]}
-        ],
-        "generationConfig": {"temperature": 0.2}
-    }
-    
-    res = requests.post(url, json=payload, timeout=30)
-    
-    # Fallback to v1beta if v1 is not available for this model
-    if res.status_code == 404:
-        url = url.replace("/v1/", "/v1beta/")
-        res = requests.post(url, json=payload, timeout=30)
-        
-    if res.status_code == 200:
-        try:
-            data = res.json()
-            return data["candidates"][0]["content"]["parts"][0]["text"]
-        except Exception:
-            return "Gemini Format Error. Raw response: " + res.text
-
-    return "Gemini Error ({}). Info: {}".format(res.status_code, res.text)
-
-def call_openai(api_key, model, system_prompt, user_prompt):
-    url = "https://api.openai.com/v1/chat/completions"
-    headers = {"Authorization": "Bearer " + api_key, "Content-Type": "application/json"}
-    payload = {
-        "model": model,
-        "messages": [{"role": "system", "content": system_prompt}, {"role": "user", "content": user_prompt}],
-        "temperature": 0.2
-    }
-    response = requests.post(url, headers=headers, json=payload, timeout=30)
-    if response.status_code == 200:
-        return response.json()["choices"][0]["message"]["content"]
-    return "OpenAI Error: " + response.text
-
-def call_claude(api_key, model, system_prompt, user_prompt):
-    url = "https://api.anthropic.com/v1/messages"
-    headers = {"x-api-key": api_key, "anthropic-version": "2023-06-01", "Content-Type": "application/json"}
-    payload = {
-        "model": model, "system": system_prompt,
-        "messages": [{"role": "user", "content": user_prompt}],
-        "max_tokens": 2048, "temperature": 0.2
-    }
-    response = requests.post(url, headers=headers, json=payload, timeout=30)
-    if response.status_code == 200:
-        return response.json()["content"][0]["text"]
-    return "Claude Error: " + response.text
-
-def call_local_llm(model, system_prompt, user_prompt, custom_url=""):
-    """
-    Calls a local LLM (Ollama).
-    Default URL: http://localhost:11434/api/generate
-    """
-    url = custom_url if custom_url and custom_url.startswith("http") else "http://localhost:11434/api/generate"
-    
-    payload = {
-        "model": model if model else "llama3",
-        "prompt": "{}\n\nUSER: {}".format(system_prompt, user_prompt),
-        "stream": False
-    }
-    
-    try:
-        response = requests.post(url, json=payload, timeout=60)
-        if response.status_code == 200:
-            return response.json().get("response", "No response from Local AI.")
-        return "Local AI Error: " + response.text
-    except Exception as e:
-        return "Connection Error: Ensure Ollama is running at {}. Error: {}".format(url, str(e))
+# --- [ CACHE SETTINGS ] ---
+EMBEDDING_CACHE_SIZE = 200                  # Remembered question vectors
+ANSWER_CACHE_TTL = 7 * 24 * 3600            # Cached answers expire after 7 days
+ANSWER_CACHE_MAX_BYTES = 5 * 1024 * 1024    # Oldest answers are dropped beyond 5 MB
+
+MAX_QUEUED_QUESTIONS = 5                    # Questions that can wait behind the current one
+
+# --- [ PROVIDER FAILOVER ] ---
+DEFAULT_HEDGE_SECONDS = 8.0                 # Ask the backup too if the main provider is silent this long
 
 # --- [ UI WINDOW CLASS ] ---
 
@@ -179,9 +49,32 @@ class RevitUsageChatboxWindow(Windows.Window):
         self.env_path = os.path.join(os.path.dirname(__file__), ".env")
         self.load_settings()
         
+        # Caches for repeated questions (saved next to the script)
+        cache_dir = os.path.dirname(__file__)
+        self.embedding_cache = EmbeddingCache(os.path.join(cache_dir, ".embedding_cache.json"), EMBEDDING_CACHE_SIZE)
+        self.answer_cache = AnswerCache(os.path.join(cache_dir, ".answer_cache.json"),
+                                        ANSWER_CACHE_TTL, ANSWER_CACHE_MAX_BYTES)
+        self.provider_stats = ProviderStats(os.path.join(cache_dir, ".provider_stats.json"))
+        
+        # Earlier questions and answers of this chat, for follow-up questions
+        self.conversation = Conversation()
+        
+        # Index of the open model (created on the first question that uses it)
+        self.model_indexer = None
+        self.update_cache_stats()
+        
+        # Questions are answered on a background thread so the window never freezes
+        self._active_job = None
+        self._answer_start = None
+        self._answer_streamed = False
+        self.worker = RequestWorker(self.dispatch, max_pending=MAX_QUEUED_QUESTIONS, on_change=self.update_status)
+        self.update_status()
+        
         # Events
         self.btn_ask.Click += self.on_ask
+        self.btn_cancel.Click += self.on_cancel
         self.btn_clear.Click += self.on_clear
+        self.Closed += self.on_closed
         self.btn_save_config.Click += self.on_save_config
         self.btn_browse_kb.Click += self.on_browse_kb
 
@@ -203,6 +96,14 @@ class RevitUsageChatboxWindow(Windows.Window):
         self.cmb_provider.SelectedIndex = int(data.get("PROVIDER_IDX", 0))
         self.txt_kb_path.Text = data.get("KB_PATH", "revit_knowledge.json")
         self.chk_use_rag.IsChecked = data.get("USE_RAG", "True") == "True"
+        self.txt_ann_nprobe.Text = data.get("ANN_NPROBE", str(DEFAULT_NPROBE))
+        self.txt_context_budget.Text = data.get("CONTEXT_BUDGET", str(DEFAULT_BUDGET_TOKENS))
+        self.cmb_backup_provider.SelectedIndex = int(data.get("BACKUP_PROVIDER_IDX", 0))
+        self.txt_backup_key.Text = data.get("BACKUP_API_KEY", "")
+        self.txt_backup_model.Text = data.get("BACKUP_MODEL", "llama3")
+        self.txt_hedge_seconds.Text = data.get("HEDGE_SECONDS", str(DEFAULT_HEDGE_SECONDS))
+        self.chk_prefer_fastest.IsChecked = data.get("PREFER_FASTEST", "False") == "True"
+        self.chk_use_model.IsChecked = data.get("USE_MODEL", "False") == "True"
 
     def on_save_config(self, sender, args):
         """Save current UI values to the local .env file."""
@@ -213,6 +114,14 @@ class RevitUsageChatboxWindow(Windows.Window):
                 f.write("PROVIDER_IDX={}\n".format(self.cmb_provider.SelectedIndex))
                 f.write("KB_PATH={}\n".format(self.txt_kb_path.Text))
                 f.write("USE_RAG={}\n".format(self.chk_use_rag.IsChecked))
+                f.write("ANN_NPROBE={}\n".format(self.txt_ann_nprobe.Text))
+                f.write("CONTEXT_BUDGET={}\n".format(self.txt_context_budget.Text))
+                f.write("BACKUP_PROVIDER_IDX={}\n".format(self.cmb_backup_provider.SelectedIndex))
+                f.write("BACKUP_API_KEY={}\n".format(self.txt_backup_key.Text))
+                f.write("BACKUP_MODEL={}\n".format(self.txt_backup_model.Text))
+                f.write("HEDGE_SECONDS={}\n".format(self.txt_hedge_seconds.Text))
+                f.write("PREFER_FASTEST={}\n".format(self.chk_prefer_fastest.IsChecked))
+                f.write("USE_MODEL={}\n".format(self.chk_use_model.IsChecked))
             forms.alert("Settings saved to local .env file!", title="Revit Usage Chatbox")
         except Exception as e:
             forms.alert("Error saving .env: " + str(e))
@@ -222,15 +131,87 @@ class RevitUsageChatboxWindow(Windows.Window):
         if path:
             self.txt_kb_path.Text = path
 
+    def get_nprobe(self):
+        """Clusters to search in the ANN index (higher = more accurate, slower)."""
+        try:
+            return max(1, int(self.txt_ann_nprobe.Text))
+        except ValueError:
+            return DEFAULT_NPROBE
+
+    def get_context_budget(self):
+        """Max tokens of knowledge base text put into the prompt."""
+        try:
+            return max(100, int(self.txt_context_budget.Text))
+        except ValueError:
+            return DEFAULT_BUDGET_TOKENS
+
+    def get_hedge_seconds(self):
+        try:
+            return max(0.0, float(self.txt_hedge_seconds.Text))
+        except ValueError:
+            return DEFAULT_HEDGE_SECONDS
+
+    def get_providers(self):
+        """[(name, provider index, key or URL, model)]: the main provider, then the backup (if any)."""
+        main = (self.cmb_provider.SelectedIndex, self.txt_api_key.Text.strip(), self.txt_model.Text.strip())
+        providers = [main]
+        backup_idx = self.cmb_backup_provider.SelectedIndex - 1  # first entry is 'None'
+        if backup_idx >= 0:
+            backup = (backup_idx, self.txt_backup_key.Text.strip(), self.txt_backup_model.Text.strip())
+            if backup != main:
+                providers.append(backup)
+        named = []
+        for provider_idx, key, model in providers:
+            name = PROVIDER_NAMES[provider_idx] if 0 <= provider_idx < len(PROVIDER_NAMES) else "Invalid provider"
+            if named and named[0][0] == name:
+                name += " ({})".format(model)  # same provider, other model
+            named.append((name, provider_idx, key, model))
+        return named
+
+    def update_cache_stats(self):
+        self.lbl_cache_stats.Text = "{}  |  {}".format(
+            self.embedding_cache.stats_text("Question cache"),
+            self.answer_cache.stats_text("Answer cache"))
+        self.lbl_provider_stats.Text = self.provider_stats.stats_text()
+
+    def embed_question(self, text, api_key):
+        """Question vector from the local cache, or from Gemini (then cached)."""
+        vector = self.embedding_cache.get(EMBEDDING_MODEL, text)
+        if vector is None:
+            vector = get_query_embedding(text, api_key)
+            if vector:
+                self.embedding_cache.put(EMBEDDING_MODEL, text, vector)
+        return vector
+
     def on_clear(self, sender, args):
         self.txt_output.Text = ""
         self.txt_input.Text = ""
+        self._answer_start = None
+        self.conversation.clear()  # new chat, new topic
+
+    def get_model_indexer(self):
+        """Indexer of the open document; its index is saved per document next to the script."""
+        if self.model_indexer is None:
+            from model_source import RevitElementSource  # Revit API: only loaded when used
+            doc = revit.doc
+            path = os.path.join(os.path.dirname(__file__), ".model_index",
+                                document_key(doc.Title, doc.PathName) + ".json")
+            self.model_indexer = ModelIndexer(RevitElementSource(doc), path)
+        return self.model_indexer
+
+    def resolve_kb_path(self):
+        kb_path = self.txt_kb_path.Text
+        if not os.path.isabs(kb_path):
+            kb_path = os.path.join(os.path.dirname(__file__), kb_path)
+        return kb_path
+
+    # --- [ ASKING: UI THREAD ] ---
 
     def on_ask(self, sender, args):
         user_msg = self.txt_input.Text.strip()
         if not user_msg: return
         
-        api_key = self.txt_api_key.Text
+        api_key = self.txt_api_key.Text.strip()
         provider_idx = self.cmb_provider.SelectedIndex
         
         # Local AI (Idx 3) doesn't strictly need a 'key', 
@@ -239,66 +220,205 @@ class RevitUsageChatboxWindow(Windows.Window):
             forms.alert("Please provide an API Key in Settings.")
             return
 
+        # Read the model now: the Revit API can only be used from this (UI) thread.
+        # Only elements changed since the last question / save are read again.
+        use_model, model_update = False, None
+        if self.chk_use_model.IsChecked and revit.doc is not None:
+            try:
+                model_update = self.get_model_indexer().snapshot()
+                use_model = True
+            except Exception as e:
+                print("Model index error: " + str(e))
+
+        # Read everything from the window now: the worker thread must not touch WPF controls
+        request = {
+            "question": user_msg,
+            "api_key": api_key,
+            "providers": self.get_providers(),
+            "hedge_seconds": self.get_hedge_seconds(),
+            "prefer_fastest": bool(self.chk_prefer_fastest.IsChecked),
+            "kb_path": self.resolve_kb_path() if self.chk_use_rag.IsChecked else None,
+            "nprobe": self.get_nprobe(),
+            "context_budget": self.get_context_budget(),
+            "use_model": use_model,
+            "model_update": model_update,
+        }
+        job = Job(user_msg, lambda job: self.answer_question(job, request),
+                  on_start=self.on_answer_start, on_done=self.on_answer_done, on_error=self.on_answer_error, on_cancel=self.on_answer_cancel)
+        job.request = request
+        if self.worker.submit(job) is None:
+            forms.alert("Too many questions waiting. Please wait or press 'Cancel'.")
+            return
+        self.txt_input.Text = ""
+
+    def on_cancel(self, sender, args):
+        """Cancel the running question and everything queued behind it."""
+        self.worker.cancel_all()
+
+    def on_closed(self, sender, args):
+        self.worker.shutdown()
+
+    def dispatch(self, fn):
+        """Run fn on the UI thread (called from the worker thread)."""
+        self.Dispatcher.BeginInvoke(DispatcherPriority.Normal, System.Action(fn))
+
+    def append_output(self, text):
+        self.txt_output.AppendText(text)
+        self.txt_output.ScrollToEnd()
+
+    def on_answer_start(self, job):
+        self._active_job = job
+
+    def begin_answer(self, job):
+        self.append_output("\n\nYOU: " + job.label + "\n\nAI CHATBOX: ")
+        self._answer_start = len(self.txt_output.Text)
+        self._answer_streamed = False
+        self.append_output("Thinking...")
+
+    def on_answer_delta(self, piece):
+        if not self._answer_streamed:
+            self.txt_output.Text = self.txt_output.Text[:self._answer_start]  # drop "Thinking..."
+            self._answer_streamed = True
+        self.append_output(piece)
+
+    def on_answer_done(self, job, result):
+        response, provider_name = result
+        if provider_name != job.request["providers"][0][0] and not is_error_response(response):
+            response += "\n[Answered by {} (backup)]".format(provider_name)
+        if self._answer_start is not None:
+            self.txt_output.Text = self.txt_output.Text[:self._answer_start] + response
+        self.txt_output.ScrollToEnd()
+        self.update_cache_stats()
+
+    def on_answer_error(self, job, error):
+        self.append_output("\n\n[ERROR]: " + str(error))
+        self.update_cache_stats()
+
+    def on_answer_cancel(self, job):
+        if job is self._active_job:
+            self.append_output("  [CANCELLED]")
+
+    def update_status(self):
+        """Show whether a question is running and how many are waiting."""
+        waiting = self.worker.pending_count
+        if self.worker.busy:
+            text = "Answering..." + (" ({} more queued)".format(waiting) if waiting else "")
+        else:
+            text = ""
+        self.lbl_status.Text = text
+        self.btn_cancel.IsEnabled = self.worker.busy or waiting > 0
+
+    # --- [ ASKING: WORKER THREAD ] ---
+
+    def answer_question(self, job, req):
+        """Search the knowledge base and call the AI. Runs on the worker thread:
+        all window updates go through job.ui(...).
+        """
+        user_msg = req["question"]
+        api_key = req["api_key"]
+
         # 1. RAG LOGIC: Search Knowledge Base
         context_text = ""
-        if self.chk_use_rag.IsChecked:
-            kb_path = self.txt_kb_path.Text
-            if not os.path.isabs(kb_path):
-                kb_path = os.path.join(os.path.dirname(__file__), kb_path)
-            
-            if os.path.exists(kb_path):
-                self.txt_output.Text += "\n\n[SEARCHING KNOWLEDGE BASE...]"
-                try:
-                    # Get user question embedding (Need Gemini key for this)
-                    q_vec = get_query_embedding(user_msg, api_key)
-                    if q_vec:
-                        with open(kb_path, 'r') as f:
-                            kb_data = json.load(f)
-                        
-                        # Rank by similarity
-                        for item in kb_data:
-                            item['score'] = cosine_similarity(q_vec, item['vector'])
-                        
-                        top_items = sorted(kb_data, key=lambda x: x['score'], reverse=True)[:3]
-                        
-                        # Build context
-                        context_parts = []
-                        for item in top_items:
-                            if item['score'] > 0.6: # threshold
-                                context_parts.append("Source: {}\nContent: {}".format(item.get('title'), item.get('text')))
-                        
-                        if context_parts:
-                            context_text = "\n\n---\n\n".join(context_parts)
-                except Exception as e:
-                    print("RAG Error: " + str(e))
+        kb_stamp = "none"
+        kb_path = req["kb_path"]
+        if kb_path and not has_store(kb_path) and os.path.exists(kb_path):
+            job.ui(self.append_output, "\n\n[KNOWLEDGE BASE SKIPPED: no .vec/.meta.json next to it, run rag_builder.py again]")
+        if kb_path and has_store(kb_path):
+            kb_stamp = kb_version(kb_path, store_paths(kb_path)[1])
+            job.ui(self.append_output, "\n\n[SEARCHING KNOWLEDGE BASE...]")
+            try:
+                # Keyword (BM25) + vector search, indexes loaded once per session.
+                # The question embedding needs a Gemini key; short keyword
+                # questions skip it, and keyword results are used if it fails.
+                retriever = KnowledgeRetriever(kb_path, nprobe=req["nprobe"])
+                hits = retriever.search_rows(user_msg, lambda q: self.embed_question(q, api_key))
+                
+                # Build context: diverse chunks, trimmed to the question, within the token budget
+                builder = ContextBuilder(retriever.store, budget_tokens=req["context_budget"],
+                                         idf=retriever.bm25.idf if retriever.bm25 else None)
+                chosen, used_tokens = builder.build(user_msg, hits)
+                job.ui(self.append_output, " ({} search, {} sources, ~{} tokens)".format(
+                    retriever.last_mode, count_sources(chosen), used_tokens))
+                
+                context_parts = []
+                for item, text in chosen:
+                    context_parts.append("Source: {}\nContent: {}".format(item.get('title'), text))
+                
+                if context_parts:
+                    context_text = "\n\n---\n\n".join(context_parts)
+            except Exception as e:
+                print("RAG Error: " + str(e))
+        job.token.check()
+        
+        # 1b. LIVE MODEL: element types, sheets, levels and rooms matching the question
+        model_text = ""
+        if req["use_model"]:
+            status = self.model_indexer.apply(req["model_update"])
+            model_text = self.model_indexer.index.context_text(user_msg)
+            job.ui(self.append_output, "\n\n[OPEN MODEL: {}]".format(status))
 
         # 2. Prepare Augmented Prompt
         final_system_prompt = SYSTEM_PROMPT
         if context_text:
             final_system_prompt += "\n\nUSE THE FOLLOWING CONTEXT TO ANSWER:\n" + context_text
+        if model_text:
+            final_system_prompt += ("\n\nTHE OPEN REVIT MODEL (element types, sheets, levels and rooms "
+                                    "matching the question):\n" + model_text)
+        
+        # Same provider + model + prompt + knowledge base = same answer.
+        # A standalone question is keyed without the chat history, so asking it again
+        # later in the same chat is still a cache hit; a follow-up is keyed with it.
+        history = self.conversation.messages()
+        summary = self.conversation.summary_text()
+        prompt_key = final_system_prompt + "\n\nUSER: " + user_msg
+        if history and is_follow_up(user_msg):
+            prompt_key += "\n\nHISTORY: " + json.dumps(history) + "\n\nSUMMARY: " + summary
+
+        # Conversation memory: older turns as a summary, recent turns sent as real messages
+        if summary:
+            final_system_prompt += "\n\nEARLIER IN THIS CONVERSATION (summary):\n" + summary
 
         # 3. Call AI
-        self.txt_output.Text += "\n\nYOU: " + user_msg
-        self.txt_output.Text += "\n\nAI CHATBOX: Thinking..."
-        self.txt_output.ScrollToEnd()
+        job.ui(self.begin_answer, job)
         
-        provider_idx = self.cmb_provider.SelectedIndex
-        model = self.txt_model.Text.strip()
-        api_key = self.txt_api_key.Text.strip()
+        # Streaming: show each piece of the answer as soon as it arrives
+        def on_delta(piece):
+            job.token.check()  # stops the stream when cancelled
+            job.ui(self.on_answer_delta, piece)
+        
+        cache_keys = {}
+        candidates = []
+        for name, provider_idx, key, model in req["providers"]:
+            cache_keys[name] = AnswerCache.make_key(provider_idx, model, prompt_key, kb_stamp)
+            candidates.append((name, lambda on_delta, i=provider_idx, k=key, m=model:
+                               call_provider(i, k, m, final_system_prompt, user_msg, on_delta, history)))
         
         try:
-            if provider_idx == 0: response = call_gemini(api_key, model, final_system_prompt, user_msg)
-            elif provider_idx == 1: response = call_claude(api_key, model, final_system_prompt, user_msg)
-            elif provider_idx == 2: response = call_openai(api_key, model, final_system_prompt, user_msg)
-            elif provider_idx == 3: response = call_local_llm(model, final_system_prompt, user_msg, api_key)
-            else: response = "Invalid provider."
+            # One lookup (one hit or miss in the stats), whichever provider answered before
+            keys = [cache_keys[candidate[0]] for candidate in candidates]
+            found_key, response = self.answer_cache.get_first(keys)
+            if response is not None:
+                name = candidates[keys.index(found_key)][0]
             
-            self.txt_output.Text = self.txt_output.Text.replace("Thinking...", response)
-        except Exception as e:
-            self.txt_output.Text += "\n\n[ERROR]: " + str(e)
+            if response is None:
+                # Main provider first; the backup is asked if it fails or is too slow
+                order = self.provider_stats.order([name for name, _ in candidates], req["prefer_fastest"])
+                candidates.sort(key=lambda candidate: order.index(candidate[0]))
+                router = ProviderRouter(self.provider_stats, is_error_response, hedge_after=req["hedge_seconds"])
+                response, name = router.ask(candidates, on_delta, job.token)
+                if not (response or "").strip():
+                    response = "No response from {}.".format(name)
+                
+                if not is_error_response(response) and not job.token.cancelled:
+                    self.answer_cache.put(cache_keys[name], response)
+        finally:
+            self.embedding_cache.save()
+            self.answer_cache.save()
+            self.provider_stats.save()
         
-        self.txt_output.ScrollToEnd()
-        self.txt_input.Text = ""
+        if not is_error_response(response) and not job.token.cancelled:
+            self.conversation.add_turn(user_msg, response)
+        return response, name
 
 if __name__ == "__main__":
     window = RevitUsageChatboxWindow()
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""Revit Usage Chatbox - Streaming Response Parsers.
+Instead of waiting 20-30 seconds for the full answer, the AI providers can
+send it piece by piece while it is being written:
+  - Gemini, OpenAI and Claude use Server-Sent Events (SSE): 'data: {...}' lines.
+  - Ollama sends one JSON object per line (NDJSON).
+These helpers turn those lines into text pieces ("deltas") and call
+on_delta(piece) for each one, so the window can show the answer as it grows.
+They only need an iterable of text lines, so they work with any HTTP client
+(and with fake_ai_server.py for offline testing). IronPython 2.7 / CPython 3.
+"""
+
+import json
+
+SSE = "sse"
+NDJSON = "ndjson"
+
+
+class StreamError(Exception):
+    """The provider reported an error in the middle of a stream."""
+
+
+def iter_sse_data(lines):
+    """Yield the 'data' payload of each Server-Sent Event.
+    Multi-line data is joined; comments (': ping') and other fields are skipped.
+    Stops at the OpenAI-style 'data: [DONE]' marker.
+    """
+    data = []
+    for line in lines:
+        line = line.rstrip("\r\n")
+        if not line:
+            # A blank line ends one event
+            if data:
+                payload = "\n".join(data)
+                data = []
+                if payload == "[DONE]":
+                    return
+                yield payload
+            continue
+        if line.startswith(":"):
+            continue
+        field, _, value = line.partition(":")
+        if field == "data":
+            data.append(value[1:] if value.startswith(" ") else value)
+    if data and "\n".join(data) != "[DONE]":
+        yield "\n".join(data)
+
+
+def iter_ndjson(lines):
+    """Yield one parsed JSON object per non-empty line."""
+    for line in lines:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+# --- [ PROVIDER DELTA EXTRACTORS ] ---
+# Each takes one parsed event and returns its new text ('' if none).
+
+def _error_message(error):
+    return error.get("message", str(error)) if isinstance(error, dict) else str(error)
+
+def gemini_delta(event):
+    if "error" in event:
+        raise StreamError(_error_message(event["error"]))
+    try:
+        parts = event["candidates"][0]["content"]["parts"]
+    except (KeyError, IndexError):
+        return ""
+    return "".join(part.get("text", "") for part in parts)
+
+def openai_delta(event):
+    if "error" in event:
+        raise StreamError(_error_message(event["error"]))
+    try:
+        return event["choices"][0]["delta"].get("content") or ""
+    except (KeyError, IndexError):
+        return ""
+
+def claude_delta(event):
+    if event.get("type") == "error":
+        raise StreamError(_error_message(event.get("error", "Claude stream error")))
+    if event.get("type") == "content_block_delta":
+        return event.get("delta", {}).get("text", "")
+    return ""
+
+def ollama_delta(event):
+    if event.get("error"):
+        raise StreamError(_error_message(event["error"]))
+    if "message" in event:
+        return event["message"].get("content", "")  # /api/chat
+    return event.get("response", "")  # /api/generate
+
+
+def collect_stream(lines, fmt, extract, on_delta=None):
+    """Read a whole stream, calling on_delta(piece) as text arrives.
+    Returns the complete answer text.
+    """
+    if fmt == SSE:
+        events = (json.loads(data) for data in iter_sse_data(lines))
+    else:
+        events = iter_ndjson(lines)
+
+    pieces = []
+    try:
+        for event in events:
+            piece = extract(event)
+            if piece:
+                pieces.append(piece)
+                if on_delta:
+                    on_delta(piece)  # may raise to stop early (e.g. cancelled)
+    finally:
+        # Stopped early: close the connection now instead of at garbage collection
+        close = getattr(lines, "close", None)
+        if close:
+            close()
+    return "".join(pieces)
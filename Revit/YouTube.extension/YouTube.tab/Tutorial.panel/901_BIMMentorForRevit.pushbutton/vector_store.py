@@ -0,0 +1,327 @@
+# -*- coding: utf-8 -*-
+"""Revit Usage Chatbox - Binary Vector Store.
+Stores the knowledge base as a float32 matrix (one pre-normalised row per topic)
+next to a small JSON sidecar holding the titles and texts.
+Revit loads it once per session (see session_dict) and ranks every topic in a single pass.
+Optionally also writes an int8 copy (1 byte per number + one scale per row,
+4x smaller): Revit scans that, then re-checks only the best few rows in
+full float32 precision. The copy is written NEXT TO the .vec file (about
+1.25x the disk space): it makes each search read 4x fewer bytes, it does
+not save disk. The float32 file stays for the re-check and for row().
+Works on both IronPython 2.7 and CPython 3 (no NumPy required).
+"""
+
+import os
+import io
+import sys
+import json
+import array
+import heapq
+import operator
+
+STORE_VERSION = 1
+VECTOR_EXT = ".vec"
+META_EXT = ".meta.json"
+QUANT_EXT = ".q8"
+RESCORE_FACTOR = 4  # int8 scan keeps top_k * this many rows for the float32 re-check
+
+# Outside Revit (rag_builder.py, benchmarks): name -> dict for this process
+_LOCAL_CACHES = {}
+
+
+def session_dict(name):
+    """A dict that lives for the whole Revit session, kept in the extension's
+    lib/session_cache.py. pyRevit runs every click in a fresh scope, so a
+    module-level dict would only last one click. Outside Revit (lib not on
+    the path) it is a plain dict for this process."""
+    try:
+        import session_cache
+    except ImportError:
+        return _LOCAL_CACHES.setdefault(name, {})
+    return session_cache.get(None, name, dict)
+
+
+# --- [ VECTOR MATH HELPERS ] ---
+
+def dot(v1, v2):
+    """Dot product of two equally sized vectors."""
+    return sum(map(operator.mul, v1, v2))
+
+def normalize(vector):
+    """Scale a vector to length 1, so dot product == cosine similarity."""
+    mag = sum(a * a for a in vector) ** 0.5
+    if not mag:
+        return [0.0] * len(vector)
+    return [a / mag for a in vector]
+
+
+# --- [ FILE LAYOUT ] ---
+
+def store_paths(kb_path):
+    """'revit_knowledge.json' -> ('revit_knowledge.vec', 'revit_knowledge.meta.json')"""
+    base = os.path.splitext(kb_path)[0]
+    return base + VECTOR_EXT, base + META_EXT
+
+def quant_path(kb_path):
+    """'revit_knowledge.json' -> 'revit_knowledge.q8'"""
+    return os.path.splitext(kb_path)[0] + QUANT_EXT
+
+def has_store(kb_path):
+    vec_path, meta_path = store_paths(kb_path)
+    return os.path.exists(vec_path) and os.path.exists(meta_path)
+
+def _to_little_endian(values):
+    # The .vec file is always little-endian float32
+    if sys.byteorder != "little":
+        values.byteswap()
+    return values
+
+
+# --- [ INT8 QUANTISATION ] ---
+
+def quantize_int8(vector):
+    """Unit vector -> (scale, int8 codes) with vector ~= scale * codes."""
+    peak = max(abs(v) for v in vector) if vector else 0.0
+    scale = peak / 127.0 if peak else 1.0
+    return scale, [int(round(v / scale)) for v in vector]
+
+def write_quantized(path, matrix, dim):
+    """File layout: count float32 scales, then count * dim int8 codes."""
+    count = len(matrix) // dim if dim else 0
+    scales, codes = array.array("f"), array.array("b")
+    for i in range(count):
+        scale, row_codes = quantize_int8(matrix[i * dim:(i + 1) * dim])
+        scales.append(scale)
+        codes.extend(row_codes)
+    with open(path, "wb") as f:
+        _to_little_endian(scales).tofile(f)
+        codes.tofile(f)
+
+
+# --- [ WRITER (used by rag_builder.py) ] ---
+
+def save_store(kb_path, items, quantization=None):
+    """Write pre-normalised vectors + metadata sidecar for a list of KB items.
+    Each item is a dict with a 'vector' key; every other key goes to the sidecar.
+    quantization="int8" also writes the compact .q8 copy used for scanning.
+    """
+    dim = len(items[0]["vector"]) if items else 0
+    matrix = array.array("f")
+    metadata = []
+    for item in items:
+        vector = item["vector"]
+        if len(vector) != dim:
+            raise ValueError("Vector size mismatch for '{}'".format(item.get("title")))
+        matrix.extend(normalize(vector))
+        metadata.append(dict((k, v) for k, v in item.items() if k != "vector"))
+
+    vec_path, meta_path = store_paths(kb_path)
+    write_matrix(vec_path, matrix)
+    if quantization == "int8":
+        write_quantized(quant_path(kb_path), matrix, dim)
+    elif quantization:
+        raise ValueError("Unsupported quantization: {}".format(quantization))
+    elif os.path.exists(quant_path(kb_path)):
+        os.remove(quant_path(kb_path))  # left over from an older build
+
+    meta = {
+        "version": STORE_VERSION,
+        "dtype": "float32",
+        "quantization": quantization,
+        "dim": dim,
+        "count": len(metadata),
+        "items": metadata,
+    }
+    # ASCII-escaped JSON reads the same on IronPython 2.7 and CPython 3
+    with open(meta_path, "w") as f:
+        f.write(json.dumps(meta))
+    return vec_path, meta_path
+
+
+# --- [ READER (used by script.py) ] ---
+
+def can_mmap():
+    return sys.version_info[0] >= 3 and sys.byteorder == "little"
+
+def read_matrix(vec_path, count, dim, typecode="f", offset=0):
+    """Memory-map a binary matrix where the engine allows it, else read it.
+    typecode 'f' = float32 vectors, 'i' = int32 ids, 'b' = int8 codes (all little-endian).
+    offset = bytes to skip at the start of the file.
+    """
+    expected = count * dim
+    size = array.array(typecode).itemsize
+    if can_mmap():
+        import mmap
+        with open(vec_path, "rb") as f:
+            if expected == 0:
+                return array.array(typecode)
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        matrix = memoryview(mapped)[offset:offset + expected * size].cast(typecode)
+    else:
+        # IronPython 2.7: plain read, still far cheaper than parsing JSON floats
+        matrix = array.array(typecode)
+        with open(vec_path, "rb") as f:
+            f.seek(offset)
+            matrix.fromfile(f, expected)
+        _to_little_endian(matrix)
+
+    if len(matrix) != expected:
+        raise ValueError("Corrupt binary file: {}".format(vec_path))
+    return matrix
+
+def write_matrix(path, values, typecode="f"):
+    """Write a flat list of floats ('f') or ints ('i') as a little-endian binary file."""
+    with open(path, "wb") as f:
+        _to_little_endian(array.array(typecode, values)).tofile(f)
+
+
+class VectorStore(object):
+    """An in-memory (or memory-mapped) matrix of unit vectors + their metadata."""
+
+    def __init__(self, dim, matrix, items):
+        self.dim = dim
+        self.matrix = matrix
+        self.items = items
+
+    def __len__(self):
+        return len(self.items)
+
+    @classmethod
+    def from_items(cls, items):
+        """Build an in-memory store from a list of {'vector': [...], ...} items."""
+        items = [item for item in items if item.get("vector")]
+        dim = len(items[0]["vector"]) if items else 0
+        matrix = array.array("f")
+        metadata = []
+        for item in items:
+            matrix.extend(normalize(item["vector"]))
+            metadata.append(dict((k, v) for k, v in item.items() if k != "vector"))
+        return cls(dim, matrix, metadata)
+
+    @classmethod
+    def load(cls, kb_path):
+        vec_path, meta_path = store_paths(kb_path)
+        with io.open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("version") != STORE_VERSION:
+            raise ValueError("Unsupported vector store version: {}".format(meta.get("version")))
+        if meta.get("quantization") == "int8" and os.path.exists(quant_path(kb_path)):
+            return QuantizedVectorStore.load(kb_path, meta)
+        matrix = read_matrix(vec_path, meta["count"], meta["dim"])
+        return cls(meta["dim"], matrix, meta["items"])
+
+    def row(self, index):
+        start = index * self.dim
+        return self.matrix[start:start + self.dim]
+
+    def scores(self, query_vector, rows=None):
+        """Cosine similarity of the query against every row (one matrix-vector pass).
+        Pass 'rows' to score only those row indices (used by the ANN index).
+        """
+        query = normalize(query_vector)
+        if len(query) != self.dim:
+            raise ValueError("Query has {} dims, store has {}".format(len(query), self.dim))
+        if rows is None:
+            rows = range(len(self.items))
+        return [dot(query, self.row(i)) for i in rows]
+
+    def search_rows(self, query_vector, top_k=3, rows=None):
+        """Return the top_k (score, row index) pairs, best first, without a full sort."""
+        rows = list(range(len(self.items))) if rows is None else list(rows)
+        scores = self.scores(query_vector, rows)
+        best = heapq.nlargest(top_k, range(len(scores)), key=scores.__getitem__)
+        return [(scores[i], rows[i]) for i in best]
+
+    def search(self, query_vector, top_k=3, rows=None):
+        """Return the top_k (score, item) pairs, best first."""
+        return [(score, self.items[row]) for score, row in self.search_rows(query_vector, top_k, rows)]
+
+
+class _LazyRows(object):
+    """float32 rows read from disk on demand (IronPython cannot memory-map)."""
+
+    def __init__(self, vec_path, dim):
+        self.vec_path = vec_path
+        self.dim = dim
+        self._rows = {}
+
+    def __getitem__(self, index):
+        row = self._rows.get(index)
+        if row is None:
+            row = array.array("f")
+            with open(self.vec_path, "rb") as f:
+                f.seek(index * self.dim * row.itemsize)
+                row.fromfile(f, self.dim)
+            self._rows[index] = row = _to_little_endian(row)
+        return row
+
+
+class QuantizedVectorStore(VectorStore):
+    """Scans int8 codes (4x less to load and read), then re-scores the best
+    top_k * RESCORE_FACTOR rows with the full float32 vectors, which are only
+    read for those rows (memory-mapped, or on demand on IronPython).
+    row() always returns the full precision vector.
+    """
+
+    def __init__(self, dim, scales, codes, full_rows, items, matrix=None):
+        VectorStore.__init__(self, dim, matrix, items)
+        self.scales = scales
+        self.codes = codes
+        self._full_rows = full_rows
+
+    @classmethod
+    def load(cls, kb_path, meta):
+        count, dim = meta["count"], meta["dim"]
+        path = quant_path(kb_path)
+        scales = read_matrix(path, count, 1, "f")
+        codes = read_matrix(path, count, dim, "b", offset=4 * count)
+        vec_path = store_paths(kb_path)[0]
+        if can_mmap():
+            matrix = read_matrix(vec_path, count, dim)  # memory-mapped: only touched rows are read
+            return cls(dim, scales, codes, None, meta["items"], matrix)
+        return cls(dim, scales, codes, _LazyRows(vec_path, dim), meta["items"])
+
+    def row(self, index):
+        if self._full_rows is not None:
+            return self._full_rows[index]
+        return VectorStore.row(self, index)
+
+    def approx_scores(self, query, rows):
+        dim, codes, scales = self.dim, self.codes, self.scales
+        return [scales[i] * dot(query, codes[i * dim:(i + 1) * dim]) for i in rows]
+
+    def search_rows(self, query_vector, top_k=3, rows=None):
+        query = normalize(query_vector)
+        if len(query) != self.dim:
+            raise ValueError("Query has {} dims, store has {}".format(len(query), self.dim))
+        rows = list(range(len(self.items))) if rows is None else list(rows)
+        approx = self.approx_scores(query, rows)
+        shortlist = heapq.nlargest(top_k * RESCORE_FACTOR, range(len(rows)), key=approx.__getitem__)
+        exact = [(dot(query, self.row(rows[i])), rows[i]) for i in shortlist]
+        return heapq.nlargest(top_k, exact, key=lambda pair: pair[0])
+
+
+def source_of(item):
+    """The source topic a chunk was cut from. Chunks without a 'source' (older
+    knowledge bases) count as their own source."""
+    return item.get("source", item.get("title"))
+
+
+def load_store(kb_path):
+    """Load a knowledge base once per session from the binary store next to
+    kb_path (.vec / .q8 + .meta.json). Reloads automatically when it is rebuilt.
+    """
+    if not has_store(kb_path):
+        raise IOError("No vector store next to '{}': run rag_builder.py".format(os.path.basename(kb_path)))
+    meta_path = store_paths(kb_path)[1]
+    key = os.path.abspath(kb_path)
+    mtime = os.path.getmtime(meta_path)
+
+    loaded = session_dict("bim_mentor_stores")  # path -> (modified time, store)
+    cached = loaded.get(key)
+    if cached and cached[0] == mtime:
+        return cached[1]
+
+    store = VectorStore.load(kb_path)
+    loaded[key] = (mtime, store)
+    return store
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+"""ParametersCopier - Copy Planner.
+Works out every change BEFORE the model is touched:
+  - the source values are read once (not once per target),
+  - in Type mode each type is a target once, however many of the picked
+    instances share it,
+  - a parameter is looked up by name once per target signature (same
+    category and type = same parameters); every other element reuses that
+    handle (element.get_Parameter(definition) instead of LookupParameter).
+    Only the definition and storage type are shared: whether a parameter
+    is read-only is asked per element (e.g. a formula in one family only),
+  - a value is only written if it is different from what is already there.
+The plan doubles as the dry-run diff (see CopyPlan.report).
+
+Pure Python: the Revit lookups are passed in as functions, so the planner
+can be tested outside Revit.
+"""
+
+try:
+    STRING_TYPES = (str, unicode)  # IronPython 2.7
+except NameError:
+    STRING_TYPES = (str,)
+
+DOUBLE_TOLERANCE = 1e-9  # internal units (feet): far below anything visible
+
+
+def coerce(value, storage_type):
+    """The value as the target parameter stores it ('String', 'Integer',
+    'Double' or 'ElementId' (id number)). Raises ValueError if impossible."""
+    if storage_type == "String":
+        return value if isinstance(value, STRING_TYPES) else u"{}".format(value)
+    if storage_type == "Integer":
+        return int(value)
+    if storage_type == "Double":
+        return float(value)
+    if storage_type == "ElementId":
+        if isinstance(value, STRING_TYPES) or isinstance(value, float):
+            raise ValueError("not an element id: {}".format(value))
+        return int(value)
+    raise ValueError("unknown storage type: {}".format(storage_type))
+
+
+def same_value(old, new, storage_type):
+    if storage_type == "Double" and old is not None and new is not None:
+        return abs(old - new) <= DOUBLE_TOLERANCE
+    return old == new
+
+
+class Change(object):
+    __slots__ = ("target", "name", "handle", "storage_type", "old", "new")
+
+    def __init__(self, target, name, handle, storage_type, old, new):
+        self.target = target
+        self.name = name
+        self.handle = handle
+        self.storage_type = storage_type
+        self.old = old
+        self.new = new
+
+
+class CopyPlan(object):
+    """The values to write, and why the others need nothing."""
+
+    def __init__(self):
+        self.changes = []        # Change, grouped by target (in target order)
+        self.targets = 0         # distinct targets
+        self.duplicates = 0      # instances sharing a type already planned
+        self.unchanged = 0       # values that are already right
+        self.skipped = {}        # reason -> count
+        self.lookups = 0         # parameter lookups by name
+
+    def __len__(self):
+        return len(self.changes)
+
+    def skip(self, reason):
+        self.skipped[reason] = self.skipped.get(reason, 0) + 1
+
+    def by_target(self):
+        """[(target, [changes])]: one item per target to update."""
+        groups = []
+        for change in self.changes:
+            if groups and groups[-1][0] is change.target:
+                groups[-1][1].append(change)
+            else:
+                groups.append((change.target, [change]))
+        return groups
+
+    def report(self, name=None, limit=30):
+        """Text summary (the dry-run diff), with the first few changes listed."""
+        name = name or (lambda target: str(target))
+        lines = [
+            "Targets:             {}".format(self.targets),
+            "  same type again:   {}".format(self.duplicates),
+            "  to update:         {}".format(len(self.by_target())),
+            "Values to change:    {}".format(len(self.changes)),
+            "  already equal:     {}".format(self.unchanged),
+        ]
+        for reason in sorted(self.skipped):
+            lines.append("  skipped, {}: {}".format(reason, self.skipped[reason]))
+        lines.append("Parameter lookups:   {}".format(self.lookups))
+        for change in self.changes[:limit]:
+            lines.append(u"  {} | {}: {} -> {}".format(name(change.target), change.name,
+                                                       _show(change.old), _show(change.new)))
+        if len(self.changes) > limit:
+            lines.append("  ... and {} more".format(len(self.changes) - limit))
+        return u"\n".join(lines)
+
+
+def _show(value):
+    return "<empty>" if value is None or value == "" else repr(value) if isinstance(value, float) else value
+
+
+def plan_copy(targets, mappings, key, signature, resolve, read, source_values=None, writable=None):
+    """Build a CopyPlan.
+    targets:             target objects (elements or types; the same type may come many times)
+    mappings:            [(source parameter name, target parameter name)], or with a third
+                         item: transform(value) -> new value (see mapping_profiles.py)
+    key(t):              a hashable id of a target (targets with the same key are written once)
+    signature(t):        targets with the same signature have the same parameters (e.g. the type)
+    resolve(t, name):    (handle, storage type) of a parameter of t, or None if t has no
+                         such parameter; asked once per signature and name
+    read(t, handle):     the current value (None if empty)
+    source_values:       {source name: value} read once from the source element, or None to
+                         read the source parameters of each target itself ("internal transfer")
+    writable(t, handle): can this target's parameter be written? Asked per target
+                         (None: always)
+    """
+    plan = CopyPlan()
+    handles = {}
+    seen = set()
+    mappings = [(m[0], m[1], m[2] if len(m) > 2 else None) for m in mappings]
+
+    def handle_of(target, name):
+        k = (signature(target), name)
+        if k not in handles:
+            handles[k] = resolve(target, name)
+        return handles[k]
+
+    for target in targets:
+        k = key(target)
+        if k in seen:
+            plan.duplicates += 1
+            continue
+        seen.add(k)
+        plan.targets += 1
+        own_values = {}  # source values of this target, each read once
+
+        for source_name, target_name, transform in mappings:
+            if source_values is None:
+                if source_name not in own_values:
+                    found = handle_of(target, source_name)
+                    own_values[source_name] = read(target, found[0]) if found else None
+                value = own_values[source_name]
+            else:
+                value = source_values.get(source_name)
+            if value is None:
+                plan.skip("no source value")
+                continue
+            if transform is not None:
+                try:
+                    value = transform(value)
+                except (TypeError, ValueError):
+                    plan.skip("transform does not fit the value")
+                    continue
+
+            found = handle_of(target, target_name)
+            if found is None:
+                plan.skip("parameter missing")
+                continue
+            handle, storage_type = found
+            if writable is not None and not writable(target, handle):
+                plan.skip("parameter read-only")
+                continue
+            try:
+                new = coerce(value, storage_type)
+            except (TypeError, ValueError):
+                plan.skip("value does not fit the parameter")
+                continue
+
+            old = read(target, handle)
+            if same_value(old, new, storage_type):
+                plan.unchanged += 1
+                continue
+            plan.changes.append(Change(target, target_name, handle, storage_type, old, new))
+
+    plan.lookups = len(handles)
+    return plan
@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+"""ParametersCopier - Mapping Profiles.
+A profile is a saved list of 'source parameter -> target parameter' pairs,
+each with optional value transforms, run in ONE pass over the targets
+(see copy_planner.plan_copy). One mapping per line:
+
+    Comments -> Mark
+    Length -> Length (mm) | convert ft->mm | round 0
+    Mark -> Door Number | prefix D- | suffix -A
+    Fire Rating -> FR Minutes | lookup 1 HR=60, 2 HR=120 | default 0
+
+Transforms run left to right:
+    convert <units>   unit conversion, e.g. ft->mm (Revit stores lengths in feet)
+    scale <number>    multiply by a number
+    round <digits>    round a number (round 0 gives a whole number)
+    prefix <text>     / suffix <text>: add text before / after the value
+    lookup a=b, c=d   replace a value found in the table
+    default <value>   used by lookup for values not in the table (else unchanged)
+
+Pure Python (IronPython 2.7 / CPython 3). Profiles are saved as JSON.
+"""
+
+import io
+import json
+import math
+
+UNITS = {
+    "ft->mm": 304.8,
+    "ft->cm": 30.48,
+    "ft->m": 0.3048,
+    "ft->in": 12.0,
+    "sqft->m2": 0.09290304,
+    "cuft->m3": 0.028316846592,
+    "rad->deg": 180.0 / math.pi,
+}
+for _units, _factor in list(UNITS.items()):
+    _from, _to = _units.split("->")
+    UNITS["{}->{}".format(_to, _from)] = 1.0 / _factor
+
+TRANSFORMS = ("convert", "scale", "round", "prefix", "suffix", "lookup", "default")
+
+
+class ProfileError(Exception):
+    pass
+
+
+def _text(value):
+    return value if not isinstance(value, (int, float)) else u"{}".format(value)
+
+
+class Mapping(object):
+    """source -> target, with [(transform, argument)]"""
+
+    def __init__(self, source, target, transforms=None):
+        self.source = source
+        self.target = target
+        self.transforms = [tuple(t) for t in (transforms or [])]
+        for name, argument in self.transforms:
+            if name not in TRANSFORMS:
+                raise ProfileError("Unknown transform: {}".format(name))
+            if name == "convert" and argument not in UNITS:
+                raise ProfileError("Unknown units: {} (known: {})".format(argument, ", ".join(sorted(UNITS))))
+
+    def transform(self, value):
+        """The value after every transform (raises ValueError if one does not fit)."""
+        default = dict(self.transforms).get("default")
+        for name, argument in self.transforms:
+            if name == "convert":
+                value = float(value) * UNITS[argument]
+            elif name == "scale":
+                value = float(value) * float(argument)
+            elif name == "round":
+                digits = int(argument)
+                value = int(round(float(value))) if digits == 0 else round(float(value), digits)
+            elif name == "prefix":
+                value = argument + _text(value)
+            elif name == "suffix":
+                value = _text(value) + argument
+            elif name == "lookup":
+                key = _text(value)
+                if key in argument:
+                    value = argument[key]
+                elif default is not None:
+                    value = default
+        return value
+
+    def for_planner(self):
+        """(source, target, transform or None) as copy_planner.plan_copy takes it."""
+        return (self.source, self.target, self.transform if self.transforms else None)
+
+    def to_line(self):
+        parts = [u"{} -> {}".format(self.source, self.target)]
+        for name, argument in self.transforms:
+            if name == "lookup":
+                argument = u", ".join(u"{}={}".format(k, v) for k, v in sorted(argument.items()))
+            parts.append(u"{} {}".format(name, argument))
+        return u" | ".join(parts)
+
+
+def parse_line(line):
+    """'Source -> Target | transform argument | ...' -> Mapping"""
+    parts = [part.strip() for part in line.split("|")]
+    if "->" not in parts[0]:
+        raise ProfileError("Expected 'Source -> Target': {}".format(parts[0]))
+    source, target = [name.strip() for name in parts[0].split("->", 1)]
+    if not source or not target:
+        raise ProfileError("Missing parameter name: {}".format(parts[0]))
+    transforms = []
+    for part in parts[1:]:
+        name, _, argument = part.partition(" ")
+        name = name.lower()
+        if name == "lookup":
+            table = {}
+            for pair in argument.split(","):
+                if "=" not in pair:
+                    raise ProfileError("Expected 'value=new value' in lookup: {}".format(pair.strip()))
+                key, new = pair.split("=", 1)
+                table[key.strip()] = new.strip()
+            argument = table
+        elif name in ("scale", "round"):
+            try:
+                float(argument)
+            except ValueError:
+                raise ProfileError("{} needs a number: {}".format(name, argument))
+        elif name == "convert":
+            argument = argument.strip()
+        # prefix / suffix / default: kept as typed (spaces inside are allowed)
+        transforms.append((name, argument))
+    return Mapping(source, target, transforms)
+
+
+def parse_mappings(text):
+    """Text with one mapping per line (blank lines and # comments skipped) -> [Mapping]"""
+    mappings = []
+    for number, line in enumerate(text.splitlines(), 1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        try:
+            mappings.append(parse_line(line))
+        except ProfileError as e:
+            raise ProfileError("Line {}: {}".format(number, e))
+    return mappings
+
+
+class MappingProfile(object):
+    """A named list of mappings.
+    from_targets: read the source parameters of each target itself (internal transfer)
+                  instead of the picked source element.
+    param_type_mode: 'Instance' or 'Type' parameters.
+    """
+
+    def __init__(self, name, mappings, from_targets=False, param_type_mode="Instance"):
+        self.name = name
+        self.mappings = list(mappings)
+        self.from_targets = bool(from_targets)
+        self.param_type_mode = param_type_mode
+
+    def to_text(self):
+        return u"\n".join(m.to_line() for m in self.mappings)
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "from_targets": self.from_targets,
+            "param_type_mode": self.param_type_mode,
+            "mappings": [{"source": m.source, "target": m.target,
+                          "transforms": [list(t) for t in m.transforms]} for m in self.mappings],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        mappings = [Mapping(m["source"], m["target"], m.get("transforms")) for m in data.get("mappings", [])]
+        return cls(data["name"], mappings, data.get("from_targets", False),
+                   data.get("param_type_mode", "Instance"))
+
+
+def load_profiles(path):
+    """{name: MappingProfile} saved in a JSON file ({} if there is none yet)."""
+    try:
+        with io.open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (IOError, OSError, ValueError):
+        return {}
+    profiles = {}
+    for item in data.get("profiles", []):
+        try:
+            profile = MappingProfile.from_dict(item)
+        except (KeyError, ProfileError):
+            continue
+        profiles[profile.name] = profile
+    return profiles
+
+
+def save_profiles(path, profiles):
+    data = {"profiles": [profiles[name].to_dict() for name in sorted(profiles)]}
+    text = json.dumps(data, indent=2, ensure_ascii=False)
+    with io.open(path, "w", encoding="utf-8") as f:
+        f.write(text if not isinstance(text, bytes) else text.decode("utf-8"))
@@ -1,11 +1,35 @@
 # --- [0] IMPORTS ---
 from pyrevit import revit, DB, UI, script
 from pyrevit import forms
+import os
 import wpf
 from System import Windows
+from copy_planner import plan_copy
+from mapping_profiles import MappingProfile, ProfileError, parse_mappings, load_profiles, save_profiles
+from batch_executor import run_in_transactions  # extension 'lib' folder
+from element_ids import id_value
 
 doc = revit.doc
 
+# Saved mapping profiles (Profiles tab)
+PROFILES_PATH = os.path.join(os.path.dirname(__file__), "mapping_profiles.json")
+
+# Targets per transaction: smaller = smoother progress bar, larger = less overhead
+CHUNK_SIZE = 500
+
+# Shift+Click the button for a dry run (shows what would change, the model is not changed)
+try:
+    DRY_RUN = __shiftclick__  # provided by pyRevit
+except NameError:
+    DRY_RUN = False
+
+STORAGE_TYPES = {
+    DB.StorageType.String: "String",
+    DB.StorageType.Integer: "Integer",
+    DB.StorageType.Double: "Double",
+    DB.StorageType.ElementId: "ElementId",
+}
+
 # --- [1] STATE CLASS (Data Storage) ---
 class ToolState:
     def __init__(self):
@@ -19,6 +43,10 @@ class ToolState:
         self.selected_params_auto = []
         self.selected_param_src_manual = None
         self.selected_param_tgt_manual = None
+        
+        # Profiles tab: the profile to run, and the fields kept while picking elements
+        self.profile = None
+        self.profile_draft = None
 
 # --- [2] HELPER FUNCTIONS (Logic) ---
 def get_element_or_type(element, mode="Instance"):
@@ -31,9 +59,28 @@ def get_element_or_type(element, mode="Instance"):
             return doc.GetElement(type_id)
     return None
 
-def get_param_value(element, param_name):
-    if not element: return None
+def parameter_signature(element):
+    """Elements with the same signature have the same parameters (same category and type)."""
+    category = id_value(element.Category.Id) if element.Category else None
+    if isinstance(element, DB.ElementType):
+        return (category, element.FamilyName)
+    return (category, id_value(element.GetTypeId()))
+
+def resolve_parameter(element, param_name):
+    """Looks a parameter up by name ONCE: (definition, storage type) or None.
+    The definition is then used for every element with the same signature."""
     param = element.LookupParameter(param_name)
+    if not param or param.StorageType not in STORAGE_TYPES:
+        return None
+    return param.Definition, STORAGE_TYPES[param.StorageType]
+
+def is_writable(element, definition):
+    """Read-only is checked per element: the same definition can be a formula in one family only."""
+    param = element.get_Parameter(definition)
+    return bool(param) and not param.IsReadOnly
+
+def read_value(element, definition):
+    param = element.get_Parameter(definition)
     if not param or not param.HasValue:
         return None
     
@@ -44,29 +91,51 @@ def get_param_value(element, param_name):
     elif param.StorageType == DB.StorageType.Double:
         return param.AsDouble()
     elif param.StorageType == DB.StorageType.ElementId:
-        return param.AsElementId()
+        return id_value(param.AsElementId())
     return None
 
-def set_param_value(element, param_name, value):
-    if not element: return False
-    param = element.LookupParameter(param_name)
-    
-    # SAFETY: Skip ReadOnly to prevent crashes
-    if not param or param.IsReadOnly:
-        return False
-    
+class ValueCounter(object):
+    """Values written / not written, counted by write_changes (one target = all or nothing).
+    A chunk's values only count as written once its transaction commits (chunk_end)."""
+    def __init__(self):
+        self.written = 0
+        self.failed = 0
+        self.pending = 0  # set in the current chunk, not committed yet
+
+    def chunk_end(self, number, committed):
+        if committed:
+            self.written += self.pending
+        else:
+            self.failed += self.pending  # rolled back with the chunk
+        self.pending = 0
+
+def write_changes(item, counter):
+    """Writes the planned values of one target in a SubTransaction: if one value
+    cannot be written, the target's other values are rolled back too (and it raises)."""
+    element, changes = item
+    sub = DB.SubTransaction(doc)
+    sub.Start()
     try:
-        if param.StorageType == DB.StorageType.String:
-            param.Set(str(value))
-        elif param.StorageType == DB.StorageType.Integer:
-            param.Set(int(value))
-        elif param.StorageType == DB.StorageType.Double:
-            param.Set(float(value))
-        elif param.StorageType == DB.StorageType.ElementId:
-            param.Set(value)
-        return True
-    except:
-        return False
+        for change in changes:
+            param = element.get_Parameter(change.handle)
+            # SAFETY: Skip ReadOnly to prevent crashes
+            if not param or param.IsReadOnly:
+                raise Exception("{} is missing or read-only".format(change.name))
+            value = DB.ElementId(change.new) if change.storage_type == "ElementId" else change.new
+            if not param.Set(value):
+                raise Exception("{} could not be set".format(change.name))
+    except Exception as e:
+        sub.RollBack()
+        counter.failed += len(changes)
+        # The batch executor only counts the failure: say here what and why
+        print("Not changed: {} ({})".format(element_label(element), e))
+        raise
+    sub.Commit()
+    counter.pending += len(changes)
+
+def element_label(element):
+    category = element.Category.Name if element.Category else "Element"
+    return "{} {}".format(category, id_value(element.Id))
 
 # --- [3] UI WINDOW (Interface) ---
 class SmartCopyWindow(Windows.Window):
@@ -80,8 +149,13 @@ class SmartCopyWindow(Windows.Window):
         self.btn_copy_auto.Click += self.on_copy_auto
         self.btn_copy_manual.Click += self.on_copy_manual
         self.cmb_param_type.SelectionChanged += self.on_param_type_changed
+        self.cmb_profile.SelectionChanged += self.on_profile_changed
+        self.btn_save_profile.Click += self.on_save_profile
+        self.btn_run_profile.Click += self.on_run_profile
 
+        self.profiles = load_profiles(PROFILES_PATH)
         self.refresh_ui()
+        self.load_profile_fields()
 
     def refresh_ui(self):
         # 1. Get Elements
@@ -137,11 +211,73 @@ class SmartCopyWindow(Windows.Window):
     def on_param_type_changed(self, sender, args):
         self.refresh_ui()
 
+    def load_profile_fields(self):
+        self.cmb_profile.ItemsSource = sorted(self.profiles)
+        if self.state.profile_draft:
+            name, text, type_mode, from_targets = self.state.profile_draft
+            self.txt_profile_name.Text = name
+            self.txt_mappings.Text = text
+            self.chk_profile_type.IsChecked = type_mode
+            self.chk_profile_from_targets.IsChecked = from_targets
+
+    def remember_profile_fields(self):
+        self.state.profile_draft = (self.txt_profile_name.Text, self.txt_mappings.Text,
+                                    bool(self.chk_profile_type.IsChecked),
+                                    bool(self.chk_profile_from_targets.IsChecked))
+
+    def read_profile(self):
+        """The profile in the fields (raises ProfileError with the line at fault)."""
+        mappings = parse_mappings(self.txt_mappings.Text or "")
+        if not mappings:
+            raise ProfileError("Add at least one 'Source -> Target' line.")
+        return MappingProfile(self.txt_profile_name.Text.strip() or "Untitled", mappings,
+                              from_targets=bool(self.chk_profile_from_targets.IsChecked),
+                              param_type_mode="Type" if self.chk_profile_type.IsChecked else "Instance")
+
+    def on_profile_changed(self, sender, args):
+        profile = self.profiles.get(self.cmb_profile.SelectedItem)
+        if profile:
+            self.txt_profile_name.Text = profile.name
+            self.txt_mappings.Text = profile.to_text()
+            self.chk_profile_type.IsChecked = profile.param_type_mode == "Type"
+            self.chk_profile_from_targets.IsChecked = profile.from_targets
+
+    def on_save_profile(self, sender, args):
+        if not self.txt_profile_name.Text.strip():
+            forms.alert("Give the profile a name.")
+            return
+        try:
+            profile = self.read_profile()
+        except ProfileError as e:
+            forms.alert(str(e))
+            return
+        self.profiles[profile.name] = profile
+        save_profiles(PROFILES_PATH, self.profiles)
+        self.cmb_profile.ItemsSource = sorted(self.profiles)
+        forms.alert("Profile '{}' saved ({} mappings).".format(profile.name, len(profile.mappings)))
+
+    def on_run_profile(self, sender, args):
+        try:
+            profile = self.read_profile()
+        except ProfileError as e:
+            forms.alert(str(e))
+            return
+        if not self.state.target_ids or not (profile.from_targets or self.state.source_id):
+            forms.alert("Targets required (and a Source, unless values are read from each target).")
+            return
+        self.state.profile = profile
+        self.state.mode = "profile"
+        self.remember_profile_fields()
+        self.next_action = "copy"
+        self.Close()
+
     def on_pick_source(self, sender, args):
+        self.remember_profile_fields()
         self.next_action = "pick_src"
         self.Close()
 
     def on_pick_target(self, sender, args):
+        self.remember_profile_fields()
         self.next_action = "pick_tgt"
         self.Close()
 
@@ -192,47 +328,77 @@ while True:
         except: pass
 
     elif window.next_action == "copy":
-        t = DB.Transaction(doc, "Copy Parameters")
-        t.Start()
-        
-        count = 0
-        
         source_base = doc.GetElement(app_state.source_id) if app_state.source_id else None
         target_bases = []
         for eid in app_state.target_ids:
             el = doc.GetElement(eid)
             if el: target_bases.append(el)
         
-        # LOGIC FOR AUTO COPY
+        # LOGIC FOR AUTO COPY: same parameter name on source and targets
         if app_state.mode == "auto":
-            if source_base:
-                source_obj = get_element_or_type(source_base, app_state.param_type_mode)
-                
-                for target_base in target_bases:
-                    target_obj = get_element_or_type(target_base, app_state.param_type_mode)
-                    
-                    if source_obj and target_obj:
-                        updated = False
-                        for p_name in app_state.selected_params_auto:
-                            val = get_param_value(source_obj, p_name)
-                            if val is not None:
-                                if set_param_value(target_obj, p_name, val):
-                                    updated = True
-                        if updated: count += 1
-
-        # LOGIC FOR MANUAL COPY
+            param_type_mode = app_state.param_type_mode
+            mappings = [(p_name, p_name) for p_name in app_state.selected_params_auto]
+            from_targets = False
+
+        # LOGIC FOR MANUAL COPY: each target copies between two of its own parameters
         elif app_state.mode == "manual":
             p_src = app_state.selected_param_src_manual
             p_tgt = app_state.selected_param_tgt_manual
-            if p_src and p_tgt:
-                for target in target_bases:
-                    val = get_param_value(target, p_src)
-                    if val is not None:
-                        if set_param_value(target, p_tgt, val):
-                            count += 1
+            param_type_mode = "Instance"
+            mappings = [(p_src, p_tgt)] if p_src and p_tgt else []
+            from_targets = True
+
+        # LOGIC FOR PROFILES: every mapping (with its transforms) in the same pass
+        else:
+            param_type_mode = app_state.profile.param_type_mode
+            mappings = [m.for_planner() for m in app_state.profile.mappings]
+            from_targets = app_state.profile.from_targets
+
+        # Source values are read once (not once per target), each type is written once
+        source_values = None
+        if not from_targets:
+            source_values = {}
+            source_obj = get_element_or_type(source_base, param_type_mode) if source_base else None
+            if source_obj:
+                for p_name in set(m[0] for m in mappings):
+                    found = resolve_parameter(source_obj, p_name)
+                    if found:
+                        source_values[p_name] = read_value(source_obj, found[0])
+        targets = [get_element_or_type(t, param_type_mode) for t in target_bases]
+        targets = [t for t in targets if t]
+        
+        # Plan first: only the values that differ are written (see copy_planner.py)
+        plan = plan_copy(targets, mappings,
+                         key=lambda element: id_value(element.Id),
+                         signature=parameter_signature,
+                         resolve=resolve_parameter,
+                         read=read_value,
+                         source_values=source_values,
+                         writable=is_writable)
+        print(plan.report(name=element_label))
+        
+        # Shift+Click = dry run: only show the plan
+        if DRY_RUN:
+            forms.alert("Dry run: {} values would change. Nothing was changed.".format(len(plan)))
+            break
         
-        t.Commit()
-        forms.alert("Done! Updated {} elements.".format(count))
+        counter = ValueCounter()
+        message = "Done! Nothing to change."
+        if len(plan):
+            # Committed in chunks (progress bar + Cancel), still one step in Undo
+            result = run_in_transactions(doc, "Copy Parameters", plan.by_target(),
+                                         lambda item: write_changes(item, counter),
+                                         chunk_size=CHUNK_SIZE, on_chunk_end=counter.chunk_end)
+            print(result.summary())
+            message = "Done! {} values written on {} elements.".format(
+                counter.written, result.done - result.failed)
+            if counter.failed:
+                message += "\n{} values not written: {} elements left unchanged (see the output).".format(
+                    counter.failed, result.failed)
+            if result.failed_chunks:
+                message += "\n{} chunks were rolled back: their values are not written.".format(
+                    result.failed_chunks)
+        forms.alert(message)
         break
 
     else:
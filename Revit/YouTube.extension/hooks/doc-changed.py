@@ -0,0 +1,17 @@
+"""Tells the session caches of the document (lib/session_cache.py: the
+parameter index, the document metadata) which elements were changed or
+deleted, so SelectElements only re-reads those.
+Runs after every model change: it must stay cheap.
+"""
+from pyrevit import EXEC_PARAMS
+from session_cache import cached_objects, document_key
+from element_ids import id_value
+
+args = EXEC_PARAMS.event_args
+cached = [c for c in cached_objects(document_key(args.GetDocument())) if hasattr(c, "mark_changed")]
+if cached:
+    changed = [id_value(i) for i in args.GetAddedElementIds()]
+    changed.extend(id_value(i) for i in args.GetModifiedElementIds())
+    deleted = [id_value(i) for i in args.GetDeletedElementIds()]
+    for cache in cached:
+        cache.mark_changed(changed, deleted)
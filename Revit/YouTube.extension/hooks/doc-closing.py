@@ -0,0 +1,7 @@
+"""Drops the session caches of a document that is being closed
+(it may be changed by someone else before it is opened again).
+"""
+from pyrevit import EXEC_PARAMS
+from session_cache import forget, document_key
+
+forget(document_key(EXEC_PARAMS.event_args.Document))
@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+"""Shared - Chunked Batch Executor.
+Runs many model changes in chunks of CHUNK_SIZE, each in its own
+Transaction, all inside one TransactionGroup:
+  - Revit regenerates after every chunk, so the progress bar really moves
+    (with an estimate of the time left) and Cancel is honoured between chunks.
+  - A chunk that fails is rolled back on its own; the other chunks are kept.
+  - The whole run is still ONE step in Undo.
+  - Every chunk is timed, so the chunk size can be tuned per model.
+
+Used by the AutoJoin and UnJoinAll buttons (pyRevit puts this 'lib' folder
+on the path of every button of the extension). BatchExecutor itself is
+pure Python (IronPython 2.7 / CPython 3); run_in_transactions() is the
+Revit + pyRevit part.
+"""
+
+import os
+import json
+import time
+
+DEFAULT_CHUNK_SIZE = 200
+
+
+def chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def format_eta(seconds):
+    """12 -> '12 s', 150 -> '2 min 30 s'"""
+    seconds = int(round(seconds))
+    if seconds < 60:
+        return "{} s".format(seconds)
+    return "{} min {} s".format(seconds // 60, seconds % 60)
+
+
+class BatchResult(object):
+    def __init__(self, total):
+        self.total = total
+        self.done = 0            # items run (failed ones included)
+        self.failed = 0          # items that raised
+        self.failed_chunks = 0   # chunks rolled back
+        self.cancelled = False
+        self.warnings = 0        # Revit warnings hidden (hide_warnings=True)
+        self.timings = []        # (chunk number, items, seconds)
+
+    @property
+    def seconds(self):
+        return sum(t[2] for t in self.timings)
+
+    def summary(self):
+        text = "{} of {} done, {} failed".format(self.done, self.total, self.failed)
+        if self.failed_chunks:
+            text += ", {} chunks rolled back".format(self.failed_chunks)
+        if self.cancelled:
+            text += " (cancelled)"
+        if self.warnings:
+            text += "\n{} Revit warnings were hidden (e.g. 'elements are joined but do not intersect')".format(
+                self.warnings)
+        if self.timings:
+            slowest = max(self.timings, key=lambda t: t[2])
+            text += "\n{} chunks in {:.1f} s: {:.1f} ms per item, slowest chunk #{} {:.1f} s".format(
+                len(self.timings), self.seconds, 1000.0 * self.seconds / max(1, self.done),
+                slowest[0], slowest[2])
+        return text
+
+
+class BatchExecutor(object):
+    """Runs apply_one(item) for every item, chunk by chunk.
+    begin_chunk(number) / end_chunk(number) wrap each chunk (e.g. start and
+    commit a transaction); if end_chunk raises, rollback_chunk(number) is
+    called and the chunk counts as failed.
+    on_chunk_end(number, committed) is called after each chunk, once it is
+    committed (True) or rolled back (False): what apply_one did only sticks
+    if committed.
+    on_progress(done, total, seconds_left) is called after each chunk;
+    is_cancelled() is checked before each chunk.
+    """
+
+    def __init__(self, chunk_size=DEFAULT_CHUNK_SIZE, begin_chunk=None, end_chunk=None,
+                 rollback_chunk=None, on_progress=None, is_cancelled=None, on_chunk_end=None):
+        self.chunk_size = max(1, int(chunk_size))
+        self.begin_chunk = begin_chunk or (lambda number: None)
+        self.end_chunk = end_chunk or (lambda number: None)
+        self.rollback_chunk = rollback_chunk or (lambda number: None)
+        self.on_progress = on_progress or (lambda done, total, left: None)
+        self.is_cancelled = is_cancelled or (lambda: False)
+        self.on_chunk_end = on_chunk_end or (lambda number, committed: None)
+
+    def run(self, items, apply_one):
+        items = list(items)
+        result = BatchResult(len(items))
+        for number, chunk in enumerate(chunks(items, self.chunk_size), 1):
+            if self.is_cancelled():
+                result.cancelled = True
+                break
+            start = time.time()
+            failed = 0
+            self.begin_chunk(number)
+            try:
+                for item in chunk:
+                    try:
+                        apply_one(item)
+                    except Exception:
+                        failed += 1
+                self.end_chunk(number)
+                committed = True
+            except Exception as e:
+                print("Chunk {} failed and was rolled back: {}".format(number, e))
+                self.rollback_chunk(number)
+                result.failed_chunks += 1
+                failed = len(chunk)
+                committed = False
+            self.on_chunk_end(number, committed)
+            result.timings.append((number, len(chunk), time.time() - start))
+            result.done += len(chunk)
+            result.failed += failed
+
+            per_item = result.seconds / result.done
+            self.on_progress(result.done, result.total, per_item * (result.total - result.done))
+        return result
+
+
+def save_timings(path, name, chunk_size, result):
+    """Append one line per run (JSON), to compare chunk sizes later."""
+    line = {"name": name, "time": int(time.time()), "chunk_size": chunk_size, "items": result.done,
+            "failed": result.failed, "seconds": round(result.seconds, 3),
+            "chunks": [round(t[2], 3) for t in result.timings]}
+    try:
+        with open(path, "a") as f:
+            f.write(json.dumps(line) + "\n")
+    except Exception as e:
+        print("Could not save timings: {}".format(e))
+
+
+# --- [ REVIT ] ---
+
+def _warning_swallower():
+    """Failure preprocessor that hides warnings (e.g. 'elements are joined but do
+    not intersect'), so chunked commits don't open one dialog per chunk.
+    .hidden counts them, so the run can still report them."""
+    from Autodesk.Revit.DB import IFailuresPreprocessor, FailureProcessingResult, FailureSeverity
+
+    class SwallowWarnings(IFailuresPreprocessor):
+        hidden = 0
+
+        def PreprocessFailures(self, accessor):
+            for failure in accessor.GetFailureMessages():
+                if failure.GetSeverity() == FailureSeverity.Warning:
+                    accessor.DeleteWarning(failure)
+                    self.hidden += 1
+            return FailureProcessingResult.Continue
+
+    return SwallowWarnings()
+
+
+def run_in_transactions(doc, name, items, apply_one, chunk_size=DEFAULT_CHUNK_SIZE,
+                        timings_path=None, hide_warnings=True, on_chunk_end=None):
+    """Run apply_one(item) for every item in chunked transactions inside one
+    TransactionGroup, with a cancellable progress bar. Returns a BatchResult.
+    Cancelling keeps the chunks already done (still one Undo step).
+    hide_warnings=True deletes Revit warnings instead of showing them; their
+    number is in result.warnings (and in result.summary()).
+    on_chunk_end(number, committed): see BatchExecutor.
+    """
+    from Autodesk.Revit.DB import Transaction, TransactionGroup, TransactionStatus
+    from pyrevit import forms
+
+    items = list(items)
+    group = TransactionGroup(doc, name)
+    group.Start()
+    current = {}
+    preprocessor = _warning_swallower() if hide_warnings else None
+
+    def begin_chunk(number):
+        t = Transaction(doc, "{} ({})".format(name, number))
+        if preprocessor is not None:
+            options = t.GetFailureHandlingOptions()
+            options.SetFailuresPreprocessor(preprocessor)
+            t.SetFailureHandlingOptions(options)
+        t.Start()
+        current["t"] = t
+
+    def end_chunk(number):
+        if current["t"].Commit() != TransactionStatus.Committed:
+            raise Exception("Revit did not commit the chunk")
+
+    def rollback_chunk(number):
+        t = current.get("t")
+        if t is not None and t.HasStarted() and not t.HasEnded():
+            t.RollBack()
+
+    try:
+        with forms.ProgressBar(title=name + " ({value} of {max_value})", cancellable=True) as bar:
+            def on_progress(done, total, seconds_left):
+                bar.title = "{} ({{value}} of {{max_value}}, about {} left)".format(name, format_eta(seconds_left))
+                bar.update_progress(done, total)
+
+            executor = BatchExecutor(chunk_size, begin_chunk, end_chunk, rollback_chunk,
+                                     on_progress, lambda: bar.cancelled, on_chunk_end)
+            result = executor.run(items, apply_one)
+        if preprocessor is not None:
+            result.warnings = preprocessor.hidden
+        group.Assimilate()  # one Undo step
+    except Exception:
+        rollback_chunk(None)
+        group.RollBack()
+        raise
+
+    if timings_path:
+        save_timings(timings_path, name, chunk_size, result)
+    return result
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""Shared - Document Metadata Cache.
+What the SelectElements window needs to know about a document before it
+can show anything: category names (both ways), element counts per
+category and the parameter definitions (ids + storage types) per category.
+Read from Revit once, then kept in the session cache (session_cache.py):
+opening the window or changing a drop-down no longer asks Revit again.
+Element counts are recounted only after the model has changed.
+
+Pure Python (IronPython 2.7 / CPython 3): the Revit reads stay in the
+button's script.
+"""
+
+
+class DocumentMetadata(object):
+
+    def __init__(self):
+        self.category_names = {}   # category (BuiltInCategory) -> display name
+        self.categories = {}       # display name -> category
+        self.counts = {}           # category -> number of elements
+        # category key (number) -> {parameter name: set((parameter id number, storage type))}
+        # A name can have several ids (e.g. a shared and a project parameter)
+        self.definitions = {}
+        self.counts_stale = True
+
+    @property
+    def loaded(self):
+        return bool(self.category_names)
+
+    def add_category(self, category, name):
+        self.category_names[category] = name
+        self.categories[name] = category
+
+    def category_from_name(self, name):
+        return self.categories.get(name)
+
+    def category_name(self, category):
+        return self.category_names.get(category, str(category))
+
+    def set_counts(self, counts):
+        self.counts = dict(counts)
+        self.counts_stale = False
+
+    def non_empty_names(self, categories):
+        """Display names of the categories that have elements, in the given order."""
+        return [self.category_names[c] for c in categories
+                if c in self.category_names and self.counts.get(c, 0) > 0]
+
+    def definitions_of(self, category_key, parameter_name):
+        """[(parameter id number, storage type)] of every parameter with this name
+        in the category, empty if no element of the category has it."""
+        return sorted(self.definitions.get(category_key, {}).get(parameter_name, ()), key=lambda d: d[0])
+
+    def mark_changed(self, changed_ids, deleted_ids=()):
+        # Called by the doc-changed hook: elements may have been added or deleted
+        if changed_ids or deleted_ids:
+            self.counts_stale = True
@@ -0,0 +1,11 @@
+# -*- coding: utf-8 -*-
+"""Shared - Element Id Helpers.
+ElementId.IntegerValue is deprecated since Revit 2024 (ids became 64-bit,
+read through .Value) and removed in Revit 2026: read ids through id_value().
+"""
+
+
+def id_value(element_id):
+    """ElementId -> int (Revit 2024+ has .Value, older versions .IntegerValue)."""
+    value = getattr(element_id, "Value", None)
+    return int(value) if value is not None else element_id.IntegerValue
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""Shared - Parameter Value Index.
+For every category: parameter name -> value -> ids of the elements with
+that value. Built with ONE pass over the elements of a category, then:
+  - the SelectElements drop-downs list every parameter and every value
+    (not just those of the first 100 elements), instantly,
+  - finding the elements with 'Mark = A-101' is a dictionary lookup.
+
+The index lives for the whole Revit session (see session_index()). The
+extension's doc-changed hook (hooks/doc-changed.py) marks changed and
+deleted elements, and only those are read again before the next use.
+
+ParameterIndex is pure Python (IronPython 2.7 / CPython 3).
+"""
+
+import threading
+
+import session_cache
+from session_cache import document_key  # noqa: F401 (used by the button)
+
+
+class ParameterIndex(object):
+    """{category: {parameter name: {value: set(element ids)}}} + what each element holds."""
+
+    def __init__(self):
+        self.categories = {}      # category -> {name: {value: set(ids)}}
+        self.elements = {}        # element id -> (category, {name: value})
+        self.loaded = set()       # categories indexed so far
+        self._changed = set()     # ids edited since the last refresh
+        self._deleted = set()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.elements)
+
+    # --- [ BUILDING ] ---
+
+    def add(self, category, element_id, values):
+        """Index (or re-index) one element: values = {parameter name: value text}."""
+        self.remove(element_id)
+        names = self.categories.setdefault(category, {})
+        for name, value in values.items():
+            names.setdefault(name, {}).setdefault(value, set()).add(element_id)
+        self.elements[element_id] = (category, values)
+
+    def remove(self, element_id):
+        entry = self.elements.pop(element_id, None)
+        if entry is None:
+            return
+        category, values = entry
+        names = self.categories.get(category, {})
+        for name, value in values.items():
+            ids = names.get(name, {}).get(value)
+            if ids is None:
+                continue
+            ids.discard(element_id)
+            if not ids:
+                del names[name][value]
+                if not names[name]:
+                    del names[name]
+
+    def mark_loaded(self, category):
+        self.loaded.add(category)
+        self.categories.setdefault(category, {})
+
+    def ensure_loaded(self, category, read_category):
+        """Index a category the first time it is needed: read_category() yields
+        (element id, values) for all its elements. Later calls read nothing.
+        Returns True if the category was read now."""
+        if category in self.loaded:
+            return False
+        for element_id, values in read_category():
+            self.add(category, element_id, values)
+        self.mark_loaded(category)
+        return True
+
+    # --- [ CHANGES (doc-changed hook) ] ---
+
+    def mark_changed(self, changed_ids, deleted_ids=()):
+        with self._lock:
+            self._changed.update(changed_ids)
+            self._deleted.update(deleted_ids)
+
+    def take_changes(self):
+        """(changed ids, deleted ids) since the last call; the lists are emptied."""
+        with self._lock:
+            changed, deleted = self._changed - self._deleted, self._deleted
+            self._changed, self._deleted = set(), set()
+        return changed, deleted
+
+    @property
+    def has_changes(self):
+        return bool(self._changed or self._deleted)
+
+    def refresh(self, read_element):
+        """Re-read only the elements changed since the last refresh.
+        read_element(element id) gives (category, values), or None if the element
+        is gone or not indexable. Elements of categories not loaded yet are skipped
+        (they are read with their category). Returns the number of ids re-read."""
+        changed, deleted = self.take_changes()
+        for element_id in deleted:
+            self.remove(element_id)
+        for element_id in changed:
+            found = read_element(element_id)
+            if found is None:
+                self.remove(element_id)
+            elif found[0] in self.loaded:
+                self.add(found[0], element_id, found[1])
+        return len(changed)
+
+    # --- [ LOOKUPS ] ---
+    # categories=None means every indexed category
+
+    def _names(self, categories):
+        for category in (self.loaded if categories is None else categories):
+            yield self.categories.get(category, {})
+
+    def parameter_names(self, categories=None):
+        found = set()
+        for names in self._names(categories):
+            found.update(names)
+        return sorted(found)
+
+    def values(self, name, categories=None):
+        found = set()
+        for names in self._names(categories):
+            found.update(names.get(name, {}))
+        return sorted(found)
+
+    def parameters(self, categories=None):
+        """[(parameter name, sorted values)], for the drop-downs."""
+        merged = {}
+        for names in self._names(categories):
+            for name, values in names.items():
+                merged.setdefault(name, set()).update(values)
+        return [(name, sorted(merged[name])) for name in sorted(merged)]
+
+    def element_ids(self, name, value, categories=None, ignore_case=False):
+        found = set()
+        for names in self._names(categories):
+            values = names.get(name, {})
+            if not ignore_case:
+                found.update(values.get(value, ()))
+                continue
+            wanted = value.lower()
+            for other, ids in values.items():
+                if other.lower() == wanted:
+                    found.update(ids)
+        return found
+
+
+def session_index(doc_key, create=True):
+    """The document's ParameterIndex for this Revit session (kept in the
+    session cache, so it survives between button clicks), or None.
+    A new index is empty (and so falsy): test it with 'is None', not 'or'."""
+    return session_cache.get(doc_key, "parameter_index", ParameterIndex if create else None)
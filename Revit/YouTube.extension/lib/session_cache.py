@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""Shared - Per-Document Session Cache.
+Objects that should live as long as Revit does (not just one click of a
+button) are kept here, per open document. They are stored in the .NET
+AppDomain, because the variables of a pyRevit script are gone once it ends.
+
+doc_key None is for objects that do not belong to a document (e.g. the
+BIM Mentor knowledge base). Outside Revit (tests, command-line tools) the
+objects are kept in a plain dict for the life of the Python process.
+
+Cached objects with a mark_changed(changed_ids, deleted_ids) method are told
+about every model change by the extension's doc-changed hook, and the whole
+cache of a document is dropped when it closes (doc-closing hook).
+"""
+
+SESSION_KEY = "YOUTUBE_EXT_SESSION_CACHE"
+NO_DOCUMENT = "*"
+
+_LOCAL = {}  # outside Revit: cache key -> objects
+
+
+def document_key(doc):
+    """Identifies an open document (its path, or its title if never saved)."""
+    return doc.PathName or doc.Title
+
+
+def _key(doc_key):
+    return "{}:{}".format(SESSION_KEY, NO_DOCUMENT if doc_key is None else doc_key)
+
+
+def _objects(doc_key, create):
+    key = _key(doc_key)
+    try:
+        from System import AppDomain
+    except ImportError:
+        if create:
+            _LOCAL.setdefault(key, {})
+        return _LOCAL.get(key)
+    objects = AppDomain.CurrentDomain.GetData(key)
+    if objects is None and create:
+        objects = {}
+        AppDomain.CurrentDomain.SetData(key, objects)
+    return objects
+
+
+def get(doc_key, name, factory=None):
+    """The cached object called name, created with factory() if missing.
+    Without a factory a missing object gives None."""
+    objects = _objects(doc_key, create=factory is not None)
+    if objects is None:
+        return None
+    if name not in objects and factory is not None:
+        objects[name] = factory()
+    return objects.get(name)
+
+
+def cached_objects(doc_key):
+    objects = _objects(doc_key, create=False)
+    return list(objects.values()) if objects else []
+
+
+def forget(doc_key):
+    try:
+        from System import AppDomain
+    except ImportError:
+        _LOCAL.pop(_key(doc_key), None)
+        return
+    AppDomain.CurrentDomain.SetData(_key(doc_key), None)
@@ -0,0 +1,15 @@
+# -*- coding: utf-8 -*-
+"""Puts the extension's lib folder and the button bundles on sys.path, the
+way pyRevit does, so their pure Python modules can be tested outside Revit."""
+
+import os
+import sys
+
+EXTENSION = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                         "Revit", "YouTube.extension")
+PANEL = os.path.join(EXTENSION, "YouTube.tab", "Tutorial.panel")
+
+for folder in [os.path.join(EXTENSION, "lib")] + [
+        os.path.join(PANEL, name) for name in sorted(os.listdir(PANEL)) if name.endswith(".pushbutton")]:
+    if folder not in sys.path:
+        sys.path.insert(0, folder)
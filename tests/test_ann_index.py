@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+import random
+
+from ann_index import IvfIndex, load_index, _synthetic_store
+
+
+def _recall(store, index, queries, top_k, nprobe):
+    hits = 0
+    for query in queries:
+        exact = set(row for _, row in store.search_rows(query, top_k))
+        found = set(row for _, row in index.search_rows(store, query, top_k, nprobe))
+        hits += len(exact & found)
+    return hits / float(top_k * len(queries))
+
+
+def _corpus(seed=3):
+    rng = random.Random(seed)
+    store, centers = _synthetic_store(2000, 16, 8, rng)
+    queries = [[c + rng.gauss(0, 0.6) for c in centers[rng.randrange(len(centers))]] for _ in range(20)]
+    return store, queries
+
+
+def test_every_row_is_in_one_list():
+    store, _ = _corpus()
+    index = IvfIndex.build(store, n_lists=16)
+    rows = [row for members in index.lists for row in members]
+    assert sorted(rows) == list(range(len(store)))
+
+
+def test_recall_grows_with_nprobe_and_is_exact_when_probing_all():
+    store, queries = _corpus()
+    index = IvfIndex.build(store, n_lists=16)
+    low = _recall(store, index, queries, 10, 2)
+    high = _recall(store, index, queries, 10, 8)
+    assert high >= low
+    assert high >= 0.9
+    assert _recall(store, index, queries, 10, 16) == 1.0
+
+
+def test_saved_index_loads_and_rejects_a_different_store(tmp_path):
+    store, queries = _corpus()
+    kb_path = str(tmp_path / "kb.json")
+    index = IvfIndex.build(store, n_lists=16)
+    index.save(kb_path)
+    loaded = load_index(kb_path, store)
+    assert loaded is not None and loaded.count == len(store)
+    assert loaded.search_rows(store, queries[0], 5, 16) == index.search_rows(store, queries[0], 5, 16)
+
+    smaller, _ = _synthetic_store(10, 16, 2, random.Random(1))
+    assert load_index(kb_path, smaller) is None
+    assert load_index(str(tmp_path / "missing.json")) is None
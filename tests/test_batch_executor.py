@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+from batch_executor import BatchExecutor, BatchResult, format_eta
+
+
+def test_failed_items_and_rolled_back_chunks_are_counted():
+    rolled_back = []
+
+    def end_chunk(number):
+        if number == 2:
+            raise Exception("commit failed")
+
+    executor = BatchExecutor(chunk_size=3, end_chunk=end_chunk, rollback_chunk=rolled_back.append)
+
+    def apply_one(item):
+        if item == 0:
+            raise ValueError(item)
+
+    result = executor.run(range(8), apply_one)
+    assert (result.done, result.failed, result.failed_chunks) == (8, 1 + 3, 1)
+    assert rolled_back == [2]
+    assert "8 of 8 done, 4 failed, 1 chunks rolled back" in result.summary()
+
+
+def test_cancel_stops_between_chunks():
+    calls = []
+    executor = BatchExecutor(chunk_size=2, is_cancelled=lambda: len(calls) >= 4)
+    result = executor.run(range(10), calls.append)
+    assert calls == [0, 1, 2, 3]
+    assert result.cancelled and "(cancelled)" in result.summary()
+
+
+def test_hidden_warnings_are_reported():
+    result = BatchResult(5)
+    assert "warnings" not in result.summary()
+    result.warnings = 3
+    assert "3 Revit warnings were hidden" in result.summary()
+
+
+def test_format_eta():
+    assert format_eta(12) == "12 s"
+    assert format_eta(150) == "2 min 30 s"
+
+
+def test_chunk_end_tells_whether_the_chunk_was_committed():
+    ends = []
+
+    def end_chunk(number):
+        if number == 2:
+            raise Exception("commit failed")
+
+    executor = BatchExecutor(chunk_size=2, end_chunk=end_chunk,
+                             on_chunk_end=lambda number, committed: ends.append((number, committed)))
+    executor.run(range(5), lambda item: None)
+    assert ends == [(1, True), (2, False), (3, True)]
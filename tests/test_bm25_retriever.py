@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+import json
+
+from bm25_index import Bm25Index, tokenize, load_index
+from retriever import reciprocal_rank_fusion, KnowledgeRetriever
+from vector_store import save_store
+
+TEXTS = [
+    "Visibility Graphics dialog (VG) hides categories in a view.",
+    "Walls are drawn with the Wall tool on the Architecture tab.",
+    "Tag all elements in a view with Tag All Not Tagged.",
+    "Wall joins can be switched with Switch Join Order.",
+]
+
+
+def test_tokenize_drops_stopwords_and_plurals():
+    assert tokenize("How do I join the Walls?") == ["join", "wall"]
+
+
+def test_bm25_prefers_rare_matching_words():
+    index = Bm25Index.build(TEXTS)
+    assert len(index) == 4
+    rows = [row for _, row in index.search("VG dialog")]
+    assert rows[0] == 0
+    rows = [row for _, row in index.search("wall join order")]
+    assert rows[0] == 3 and set(rows) == {1, 3}
+    assert index.search("nothing here matches") == []
+
+
+def test_bm25_save_and_load(tmp_path):
+    kb_path = str(tmp_path / "kb.json")
+    Bm25Index.build(TEXTS).save(kb_path)
+    loaded = load_index(kb_path)
+    assert loaded.search("tag all") == Bm25Index.build(TEXTS).search("tag all")
+
+
+def test_rrf_rewards_rows_found_by_both_lists():
+    fused = reciprocal_rank_fusion([[1, 2, 3], [3, 1, 4]], k=60)
+    assert [row for _, row in fused] == [1, 3, 2, 4]
+    assert fused[0][0] == 1.0 / 61 + 1.0 / 62
+
+
+def test_rrf_breaks_ties_by_row():
+    assert [row for _, row in reciprocal_rank_fusion([[5], [2]])] == [2, 5]
+
+
+def _knowledge_base(tmp_path):
+    items = [{"title": "T{}".format(i), "text": t, "vector": [1.0 if j == i else 0.0 for j in range(4)]}
+             for i, t in enumerate(TEXTS)]
+    kb_path = str(tmp_path / "kb.json")
+    with open(kb_path, "w") as f:
+        json.dump(items, f)
+    save_store(kb_path, items)
+    Bm25Index.from_items(items).save(kb_path)
+    return kb_path
+
+
+def test_short_keyword_questions_skip_the_embedding_call(tmp_path):
+    retriever = KnowledgeRetriever(_knowledge_base(tmp_path))
+    calls = []
+    hits = retriever.search_rows("VG dialog", lambda q: calls.append(q))
+    assert calls == [] and retriever.last_mode == "keyword"
+    assert hits[0][1] == 0
+
+
+def test_hybrid_search_falls_back_to_keywords_when_embedding_fails(tmp_path):
+    retriever = KnowledgeRetriever(_knowledge_base(tmp_path))
+
+    def broken(question):
+        raise IOError("offline")
+
+    hits = retriever.search_rows("how do I switch the join order of two walls", broken)
+    assert retriever.last_mode == "keyword (embedding unavailable)"
+    assert hits[0][1] == 3
+
+    hits = retriever.search_rows("how do I switch the join order of two walls", lambda q: [0.0, 0.0, 0.0, 1.0])
+    assert retriever.last_mode == "hybrid"
+    assert hits[0][1] == 3
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+from chunker import count_tokens, split_sections, split_sentences, window, chunk_text, chunk_topics
+
+
+def _sentences(count, words=8):
+    return ["Sentence {} {}.".format(i, " ".join(["word"] * words)) for i in range(count)]
+
+
+def test_short_entries_stay_whole():
+    assert chunk_text("Open the view. Click Tag.", max_tokens=50) == [("", "Open the view. Click Tag.")]
+
+
+def test_headings_start_sections():
+    text = "# Walls\nDraw walls.\n2.1 Wall Types\nPick a type.\nNAMING RULES\nUse codes.\nNotes:\nKeep it short."
+    assert [h for h, _ in split_sections(text)] == ["Walls", "2.1 Wall Types", "NAMING RULES", "Notes"]
+
+
+def test_long_sentences_are_split_to_fit():
+    pieces = split_sentences(" ".join(["word"] * 100), max_tokens=30)
+    assert len(pieces) > 1
+    assert all(count_tokens(p) <= 30 for p in pieces)
+    assert " ".join(pieces).split() == ["word"] * 100
+
+
+def test_window_respects_size_and_overlaps():
+    sentences = _sentences(20)
+    chunks = window(sentences, max_tokens=40, overlap_tokens=12)
+    assert all(count_tokens(c) <= 40 for c in chunks)
+    for previous, current in zip(chunks, chunks[1:]):
+        # the first sentence of a chunk repeats the end of the previous one
+        assert current.split(".")[0] + "." in previous
+    assert all(s in " ".join(chunks) for s in sentences)
+
+
+def test_topics_keep_their_source():
+    long_text = "# Intro\n" + " ".join(_sentences(30))
+    chunks = chunk_topics([("Walls", long_text), ("Tags", "Short.")], max_tokens=40, overlap_tokens=10)
+    walls = [c for c in chunks if c["source"] == "Walls"]
+    assert len(walls) > 1
+    assert [c["chunk"] for c in walls] == list(range(len(walls)))
+    assert walls[0]["title"] == "Walls > Intro"
+    assert chunks[-1] == {"title": "Tags", "text": "Short.", "source": "Tags", "chunk": 0}
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+import math
+
+from chunker import count_tokens
+from context_builder import ContextBuilder, trim_to_query, count_sources, SOURCE_OVERHEAD_TOKENS
+from vector_store import VectorStore
+
+
+def _store(vectors, sources=None, texts=None):
+    items = []
+    for i, vector in enumerate(vectors):
+        item = {"title": "T{}".format(i), "text": texts[i] if texts else "chunk {}".format(i), "vector": vector}
+        if sources:
+            item["source"] = sources[i]
+        items.append(item)
+    return VectorStore.from_items(items)
+
+
+def _near(cosine):
+    """Unit vector with this cosine to [1, 0, 0]."""
+    return [cosine, math.sqrt(1 - cosine * cosine), 0.0]
+
+
+def _rows(picked):
+    return [row for row, _ in picked]
+
+
+def test_mmr_prefers_a_different_chunk_over_a_similar_better_one():
+    store = _store([[1.0, 0.0, 0.0], _near(0.9), [0.0, 0.0, 1.0]])
+    builder = ContextBuilder(store)
+    # Row 1 scores higher than row 2 but repeats row 0: 0.7*0.9 - 0.3*0.9 < 0.7*0.8
+    assert _rows(builder.select([(1.0, 0), (0.9, 1), (0.8, 2)])) == [0, 2, 1]
+    # Relevance only: plain score order
+    assert _rows(ContextBuilder(store, mmr_lambda=1.0).select([(1.0, 0), (0.9, 1), (0.8, 2)])) == [0, 1, 2]
+
+
+def test_relevance_is_relative_to_the_best_hit():
+    store = _store([[1.0, 0.0, 0.0], [0.0, 0.0, 1.0]])
+    assert ContextBuilder(store).select([(0.04, 0), (0.02, 1)]) == [(0, 1.0), (1, 0.5)]
+    assert ContextBuilder(store).select([]) == []
+
+
+def test_near_duplicates_are_dropped():
+    store = _store([[1.0, 0.0, 0.0], _near(0.96), _near(0.94)])
+    assert _rows(ContextBuilder(store).select([(1.0, 0), (0.9, 1), (0.8, 2)])) == [0, 2]
+
+
+def test_max_chunks():
+    store = _store([[1.0 if i == j else 0.0 for j in range(8)] for i in range(8)])
+    builder = ContextBuilder(store, max_chunks=3)
+    assert _rows(builder.select([(1.0 - i * 0.1, i) for i in range(8)])) == [0, 1, 2]
+
+
+def test_one_page_cannot_fill_the_context():
+    vectors = [[1.0 if i == j else 0.0 for j in range(4)] for i in range(4)]
+    sources = ["Walls", "Walls", "Walls", "Floors"]
+    hits = [(1.0, 0), (0.9, 1), (0.8, 2), (0.5, 3)]
+
+    picked = ContextBuilder(_store(vectors, sources)).select(hits)
+    assert _rows(picked) == [0, 3]
+
+    picked = ContextBuilder(_store(vectors, sources), max_per_source=2).select(hits)
+    assert _rows(picked) == [0, 1, 3]
+
+
+def test_chunks_without_a_source_count_as_their_own_page():
+    store = _store([[1.0, 0.0], [0.0, 1.0]])
+    assert _rows(ContextBuilder(store).select([(1.0, 0), (0.9, 1)])) == [0, 1]
+
+
+def test_trim_keeps_the_matching_sentences_in_order():
+    text = ("Open the view. Type VG on the keyboard. Pick the Model Categories tab. "
+            "Untick the walls. Close the dialog.")
+    assert trim_to_query(text, "what does the VG dialog do", 100) == text
+    trimmed = trim_to_query(text, "VG dialog", 12)
+    assert trimmed == "Type VG on the keyboard. ... Close the dialog."
+    assert count_tokens(trimmed) <= 12 + 1  # + the '...' marker
+
+
+def test_build_stays_within_the_budget():
+    sentence = "Step {} of the wall tool needs the Architecture tab."
+    long_text = " ".join(sentence.format(i) for i in range(20))
+    vectors = [[1.0 if i == j else 0.0 for j in range(4)] for i in range(4)]
+    store = _store(vectors, sources=["A", "B", "C", "D"], texts=[long_text] * 4)
+    builder = ContextBuilder(store, budget_tokens=100)
+
+    parts, used = builder.build("wall tool", [(1.0, 0), (0.9, 1), (0.8, 2), (0.7, 3)])
+    assert used <= 100
+    assert used == sum(count_tokens(text) + SOURCE_OVERHEAD_TOKENS for _, text in parts)
+    # Each chunk gets at most half the budget, so two fit and the rest is too small
+    assert [item["title"] for item, _ in parts] == ["T0", "T1"]
+    assert all(count_tokens(text) <= 50 for _, text in parts)
+    assert count_sources(parts) == 2
+
+
+def test_short_chunks_are_kept_whole():
+    store = _store([[1.0, 0.0], [0.0, 1.0]], texts=["Type VG.", "Walls."])
+    parts, used = ContextBuilder(store).build("VG", [(1.0, 0), (0.5, 1)])
+    assert [text for _, text in parts] == ["Type VG.", "Walls."]
+    assert count_sources(parts) == 2
+
+
+def test_count_sources_counts_pages_not_chunks():
+    parts = [({"source": "Walls"}, "a"), ({"source": "Walls"}, "b"), ({"title": "Floors"}, "c")]
+    assert count_sources(parts) == 2
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from chunker import count_tokens
+from conversation import Conversation, gist, is_follow_up
+
+
+@pytest.mark.parametrize("question", [
+    "How do I create a new level in a section view?",
+    "Where are the view templates managed for floor plans?",
+])
+def test_standalone_questions(question):
+    assert not is_follow_up(question)
+
+
+@pytest.mark.parametrize("question", [
+    "and for doors?",
+    "What about ceiling plans in Revit 2024?",
+    "How do I undo it afterwards in the project?",
+    "Can I do the same for sheets with many views?",
+    "why?",
+])
+def test_follow_up_questions(question):
+    assert is_follow_up(question)
+
+
+def _answer(n, words=10):
+    return " ".join("word{}".format(n) for _ in range(words)) + "."
+
+
+def test_messages_alternate_user_and_assistant():
+    conversation = Conversation()
+    conversation.add_turn("How do I add a level?", "Use the Level tool.")
+    assert conversation.messages() == [
+        {"role": "user", "content": "How do I add a level?"},
+        {"role": "assistant", "content": "Use the Level tool."},
+    ]
+    assert len(conversation) == 1 and conversation.summary_text() == ""
+
+
+def test_only_the_recent_turns_are_kept_word_for_word():
+    conversation = Conversation(recent_turns=2)
+    for n in range(5):
+        conversation.add_turn("Question {}".format(n), _answer(n))
+    assert [m["content"] for m in conversation.messages()] == [
+        "Question 3", _answer(3), "Question 4", _answer(4)]
+    summary = conversation.summary_text().split("\n")
+    assert len(summary) == 3
+    assert summary[0].startswith("- User asked: Question 0 | Answer: word0")
+
+
+def test_turns_are_rolled_up_to_stay_within_the_token_budget():
+    conversation = Conversation(budget_tokens=150, summary_tokens=50, recent_turns=10)
+    for n in range(10):
+        conversation.add_turn("Question {}".format(n), _answer(n, 20))
+        # The summary of the rolled turns counts too
+        assert conversation.tokens() <= 150
+    assert 1 <= len(conversation) < 6 and conversation.summary_text()
+    assert conversation.messages()[-1]["content"] == _answer(9, 20)
+
+
+def test_summary_drops_its_oldest_lines_first():
+    conversation = Conversation(recent_turns=1, summary_tokens=30)
+    for n in range(6):
+        conversation.add_turn("Question {}".format(n), _answer(n, 3))
+    summary = conversation.summary_text()
+    assert count_tokens(summary) <= 30
+    assert "Question 4" in summary and "Question 0" not in summary
+
+
+def test_a_single_huge_answer_keeps_only_its_beginning():
+    answer = " ".join("Sentence number {} explains a step.".format(n) for n in range(100))
+    conversation = Conversation(budget_tokens=100)
+    conversation.add_turn("How do I do it all?", answer)
+    kept = conversation.messages()[1]["content"]
+    assert answer.startswith(kept) and kept.endswith("step.")
+    assert conversation.tokens() <= 100
+
+
+def test_custom_summarize_gets_the_rolled_turns():
+    calls = []
+
+    def summarize(turns, previous):
+        calls.append((list(turns), previous))
+        return "summary {}".format(len(calls))
+
+    conversation = Conversation(recent_turns=1, summarize=summarize)
+    conversation.add_turn("Q1", "A1")
+    conversation.add_turn("Q2", "A2")
+    conversation.add_turn("Q3", "A3")
+    assert calls == [([("Q1", "A1")], ""), ([("Q2", "A2")], "summary 1")]
+    assert conversation.summary_text() == "summary 2"
+
+
+def test_clear():
+    conversation = Conversation(recent_turns=1)
+    conversation.add_turn("Q1", "A1")
+    conversation.add_turn("Q2", "A2")
+    conversation.clear()
+    assert len(conversation) == 0 and conversation.summary_text() == "" and conversation.tokens() == 0
+
+
+def test_gist_keeps_whole_sentences():
+    assert gist("One two three. Four five six. Seven.", 8) == "One two three. Four five six."
+    assert gist("Short.", 8) == "Short."
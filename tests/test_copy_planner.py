@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from copy_planner import coerce, plan_copy, same_value
+
+
+class Element(object):
+    def __init__(self, element_id, type_id, params, read_only=()):
+        self.id = element_id
+        self.type_id = type_id
+        self.params = params          # name -> value
+        self.read_only = set(read_only)
+
+
+STORAGE = {"Mark": "String", "Comments": "String", "Width": "Double", "Count": "Integer"}
+
+
+class Model(object):
+    """The Revit lookups the planner is given, counting the name lookups."""
+
+    def __init__(self):
+        self.resolves = []
+
+    def resolve(self, element, name):
+        self.resolves.append((element.type_id, name))
+        return (name, STORAGE[name]) if name in element.params else None
+
+    @staticmethod
+    def read(element, handle):
+        return element.params.get(handle)
+
+    @staticmethod
+    def writable(element, handle):
+        return handle not in element.read_only
+
+    def plan(self, targets, mappings, source_values=None):
+        return plan_copy(targets, mappings, key=lambda e: e.id, signature=lambda e: e.type_id,
+                         resolve=self.resolve, read=self.read, source_values=source_values,
+                         writable=self.writable)
+
+
+def test_coerce_and_compare():
+    assert coerce(3, "String") == u"3"
+    assert coerce("2", "Integer") == 2
+    assert coerce("0.5", "Double") == 0.5
+    assert coerce(12, "ElementId") == 12
+    with pytest.raises(ValueError):
+        coerce("Level 1", "ElementId")
+    with pytest.raises(ValueError):
+        coerce("x", "Integer")
+    assert same_value(0.5, 0.5 + 1e-12, "Double")
+    assert not same_value(None, 0.0, "Double")
+
+
+def test_only_different_values_are_planned():
+    model = Model()
+    targets = [Element(1, "A", {"Mark": "M1", "Comments": ""}),
+               Element(2, "A", {"Mark": "M2", "Comments": "keep"}),
+               Element(1, "A", {"Mark": "M1"})]  # the same element again
+    plan = model.plan(targets, [("Comments", "Comments")], source_values={"Comments": "keep"})
+    assert [(c.target.id, c.old, c.new) for c in plan.changes] == [(1, "", "keep")]
+    assert (plan.targets, plan.duplicates, plan.unchanged) == (2, 1, 1)
+
+
+def test_parameters_are_looked_up_once_per_signature():
+    model = Model()
+    targets = [Element(i, "A" if i % 2 else "B", {"Mark": "", "Width": 0.0}) for i in range(10)]
+    plan = model.plan(targets, [("Mark", "Mark"), ("Width", "Width")],
+                      source_values={"Mark": "X", "Width": "0.656"})
+    assert len(plan) == 20
+    assert sorted(model.resolves) == [("A", "Mark"), ("A", "Width"), ("B", "Mark"), ("B", "Width")]
+    assert plan.lookups == 4
+
+
+def test_read_only_is_checked_per_element():
+    model = Model()
+    targets = [Element(1, "A", {"Mark": ""}, read_only=["Mark"]), Element(2, "A", {"Mark": ""})]
+    plan = model.plan(targets, [("Mark", "Mark")], source_values={"Mark": "X"})
+    assert [c.target.id for c in plan.changes] == [2]
+    assert plan.skipped == {"parameter read-only": 1}
+
+
+def test_skip_reasons():
+    model = Model()
+    targets = [Element(1, "A", {"Count": 1}), Element(2, "B", {"Mark": "old"})]
+    plan = model.plan(targets, [("Mark", "Count"), ("Width", "Mark"), ("Mark", "Mark")],
+                      source_values={"Mark": "not a number"})
+    assert plan.skipped == {"value does not fit the parameter": 1, "no source value": 2,
+                            "parameter missing": 2}
+    assert [(c.target.id, c.new) for c in plan.changes] == [(2, "not a number")]
+
+
+def test_internal_transfer_with_transform_reads_each_source_once():
+    model = Model()
+    reads = []
+
+    def read(element, handle):
+        reads.append((element.id, handle))
+        return element.params.get(handle)
+
+    targets = [Element(1, "A", {"Mark": "w-1", "Comments": ""})]
+    plan = plan_copy(targets, [("Mark", "Comments", lambda v: v.upper()), ("Mark", "Mark", lambda v: v + "!")],
+                     key=lambda e: e.id, signature=lambda e: e.type_id, resolve=model.resolve, read=read)
+    assert [(c.name, c.new) for c in plan.changes] == [("Comments", "W-1"), ("Mark", "w-1!")]
+    assert reads.count((1, "Mark")) == 2  # once as the source, once as the old target value
+
+
+def test_by_target_groups_changes():
+    model = Model()
+    targets = [Element(1, "A", {"Mark": "", "Comments": ""}), Element(2, "A", {"Mark": "", "Comments": ""})]
+    plan = model.plan(targets, [("Mark", "Mark"), ("Comments", "Comments")],
+                      source_values={"Mark": "X", "Comments": "Y"})
+    assert [(t.id, len(changes)) for t, changes in plan.by_target()] == [(1, 2), (2, 2)]
+    assert "Values to change:    4" in plan.report(name=lambda t: "E{}".format(t.id))
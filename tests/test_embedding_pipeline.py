@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+import os
+
+import pytest
+
+pytest.importorskip("requests")  # rag_builder.py runs in normal Python 3 with requests installed
+
+from embedding_pipeline import EmbeddingClient, EmbeddingCache, EmbeddingError, embed_texts
+
+
+class FakeClient(EmbeddingClient):
+    """Answers from memory: batch_status = status of every batch call (200 = ok);
+    texts starting with 'bad' are rejected with 400."""
+
+    def __init__(self, batch_status=200):
+        EmbeddingClient.__init__(self, "key", requests_per_minute=6000)
+        self.batch_status = batch_status
+        self.calls = []
+
+    def _post(self, url, payload):
+        method = url.split(":")[-1].split("?")[0]
+        self.calls.append(method)
+        if method == "batchEmbedContents":
+            if self.batch_status != 200:
+                raise EmbeddingError("batch failed", self.batch_status)
+            texts = [r["content"]["parts"][0]["text"] for r in payload["requests"]]
+            if any(t.startswith("bad") for t in texts):
+                raise EmbeddingError("bad input", 400)
+            return {"embeddings": [{"values": [float(len(t))]} for t in texts]}
+        text = payload["content"]["parts"][0]["text"]
+        if text.startswith("bad"):
+            raise EmbeddingError("bad input", 400)
+        return {"embedding": {"values": [float(len(text))]}}
+
+
+def test_bad_text_only_fails_itself_and_batching_stays_on():
+    client = FakeClient()
+    assert client.embed_batch(["a", "bad", "ccc"]) == [[1.0], None, [3.0]]
+    assert client.use_batch
+    assert client.embed_batch(["dd"]) == [[2.0]]
+    assert client.calls[-1] == "batchEmbedContents"
+
+
+@pytest.mark.parametrize("status", [404, 405])
+def test_missing_batch_endpoint_switches_to_single_calls(status):
+    client = FakeClient(batch_status=status)
+    assert client.embed_batch(["a", "bb"]) == [[1.0], [2.0]]
+    assert not client.use_batch
+    client.calls = []
+    client.embed_batch(["c"])
+    assert client.calls == ["embedContent"]
+
+
+def test_other_errors_are_raised():
+    with pytest.raises(EmbeddingError):
+        FakeClient(batch_status=401).embed_batch(["a"])
+
+
+def test_rejected_texts_are_not_cached(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.jsonl"))
+    vectors = embed_texts(FakeClient(), ["a", "bad one", "ccc"], cache, batch_size=10, max_workers=1)
+    assert sorted(vectors) == ["a", "ccc"]
+    assert len(EmbeddingCache(str(tmp_path / "cache.jsonl"))) == 2
+
+
+def test_prune_only_rewrites_when_something_is_dropped(tmp_path):
+    path = str(tmp_path / "cache.jsonl")
+    cache = EmbeddingCache(path)
+    cache.add("k1", [1.0])
+    cache.add("k2", [2.0])
+    cache.close()
+    os.utime(path, (1, 1))
+
+    assert EmbeddingCache(path).prune(["k1", "k2"]) == 0
+    assert os.path.getmtime(path) == 1
+
+    assert EmbeddingCache(path).prune(["k1"]) == 1
+    assert list(EmbeddingCache(path).vectors) == ["k1"]
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+from document_metadata import DocumentMetadata
+from filter_compiler import rule_value, rule_groups
+
+WALLS, DOORS = -2000011, -2000023
+
+
+def test_rule_value_parses_by_storage_type():
+    assert rule_value("String", "A-101") == "A-101"
+    assert rule_value("Integer", "3") == 3
+    assert rule_value("Double", "0.656") == 0.656
+    assert rule_value("Integer", "3.5") is None
+    assert rule_value("Double", "200 mm") is None
+    assert rule_value("ElementId", "Level 1") is None
+
+
+def _metadata():
+    metadata = DocumentMetadata()
+    metadata.definitions = {
+        WALLS: {"Mark": {(-1001203, "String")}, "Fire Rating": {(501, "String"), (502, "String")}},
+        DOORS: {"Mark": {(-1001203, "String")}, "Fire Rating": {(501, "String")},
+                "Width": {(-1001301, "Double")}},
+    }
+    return metadata
+
+
+def test_categories_sharing_a_parameter_share_one_rule():
+    groups = rule_groups([WALLS, DOORS], "Mark", "A-101", _metadata().definitions_of)
+    assert groups == [(-1001203, "String", "A-101", [WALLS, DOORS])]
+
+
+def test_a_name_with_several_ids_gives_one_rule_per_id():
+    groups = rule_groups([WALLS, DOORS], "Fire Rating", "1 HR", _metadata().definitions_of)
+    assert groups == [(501, "String", "1 HR", [WALLS, DOORS]), (502, "String", "1 HR", [WALLS])]
+
+
+def test_values_that_cannot_be_pushed_down():
+    definitions_of = _metadata().definitions_of
+    assert rule_groups([DOORS], "Width", "wide", definitions_of) is None
+    assert rule_groups([WALLS], "Width", "0.9", definitions_of) == []
+    assert rule_groups([DOORS], "Width", "0.9", definitions_of) == [(-1001301, "Double", 0.9, [DOORS])]
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+import socket
+import threading
+
+import pytest
+
+import ai_providers
+import session_cache
+from fake_ai_server import make_server
+from http_client import EndpointResolver, HttpClient, PythonTransport, StubTransport
+
+
+@pytest.fixture
+def server():
+    server = make_server(port=0)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    yield server, "http://127.0.0.1:{}".format(server.server_address[1])
+    server.shutdown()
+    server.server_close()
+
+
+def test_post_sends_json_through_the_transport():
+    transport = StubTransport(lambda method, url, headers, payload: (200, {"echo": payload["q"]}))
+    client = HttpClient(transport, default_timeout=7)
+    response = client.post("http://x/api", json={"q": "levels"}, headers={"x-api-key": "k"})
+    assert response.ok and response.json() == {"echo": "levels"}
+    sent = transport.requests[0]
+    assert sent["headers"] == {"Content-Type": "application/json", "x-api-key": "k"}
+    assert (sent["method"], sent["timeout"], sent["stream"]) == ("POST", 7, False)
+
+
+def test_endpoint_resolver():
+    resolver = EndpointResolver(("v1", "v1beta"))
+    assert resolver.candidates("m") == ("v1", "v1beta")
+    resolver.remember("m", "v1beta")
+    assert resolver.candidates("m") == ("v1beta",)
+    resolver.forget("m")
+    assert resolver.candidates("m") == ("v1", "v1beta")
+
+
+def test_gemini_falls_back_to_v1beta_once(monkeypatch):
+    def handler(method, url, headers, payload):
+        if "/v1/" in url:
+            return 404, {"error": {"message": "not on v1"}}
+        return 200, {"candidates": [{"content": {"parts": [{"text": "Answer"}]}}]}
+
+    transport = StubTransport(handler)
+    monkeypatch.setattr(ai_providers, "http", HttpClient(transport))
+    monkeypatch.setattr(ai_providers, "gemini_versions", EndpointResolver(("v1", "v1beta")))
+    assert ai_providers.call_gemini("key", "gemini-x", "system", "q") == "Answer"
+    assert ai_providers.call_gemini("key", "gemini-x", "system", "q") == "Answer"
+    versions = [r["url"].split("/")[3] for r in transport.requests]
+    assert versions == ["v1", "v1beta", "v1beta"]
+
+
+def test_client_and_resolver_live_for_the_session():
+    assert session_cache.get(None, "bim_mentor_http_client") is ai_providers.http
+    assert session_cache.get(None, "bim_mentor_gemini_versions") is ai_providers.gemini_versions
+
+
+def test_connection_refused_is_status_0():
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()  # nothing listens on this port now
+    response = HttpClient(PythonTransport()).post("http://127.0.0.1:{}/x".format(port), json={}, timeout=2)
+    assert response.status_code == 0 and response.text
+    message = ai_providers._connection_error("Claude", response)
+    assert message.startswith(ai_providers.ERROR_PREFIXES)
+
+
+def test_keep_alive_connection_is_reused(server):
+    fake, url = server
+    transport = PythonTransport()
+    client = HttpClient(transport)
+    for _ in range(3):
+        assert client.post(url + "/api/chat", json={"messages": [{}, {"content": "q"}], "stream": False}).ok
+    assert sum(len(idle) for idle in transport._pool.values()) == 1
+
+
+def test_streamed_error_keeps_its_body_and_frees_the_connection(server):
+    fake, url = server
+    transport = PythonTransport()
+    client = HttpClient(transport)
+    response = client.post(url + "/unknown", json={}, stream=True)
+    assert response.status_code == 404
+    assert "Unknown path" in response.text
+    assert list(response.iter_lines()) == [response.text]
+    assert sum(len(idle) for idle in transport._pool.values()) == 1  # released, ready for reuse
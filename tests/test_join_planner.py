@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+from join_planner import JoinPlan, plan_joins
+
+
+class Element(object):
+    def __init__(self, element_id, name):
+        self.id = element_id
+        self.name = name
+
+    def __repr__(self):
+        return self.name
+
+
+class Model(object):
+    """The Revit lookups the planner is given, counting the partner lookups."""
+
+    def __init__(self, joined=(), cutting=()):
+        self.joined = set(frozenset(pair) for pair in joined)   # {ids}
+        self.cutting = set(cutting)                             # (cutter id, cut id)
+        self.lookups = []
+        self.order_checks = []
+
+    def joined_partners(self, element):
+        self.lookups.append(element.id)
+        return [b for pair in self.joined if element.id in pair for b in pair if b != element.id]
+
+    def is_cutting(self, a, b):
+        self.order_checks.append((a.id, b.id))
+        return (a.id, b.id) in self.cutting
+
+    def plan(self, pairs):
+        return plan_joins(pairs, self.joined_partners, self.is_cutting, key=lambda e: e.id)
+
+
+COLUMN, BEAM, FLOOR, WALL = Element(1, "Column"), Element(2, "Beam"), Element(3, "Floor"), Element(4, "Wall")
+WALL_2 = Element(5, "Wall 2")
+
+
+def test_missing_joins_are_planned_with_the_keeper_first():
+    plan = Model().plan([(0, COLUMN, 1, BEAM), (2, FLOOR, 3, WALL), (3, WALL, 3, WALL_2)])
+    assert plan.joins == [(COLUMN, BEAM, True), (FLOOR, WALL, True), (WALL, WALL_2, False)]
+    assert plan.switches == [] and plan.already_ok == 0
+    assert plan.operations() == [("join", COLUMN, BEAM, True), ("join", FLOOR, WALL, True),
+                                 ("join", WALL, WALL_2, False)]
+
+
+def test_already_joined_pairs_are_skipped():
+    model = Model(joined=[(1, 2), (3, 4)])
+    plan = model.plan([(0, COLUMN, 1, BEAM), (2, FLOOR, 3, WALL)])
+    assert len(plan) == 0 and plan.already_ok == 2
+    assert model.order_checks == [(2, 1), (4, 3)]  # is the lower priority element cutting?
+
+
+def test_wrong_join_order_is_switched():
+    model = Model(joined=[(1, 2), (3, 4)], cutting=[(4, 3)])
+    plan = model.plan([(0, COLUMN, 1, BEAM), (2, FLOOR, 3, WALL)])
+    assert plan.switches == [(FLOOR, WALL)] and plan.already_ok == 1
+    assert plan.operations() == [("switch", FLOOR, WALL, False)]
+
+
+def test_order_is_not_checked_within_one_group():
+    model = Model(joined=[(4, 5)], cutting=[(5, 4)])
+    plan = model.plan([(3, WALL, 3, WALL_2)])
+    assert plan.already_ok == 1 and model.order_checks == []
+
+
+def test_each_pair_is_planned_once():
+    model = Model()
+    plan = model.plan([(0, COLUMN, 1, BEAM), (0, COLUMN, 1, BEAM), (1, BEAM, 0, COLUMN), (0, COLUMN, 0, COLUMN)])
+    assert plan.joins == [(COLUMN, BEAM, True)]
+    assert plan.duplicates == 2
+
+
+def test_partners_are_asked_once_per_element():
+    model = Model(joined=[(1, 2)])
+    model.plan([(0, COLUMN, 1, BEAM), (0, COLUMN, 2, FLOOR), (0, COLUMN, 3, WALL), (1, BEAM, 2, FLOOR)])
+    assert sorted(model.lookups) == [1, 2]
+
+
+def test_report_lists_the_first_operations():
+    plan = Model(joined=[(3, 4)], cutting=[(4, 3)]).plan([(0, COLUMN, 1, BEAM), (0, COLUMN, 2, FLOOR),
+                                                          (2, FLOOR, 3, WALL)])
+    text = plan.report(4, name=lambda e: e.name, limit=2)
+    assert text.splitlines() == [
+        "Touching pairs:      4",
+        "  duplicates:        0",
+        "  already correct:   0",
+        "  to join:           2",
+        "  to switch order:   1",
+        "  JOIN   Column cuts Beam",
+        "  JOIN   Column cuts Floor",
+        "  ... and 1 more",
+    ]
+    assert JoinPlan().report(0).endswith("to switch order:   0")
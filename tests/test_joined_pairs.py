@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+from joined_pairs import find_joined_pairs
+
+
+class Element(object):
+    def __init__(self, element_id):
+        self.id = element_id
+
+    def __repr__(self):
+        return "E{}".format(self.id)
+
+
+class Model(object):
+    """The Revit lookup the finder is given, counting the calls."""
+
+    def __init__(self, joins):
+        self.partners = {}
+        for a, b in joins:
+            self.partners.setdefault(a, set()).add(b)
+            self.partners.setdefault(b, set()).add(a)
+        self.lookups = []
+
+    def joined_partners(self, element):
+        self.lookups.append(element.id)
+        return sorted(self.partners.get(element.id, ()))
+
+    def find(self, elements):
+        return find_joined_pairs(elements, self.joined_partners, key=lambda e: e.id)
+
+
+def _ids(result):
+    return sorted((a.id, b.id) for a, b in result.pairs)
+
+
+def test_each_join_is_found_once():
+    elements = [Element(i) for i in range(1, 5)]
+    result = Model([(1, 2), (2, 3), (1, 3)]).find(elements)
+    # Both sides report every join: only the (lower id, higher id) side is kept
+    assert _ids(result) == [(1, 2), (1, 3), (2, 3)]
+    assert result.elements_with_joins == 3
+    assert result.outside == 0
+
+
+def test_joins_to_elements_outside_the_selection_are_counted_not_undone():
+    elements = [Element(1), Element(2)]
+    result = Model([(1, 2), (1, 9), (2, 8)]).find(elements)
+    assert _ids(result) == [(1, 2)]
+    assert result.outside == 2
+
+
+def test_partners_are_asked_once_per_element():
+    first = Element(1)
+    model = Model([(1, 2)])
+    result = model.find([first, Element(2), Element(1), Element(3)])
+    assert sorted(model.lookups) == [1, 2, 3]
+    assert _ids(result) == [(1, 2)]
+
+
+def test_pairs_hold_the_given_elements():
+    a, b = Element(5), Element(3)
+    result = Model([(3, 5)]).find([a, b])
+    assert result.pairs == [(b, a)]
+
+
+def test_no_joins():
+    result = Model([]).find([Element(1), Element(2)])
+    assert result.pairs == [] and result.elements_with_joins == 0 and result.outside == 0
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from mapping_profiles import (MappingProfile, ProfileError, load_profiles, parse_line, parse_mappings,
+                              save_profiles)
+
+PROFILE_TEXT = u"""# Door schedule
+Comments -> Mark
+Length -> Length (mm) | convert ft->mm | round 0
+Mark -> Door Number | prefix D- | suffix -A
+Fire Rating -> FR Minutes | lookup 1 HR=60, 2 HR=120 | default 0
+"""
+
+
+def test_parse_and_transform():
+    comments, length, door, fire = parse_mappings(PROFILE_TEXT)
+    assert comments.for_planner() == ("Comments", "Mark", None)
+    assert (length.source, length.target) == ("Length", "Length (mm)")
+    assert length.transform(0.656168) == 200
+    assert door.transform(12) == u"D-12-A"
+    assert fire.transform("2 HR") == "120"
+    assert fire.transform("4 HR") == "0"
+
+
+def test_units_work_both_ways():
+    mapping = parse_line("Area -> Area ft | convert m2->sqft | round 2")
+    assert mapping.transform(1.0) == 10.76
+    with pytest.raises(ValueError):
+        mapping.transform("not a number")
+
+
+@pytest.mark.parametrize("line", [
+    "Comments Mark",
+    " -> Mark",
+    "Length -> Length | convert ft->yards",
+    "Length -> Length | scale twice",
+    "Mark -> Mark | lookup A",
+    "Mark -> Mark | uppercase",
+])
+def test_bad_lines(line):
+    with pytest.raises(ProfileError):
+        parse_line(line)
+
+
+def test_errors_name_the_line():
+    with pytest.raises(ProfileError) as error:
+        parse_mappings("Comments -> Mark\n\nMark -> Mark | uppercase")
+    assert str(error.value).startswith("Line 3:")
+
+
+def test_text_round_trip():
+    profile = MappingProfile("Doors", parse_mappings(PROFILE_TEXT))
+    again = MappingProfile("Doors", parse_mappings(profile.to_text()))
+    assert again.to_dict() == profile.to_dict()
+
+
+def test_save_and_load_round_trip(tmp_path):
+    path = str(tmp_path / "profiles.json")
+    assert load_profiles(path) == {}
+    profiles = {
+        u"Doors": MappingProfile(u"Doors", parse_mappings(PROFILE_TEXT), param_type_mode="Type"),
+        u"Längen": MappingProfile(u"Längen", parse_mappings("Length -> Länge | convert ft->m"), from_targets=True),
+    }
+    save_profiles(path, profiles)
+    loaded = load_profiles(path)
+    assert sorted(loaded) == sorted(profiles)
+    for name in profiles:
+        assert loaded[name].to_dict() == profiles[name].to_dict()
+    assert loaded[u"Längen"].mappings[0].transform(1.0) == pytest.approx(0.3048)
+
+
+def test_broken_profiles_are_skipped(tmp_path):
+    path = tmp_path / "profiles.json"
+    path.write_text(u'{"profiles": [{"name": "ok", "mappings": []},'
+                    u' {"mappings": []},'
+                    u' {"name": "bad", "mappings": [{"source": "A", "target": "B", "transforms": [["upper", ""]]}]}]}',
+                    encoding="utf-8")
+    assert list(load_profiles(str(path))) == ["ok"]
@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+import ai_providers
+from ai_providers import ERROR_PREFIXES, call_provider
+from http_client import StubTransport
+from mentor_cache import AnswerCache
+
+
+def test_one_lookup_over_several_providers_counts_once(tmp_path):
+    cache = AnswerCache(str(tmp_path / "answers.json"))
+    keys = [AnswerCache.make_key(i, "model", "prompt", "kb") for i in range(3)]
+
+    assert cache.get_first(keys) == (None, None)
+    assert (cache.hits, cache.misses) == (0, 1)
+
+    cache.put(keys[2], "Use the Wall tool.")
+    assert cache.get_first(keys) == (keys[2], "Use the Wall tool.")
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert cache.get(keys[0]) is None
+
+
+def test_expired_answers_are_dropped(tmp_path):
+    cache = AnswerCache(str(tmp_path / "answers.json"), ttl_seconds=-1)
+    cache.put("k", "old")
+    assert cache.get("k") is None
+    assert "k" not in cache.entries
+
+
+def test_empty_local_ai_answer_is_an_error(monkeypatch):
+    transport = StubTransport(lambda method, url, headers, payload: (200, {"message": {"content": ""}}))
+    monkeypatch.setattr(ai_providers.http, "transport", transport)
+    answer = call_provider(3, "http://localhost:11434", "llama3", "system", "question")
+    assert answer.startswith(ERROR_PREFIXES)
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+from model_index import ModelIndexer, FakeElementSource
+
+
+def _wall_type(name="Generic - 200mm", width="200"):
+    return {"id": 1, "kind": "Type", "category": "Walls", "name": "Basic Wall: " + name,
+            "params": {"Width": width}}
+
+
+def _level():
+    return {"id": 2, "kind": "Level", "category": "Levels", "name": "Level 1", "params": {}}
+
+
+def test_full_then_incremental_update():
+    source = FakeElementSource([_wall_type(), _level()], {10: 1, 11: 1})
+    indexer = ModelIndexer(source)
+    assert indexer.refresh() == "2 model elements indexed"
+    assert indexer.refresh() == "2 model elements, up to date"
+
+    source.put(_wall_type(width="250"))
+    source.put_instance(12, 1)
+    source.save()
+    assert indexer.refresh() == "2 model elements, 0 added, 1 updated, 0 removed"
+    assert indexer.index.instance_counts()[1] == 3
+    assert "Width=250" in indexer.index.context_text("wall width")
+
+
+def test_deleted_elements_leave_the_index():
+    source = FakeElementSource([_wall_type(), _level()])
+    indexer = ModelIndexer(source)
+    indexer.refresh()
+    source.delete(2)
+    source.save()
+    assert indexer.refresh().endswith("1 removed")
+    assert list(indexer.index.records) == [1]
+
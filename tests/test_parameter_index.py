@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+import session_cache
+from parameter_index import ParameterIndex, session_index
+
+WALLS, DOORS = -2000011, -2000023
+DOC = "C:/Projects/test.rvt"
+
+
+@pytest.fixture(autouse=True)
+def fresh_session():
+    session_cache.forget(DOC)
+    yield
+    session_cache.forget(DOC)
+
+
+class FakeModel(object):
+    """Elements per category, counting every read like the Revit collectors would cost."""
+
+    def __init__(self):
+        self.elements = {1: (WALLS, {"Mark": "W1", "Function": "Exterior"}),
+                         2: (WALLS, {"Mark": "W2", "Function": "Interior"}),
+                         3: (DOORS, {"Mark": "D1"})}
+        self.category_reads = []
+        self.element_reads = []
+
+    def read_category(self, category):
+        self.category_reads.append(category)
+        return [(i, dict(values)) for i, (c, values) in self.elements.items() if c == category]
+
+    def read_element(self, element_id):
+        self.element_reads.append(element_id)
+        found = self.elements.get(element_id)
+        return (found[0], dict(found[1])) if found else None
+
+
+def open_window(model, category):
+    """What SelectElements does when its window opens on a category."""
+    index = session_index(DOC)
+    index.refresh(model.read_element)
+    index.ensure_loaded(category, lambda: model.read_category(category))
+    return index
+
+
+def test_second_open_does_not_read_the_category_again():
+    model = FakeModel()
+    first = open_window(model, WALLS)
+    second = open_window(model, WALLS)
+    assert second is first
+    assert model.category_reads == [WALLS]
+    assert second.element_ids("Function", "Exterior", [WALLS]) == {1}
+
+
+def test_empty_category_index_is_kept_too():
+    model = FakeModel()
+    empty = -2000038
+    first = open_window(model, empty)
+    assert len(first) == 0  # an empty index is falsy...
+    assert open_window(model, empty) is first  # ...but still the cached one
+    assert model.category_reads == [empty]
+
+
+def test_only_changed_elements_are_read_again():
+    model = FakeModel()
+    open_window(model, WALLS)
+    model.elements[2] = (WALLS, {"Mark": "W2", "Function": "Exterior"})
+    del model.elements[1]
+    session_index(DOC).mark_changed([2], deleted_ids=[1])
+
+    index = open_window(model, WALLS)
+    assert model.category_reads == [WALLS]
+    assert model.element_reads == [2]
+    assert index.element_ids("Function", "Exterior", [WALLS]) == {2}
+    assert index.values("Mark", [WALLS]) == ["W2"]
+
+
+def test_changes_in_categories_not_loaded_are_skipped():
+    model = FakeModel()
+    index = open_window(model, WALLS)
+    index.mark_changed([3])
+    open_window(model, WALLS)
+    assert 3 not in index.elements
+    open_window(model, DOORS)
+    assert index.element_ids("Mark", "D1") == {3}
+
+
+def test_lookups_merge_categories():
+    index = ParameterIndex()
+    index.add(WALLS, 1, {"Mark": "A"})
+    index.add(DOORS, 2, {"Mark": "A", "Width": "0.9"})
+    index.mark_loaded(WALLS)
+    index.mark_loaded(DOORS)
+    assert index.element_ids("Mark", "A") == {1, 2}
+    assert index.parameters([DOORS]) == [("Mark", ["A"]), ("Width", ["0.9"])]
+    index.remove(2)
+    assert index.parameter_names() == ["Mark"]
+
+
+def test_text_lookup_can_ignore_case():
+    index = ParameterIndex()
+    index.add(WALLS, 1, {"Mark": "W1"})
+    index.add(WALLS, 2, {"Mark": "w1"})
+    index.mark_loaded(WALLS)
+    assert index.element_ids("Mark", "W1") == {1}
+    assert index.element_ids("Mark", "W1", ignore_case=True) == {1, 2}
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+import threading
+
+import pytest
+
+from ai_providers import is_error_response
+from provider_router import ProviderRouter, ProviderStats
+from request_worker import CancelledError
+
+
+def answer(*pieces):
+    """Provider call streaming these pieces, then returning them joined."""
+    def call(on_delta):
+        for piece in pieces:
+            on_delta(piece)
+        return "".join(pieces)
+    return call
+
+
+def error(text):
+    return lambda on_delta: text
+
+
+def raises(exception):
+    def call(on_delta):
+        raise exception
+    return call
+
+
+def blocked(release, *pieces):
+    """Provider that only starts answering once release is set (or it is cancelled)."""
+    def call(on_delta):
+        release.wait(5)
+        return answer(*pieces)(on_delta)
+    return call
+
+
+def ask(candidates, hedge_after=8.0, stats=None):
+    stats = stats or ProviderStats()
+    deltas = []
+    result = ProviderRouter(stats, is_error_response, hedge_after).ask(candidates, deltas.append)
+    return result, deltas, stats
+
+
+def test_first_provider_answers():
+    (text, name), deltas, stats = ask([("A", answer("Hello ", "world")), ("B", answer("unused"))])
+    assert (text, name) == ("Hello world", "A")
+    assert deltas == ["Hello ", "world"]
+    assert stats.stats["A"]["ok"] == 1
+    assert "B" not in stats.stats  # never asked
+
+
+@pytest.mark.parametrize("failure", [error("Claude Error (429): quota"), error(""), error("  \n"),
+                                     raises(IOError("connection reset"))])
+def test_failover_to_the_next_provider(failure):
+    (text, name), _, stats = ask([("A", failure), ("B", answer("Backup answer"))])
+    assert (text, name) == ("Backup answer", "B")
+    assert stats.stats["A"]["errors"] == 1
+    assert stats.stats["B"]["ok"] == 1
+
+
+def test_every_provider_failing_returns_the_last_error():
+    (text, name), _, _ = ask([("A", error("Gemini Error: A")), ("B", error("OpenAI Error: B"))])
+    assert (text, name) == ("OpenAI Error: B", "B")
+
+
+def test_every_provider_raising_raises_the_last_exception():
+    with pytest.raises(ValueError):
+        ask([("A", raises(IOError("A"))), ("B", raises(ValueError("B")))])
+
+
+def test_slow_provider_is_hedged_and_loses():
+    release = threading.Event()
+    try:
+        (text, name), deltas, _ = ask([("Slow", blocked(release, "late")), ("Fast", answer("quick"))],
+                                      hedge_after=0.05)
+    finally:
+        release.set()
+    assert (text, name) == ("quick", "Fast")
+    assert deltas == ["quick"]
+
+
+def test_no_hedging_waits_for_the_first_provider():
+    release = threading.Event()
+    timer = threading.Timer(0.3, release.set)
+    timer.start()
+    (text, name), _, stats = ask([("Slow", blocked(release, "late")), ("Fast", answer("quick"))],
+                                 hedge_after=0)
+    timer.join()
+    assert (text, name) == ("late", "Slow")
+    assert "Fast" not in stats.stats
+
+
+def test_failed_half_way_stays_failed():
+    def broken(on_delta):
+        on_delta("Half an ")
+        raise IOError("stream cut")
+    with pytest.raises(IOError):
+        ask([("A", broken), ("B", answer("A whole answer"))])
+
+
+def test_failed_half_way_with_error_text_is_not_retried():
+    def broken(on_delta):
+        on_delta("Half an ")
+        return "Claude Error: stream cut"
+    (text, name), deltas, stats = ask([("A", broken), ("B", answer("A whole answer"))])
+    assert (text, name) == ("Claude Error: stream cut", "A")
+    assert deltas == ["Half an "]
+    assert "B" not in stats.stats
+
+
+def test_user_cancelling_stops_the_answer():
+    def cancel(piece):
+        raise CancelledError()
+    router = ProviderRouter(ProviderStats(), is_error_response)
+    with pytest.raises(CancelledError):
+        router.ask([("A", answer("one", "two"))], cancel)
+
+
+def test_failing_provider_is_paused_and_ordered_last():
+    stats = ProviderStats()
+    for _ in range(2):
+        ask([("A", error("")), ("B", answer("ok"))], stats=stats)
+    assert not stats.healthy("A")
+    assert stats.order(["A", "B"]) == ["B", "A"]
+    assert "(paused)" in stats.stats_text()
+
+    stats.record_success("A", 1.0)
+    assert stats.healthy("A")
+    assert stats.order(["A", "B"]) == ["A", "B"]
+
+
+def test_prefer_fastest_and_latency_average():
+    stats = ProviderStats()
+    stats.record_success("A", 2.0)
+    stats.record_success("A", 1.0)
+    stats.record_success("B", 0.5)
+    assert stats.latency("A") == pytest.approx(0.3 * 1.0 + 0.7 * 2.0)
+    assert stats.order(["A", "B", "C"], prefer_fastest=True) == ["B", "A", "C"]
+    assert stats.order(["A", "B", "C"]) == ["A", "B", "C"]
+
+
+def test_stats_are_saved_and_loaded(tmp_path):
+    path = str(tmp_path / "stats.json")
+    stats = ProviderStats(path)
+    stats.record_success("A", 1.5)
+    stats.record_failure("B")
+    stats.save()
+    loaded = ProviderStats(path)
+    assert loaded.stats == stats.stats
+    assert loaded.stats_text() == "A 1.5s 1ok/0err  |  B - 0ok/1err"
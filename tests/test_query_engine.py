@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+import random
+
+import pytest
+
+from query_engine import (And, Clause, FakeElementStore, Not, Or, QueryError, QueryPlanner,
+                          parse, run_query, tokenize)
+
+
+def test_tokenize_quotes_operators_and_keywords():
+    assert tokenize('"Base Constraint" >= 2 and not Mark contains "a \\"b\\""') == [
+        ("str", "Base Constraint"), ("op", ">="), ("word", "2"), ("kw", "AND"), ("kw", "NOT"),
+        ("word", "Mark"), ("kw", "CONTAINS"), ("str", 'a "b"')]
+
+
+def test_parse_precedence():
+    tree = parse('Mark = A OR (Width >= 0.5 AND NOT Comments contains temp) AND Level = "L 1"')
+    assert isinstance(tree, Or)
+    assert repr(tree) == ('(Mark = "A" OR ((Width >= "0.5" AND NOT Comments contains "temp") '
+                          'AND Level = "L 1"))')
+
+
+@pytest.mark.parametrize("text", ["", "Mark =", "Mark A", "(Mark = A", "Mark = A)", "Mark = A AND", "= A"])
+def test_parse_errors(text):
+    with pytest.raises(QueryError):
+        parse(text)
+
+
+def test_numbers_are_compared_as_numbers():
+    assert Clause("Width", ">=", "0.5").test("0.656")
+    assert not Clause("Width", "<", "1").test("10")
+    assert not Clause("Width", "<", "1").test("wide")
+    assert Clause("Comments", "!=", "x").test(None)
+
+
+@pytest.mark.parametrize("op, value, stored, expected", [
+    ("=", "1", "1.0", True),
+    ("=", "1", "1.0000001", True),
+    ("=", "1", "1.001", False),
+    ("=", "0.656", "0.656167979002625", True),   # a 200 mm wall, as typed from the display
+    ("=", "0.656", "0.6565", True),
+    ("=", "0.656", "0.657", False),
+    ("=", "0.66", "0.656167979002625", True),
+    ("!=", "0.656", "0.656167979002625", False),
+    ("!=", "1", "2.0", True),
+    ("=", "A-101", "A-101", True),                # text stays text
+    ("=", "A-101", "a-101", False),
+    ("=", "1", "one", False),
+    ("!=", "1", "one", True),
+    ("=", "Level 1", "1", False),
+])
+def test_equality_compares_numbers_to_the_precision_typed(op, value, stored, expected):
+    assert Clause("Width", op, value).test(stored) is expected
+
+
+def _random_store(seed, count=300):
+    rng = random.Random(seed)
+    elements = {}
+    for element_id in range(count):
+        params = {"Mark": rng.choice(["A", "B", "C", "D"]), "Width": str(rng.choice([0.3, 0.5, 0.656, 1.0]))}
+        if rng.random() < 0.7:
+            params["Comments"] = rng.choice(["temp", "final", "Temporary wall"])
+        elements[element_id] = params
+    return FakeElementStore(elements)
+
+
+def _brute_force(node, params):
+    if isinstance(node, Clause):
+        return node.test(params.get(node.name))
+    if isinstance(node, And):
+        return all(_brute_force(c, params) for c in node.children)
+    if isinstance(node, Or):
+        return any(_brute_force(c, params) for c in node.children)
+    return not _brute_force(node.child, params)
+
+
+@pytest.mark.parametrize("text", [
+    'Mark = A',
+    'Mark != A AND Width >= 0.5',
+    'Mark = B OR (Width < 1 AND NOT Comments contains temp)',
+    'NOT (Mark = A OR Mark = B) AND Comments != final',
+    'Width > 0.5 AND Width <= 1 AND Mark = "C" AND Comments contains TEMP',
+    'Mark = Z AND Width > 0',
+    'Width = 0.66 OR Width = 1',
+    'Width != 0.5 AND Mark = A',
+])
+def test_evaluate_matches_brute_force(text):
+    store = _random_store(hash(text) % 1000)
+    tree = parse(text)
+    expected = set(i for i, params in store.elements.items() if _brute_force(tree, params))
+    assert run_query(text, store) == expected
+
+
+class CountingStore(FakeElementStore):
+    def __init__(self, elements):
+        FakeElementStore.__init__(self, elements)
+        self.value_maps = []
+        self.values_read = 0
+
+    def value_map(self, name):
+        self.value_maps.append(name)
+        return FakeElementStore.value_map(self, name)
+
+    def value(self, element_id, name):
+        self.values_read += 1
+        return FakeElementStore.value(self, element_id, name)
+
+
+def _rare_mark_store():
+    elements = dict((i, {"Mark": "common", "Comments": "temp {}".format(i)}) for i in range(1000))
+    elements[7]["Mark"] = "rare"
+    return elements
+
+
+def test_estimate_builds_no_match_sets():
+    store = CountingStore(_rare_mark_store())
+    planner = QueryPlanner(store)
+    assert planner.estimate(parse("Comments contains temp")) == 1000
+    assert planner.estimate(parse("Mark = rare")) == 1
+    assert planner.estimate(parse("Mark != rare")) == 999
+    assert planner._matches == {}
+
+
+def test_and_checks_only_the_elements_left():
+    store = CountingStore(_rare_mark_store())
+    planner = QueryPlanner(store)
+    query = parse("Comments contains temp AND Mark = rare")
+    assert planner.evaluate(query) == {7}
+    # The rare mark runs first; 'contains' then reads one element instead of matching all 1000
+    assert store.values_read == 1
+    assert ("Comments", "contains", "temp") not in planner._matches
+
+
+def test_numeric_equality_in_the_planner():
+    store = CountingStore({1: {"Width": str(0.656167979002625)}, 2: {"Width": "1.0"}, 3: {"Width": "0.5"},
+                           4: {"Mark": "A"}, 5: {"Width": "wide"}})
+    planner = QueryPlanner(store)
+    assert planner.estimate(parse("Width = 0.656")) == 1
+    assert planner.estimate(parse("Width != 1")) == 4
+    assert planner.evaluate(parse("Width = 0.656")) == {1}
+    assert planner.evaluate(parse("Width = 1")) == {2}
+    assert planner.evaluate(parse("Width != 1")) == {1, 3, 4, 5}
+    assert planner.evaluate(parse("Width = wide")) == {5}
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+
+import pytest
+
+from request_worker import CancelledError, CancelToken, Job, RequestWorker
+
+
+class Ui(object):
+    """Stands in for the WPF dispatcher: runs callbacks at once, records them."""
+
+    def __init__(self):
+        self.events = []
+        self.lock = threading.Lock()
+
+    def dispatch(self, fn):
+        with self.lock:
+            fn()
+
+    def record(self, *event):
+        self.events.append(event)
+
+
+def wait_for(condition, timeout=5.0):
+    end = time.time() + timeout
+    while not condition():
+        if time.time() > end:
+            raise AssertionError("timed out")
+        time.sleep(0.005)
+
+
+def make_job(ui, label, work):
+    return Job(label, work,
+               on_start=lambda job: ui.record("start", job.label),
+               on_done=lambda job, result: ui.record("done", job.label, result),
+               on_error=lambda job, error: ui.record("error", job.label, str(error)),
+               on_cancel=lambda job: ui.record("cancel", job.label))
+
+
+def test_cancel_token():
+    token = CancelToken()
+    token.check()
+    token.cancel()
+    assert token.cancelled
+    with pytest.raises(CancelledError):
+        token.check()
+
+
+def test_jobs_run_in_order_one_at_a_time():
+    ui = Ui()
+    worker = RequestWorker(ui.dispatch)
+    gate = threading.Event()
+    running = []
+
+    def work(job):
+        running.append(job.label)
+        assert len(running) == 1 or gate.is_set()
+        gate.wait(5)
+        return job.label.upper()
+
+    ahead = [worker.submit(make_job(ui, label, work)) for label in "abc"]
+    wait_for(lambda: running == ["a"])
+    assert ahead == [0, 1, 2] and worker.pending_count == 2
+    gate.set()
+    wait_for(lambda: len([e for e in ui.events if e[0] == "done"]) == 3)
+    assert ui.events == [("start", "a"), ("done", "a", "A"), ("start", "b"), ("done", "b", "B"),
+                         ("start", "c"), ("done", "c", "C")]
+    worker.shutdown()
+
+
+def test_queue_limit():
+    ui = Ui()
+    worker = RequestWorker(ui.dispatch, max_pending=1)
+    gate = threading.Event()
+    worker.submit(make_job(ui, "running", lambda job: gate.wait(5)))
+    wait_for(lambda: worker.busy)
+    assert worker.submit(make_job(ui, "queued", lambda job: None)) == 1
+    assert worker.submit(make_job(ui, "full", lambda job: None)) is None
+    gate.set()
+    worker.shutdown()
+
+
+def test_cancel_stops_the_running_job_at_its_next_check():
+    ui = Ui()
+    worker = RequestWorker(ui.dispatch)
+    started, finished = threading.Event(), threading.Event()
+
+    def work(job):
+        started.set()
+        try:
+            while True:
+                job.token.check()  # e.g. between streamed pieces
+                job.ui(ui.record, "piece", job.label)
+                time.sleep(0.01)
+        finally:
+            finished.set()
+
+    job = make_job(ui, "long", work)
+    worker.submit(job)
+    started.wait(5)
+    worker.cancel_current()
+    assert finished.wait(5)
+    wait_for(lambda: not worker.busy)
+    assert ("cancel", "long") in ui.events
+    assert not [e for e in ui.events if e[0] in ("done", "error")]
+    # Nothing of the job reaches the window after the cancel
+    assert ui.events[-1] == ("cancel", "long")
+    worker.shutdown()
+
+
+def test_cancelled_queued_job_never_starts():
+    ui = Ui()
+    worker = RequestWorker(ui.dispatch)
+    gate = threading.Event()
+    worker.submit(make_job(ui, "first", lambda job: gate.wait(5)))
+    queued = make_job(ui, "queued", lambda job: ui.record("ran"))
+    worker.submit(queued)
+    worker.cancel(queued)
+    gate.set()
+    wait_for(lambda: ("done", "first", True) in ui.events)
+    worker.shutdown()
+    assert ("ran",) not in ui.events and ("start", "queued") not in ui.events
+    assert ("cancel", "queued") in ui.events
+
+
+def test_errors_go_to_on_error():
+    ui = Ui()
+    worker = RequestWorker(ui.dispatch)
+
+    def work(job):
+        raise ValueError("no key")
+
+    worker.submit(make_job(ui, "bad", work))
+    wait_for(lambda: ("error", "bad", "no key") in ui.events)
+    worker.shutdown()
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+import random
+
+import pytest
+
+from spatial_index import (UniformGrid, boxes_touch, brute_force_pairs, candidate_pairs, suggest_cell_size,
+                           synthetic_floor, MAX_CELLS_PER_AXIS)
+
+
+def _pairs(found):
+    """Pairs as sets of (group, key), so the order within a pair does not matter."""
+    found = list(found)
+    pairs = set(frozenset([(a, b), (c, d)]) for a, b, c, d in found)
+    assert len(pairs) == len(found)  # each pair only once
+    return pairs
+
+
+def _random_groups(rng, count=150, groups=3, world=40.0):
+    result, key = [[] for _ in range(groups)], 0
+    for _ in range(count):
+        size = rng.choice([0.2, 1.0, 3.0, 10.0])
+        x, y, z = rng.uniform(0, world), rng.uniform(0, world), rng.uniform(0, 10.0)
+        key += 1
+        result[rng.randrange(groups)].append(
+            (key, (x, y, z, x + rng.uniform(0, size), y + rng.uniform(0, size), z + rng.uniform(0, size))))
+    return result
+
+
+def test_boxes_touch():
+    a = (0, 0, 0, 1, 1, 1)
+    assert boxes_touch(a, (0.5, 0.5, 0.5, 2, 2, 2))
+    assert boxes_touch(a, (1, 0, 0, 2, 1, 1))            # faces touching
+    assert not boxes_touch(a, (1.1, 0, 0, 2, 1, 1))
+    assert boxes_touch(a, (1.1, 0, 0, 2, 1, 1), tolerance=0.2)
+    assert not boxes_touch(a, (0, 0, 2, 1, 1, 3), tolerance=0.5)
+
+
+def test_suggest_cell_size_is_the_median_element():
+    boxes = [(0, 0, 0, 1, 1, 1), (0, 0, 0, 2, 0.5, 0.5), (0, 0, 0, 0.1, 9, 0.1)]
+    assert suggest_cell_size(boxes) == 2
+    assert suggest_cell_size([]) == 1.0
+    assert suggest_cell_size([(0, 0, 0, 0, 0, 0)]) > 0
+
+
+@pytest.mark.parametrize("columns", [2, 5, 8])
+def test_grid_finds_the_brute_force_pairs_on_a_floor(columns):
+    groups = synthetic_floor(columns)
+    assert _pairs(candidate_pairs(groups)) == _pairs(brute_force_pairs(groups))
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("tolerance", [0.0, 0.5])
+@pytest.mark.parametrize("cell_size", [None, 1.0, 50.0])
+def test_grid_finds_the_brute_force_pairs_on_random_boxes(seed, tolerance, cell_size):
+    groups = _random_groups(random.Random(seed))
+    found = _pairs(candidate_pairs(groups, tolerance, cell_size))
+    assert found == _pairs(brute_force_pairs(groups, tolerance))
+
+
+def test_oversized_boxes_are_checked_against_everything():
+    slab = (0.0, 0.0, -1.0, 500.0, 500.0, 0.0)
+    groups = [[(1, slab), (2, (-10.0, -10.0, -1.0, 510.0, 510.0, 0.5))],
+              [(3, (10.0, 10.0, 0.0, 10.5, 10.5, 3.0)), (4, (400.0, 400.0, 0.0, 400.5, 400.5, 3.0)),
+               (5, (10.0, 10.0, 5.0, 10.5, 10.5, 6.0))]]
+    grid = UniformGrid(1.0)
+    grid.insert((0, 0, 1, slab), slab)
+    assert grid.oversized and 500 >= MAX_CELLS_PER_AXIS
+    found = _pairs(candidate_pairs(groups, cell_size=1.0))
+    assert found == _pairs(brute_force_pairs(groups))
+    assert frozenset([(0, 1), (0, 2)]) in found
+    assert frozenset([(0, 1), (1, 4)]) in found and frozenset([(0, 1), (1, 5)]) not in found
+
+
+def test_the_higher_priority_group_comes_first():
+    column = (0.0, 0.0, 0.0, 1.0, 1.0, 3.0)
+    wall = (0.5, 0.0, 0.0, 5.0, 0.2, 3.0)
+    assert list(candidate_pairs([[(7, column)], [(8, wall)]])) == [(0, 7, 1, 8)]
+    assert list(candidate_pairs([[(8, wall)], [(7, column)]])) == [(0, 8, 1, 7)]
+
+
+def test_no_boxes():
+    assert list(candidate_pairs([[], []])) == []
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+import json
+import threading
+
+import pytest
+
+import ai_providers
+from fake_ai_server import make_server
+from http_client import HttpClient, PythonTransport
+from streaming import (NDJSON, SSE, StreamError, claude_delta, collect_stream, gemini_delta, iter_ndjson,
+                       iter_sse_data, ollama_delta, openai_delta)
+
+
+def sse(*events):
+    lines = []
+    for event in events:
+        lines.append("data: " + (event if isinstance(event, str) else json.dumps(event)))
+        lines.append("")
+    return lines
+
+
+def test_sse_events_split_over_lines_comments_and_crlf():
+    lines = [": ping", "event: message", "data: {\"a\":", "data: 1}\r\n", "\r\n", "data:2", "", "data: 3"]
+    assert list(iter_sse_data(lines)) == ['{"a":\n1}', "2", "3"]
+
+
+def test_sse_stops_at_done():
+    assert list(iter_sse_data(sse("1", "[DONE]", "2"))) == ["1"]
+    assert list(iter_sse_data(["data: [DONE]"])) == []
+
+
+def test_ndjson_skips_blank_lines():
+    assert list(iter_ndjson(['{"a": 1}\n', "  ", '{"b": 2}'])) == [{"a": 1}, {"b": 2}]
+
+
+@pytest.mark.parametrize("fmt, extract, lines", [
+    (SSE, gemini_delta, sse(*({"candidates": [{"content": {"parts": [{"text": w}]}}]} for w in ["Open ", "the view"]))),
+    (SSE, openai_delta, sse({"choices": [{"delta": {"role": "assistant"}}]},
+                            *({"choices": [{"delta": {"content": w}}]} for w in ["Open ", "the view"])) + sse("[DONE]")),
+    (SSE, claude_delta, sse({"type": "message_start"},
+                            *({"type": "content_block_delta", "delta": {"text": w}} for w in ["Open ", "the view"]))
+     + sse({"type": "message_stop"})),
+    (NDJSON, ollama_delta, [json.dumps({"message": {"content": w}, "done": False}) for w in ["Open ", "the view"]]
+     + [json.dumps({"done": True})]),
+])
+def test_each_provider_stream(fmt, extract, lines):
+    pieces = []
+    assert collect_stream(iter(lines), fmt, extract, pieces.append) == "Open the view"
+    assert pieces == ["Open ", "the view"]
+
+
+@pytest.mark.parametrize("extract, event", [
+    (gemini_delta, {"error": {"message": "quota"}}),
+    (openai_delta, {"error": {"message": "quota"}}),
+    (claude_delta, {"type": "error", "error": {"message": "quota"}}),
+    (ollama_delta, {"error": "quota"}),
+])
+def test_errors_in_the_middle_of_a_stream(extract, event):
+    with pytest.raises(StreamError):
+        collect_stream(iter(sse(event)), SSE, extract)
+
+
+def test_stopping_early_closes_the_stream():
+    closed = []
+
+    def lines():
+        try:
+            for line in sse(*({"choices": [{"delta": {"content": str(i)}}]} for i in range(10))):
+                yield line
+        finally:
+            closed.append(True)
+
+    def stop(piece):
+        if piece == "2":
+            raise KeyboardInterrupt()
+
+    with pytest.raises(KeyboardInterrupt):
+        collect_stream(lines(), SSE, openai_delta, stop)
+    assert closed == [True]
+
+
+@pytest.fixture
+def fake_server(monkeypatch):
+    server = make_server(port=0)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    url = "http://127.0.0.1:{}".format(server.server_address[1])
+    monkeypatch.setattr(ai_providers, "http", HttpClient(PythonTransport()))
+    monkeypatch.setattr(ai_providers, "GEMINI_BASE_URL", url)
+    monkeypatch.setattr(ai_providers, "OPENAI_URL", url + "/v1/chat/completions")
+    monkeypatch.setattr(ai_providers, "CLAUDE_URL", url + "/v1/messages")
+    yield url
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.parametrize("provider_idx, name", [(0, "Gemini"), (1, "Claude"), (2, "OpenAI"), (3, "Ollama")])
+def test_streamed_answers_from_the_fake_server(fake_server, provider_idx, name):
+    key = fake_server if provider_idx == 3 else "key"  # Local AI: the key field is the URL
+    pieces = []
+    answer = ai_providers.call_provider(provider_idx, key, "model", "system", "How to add a level?", pieces.append)
+    assert answer.startswith("Fake {} answer. You asked: 'How to add a level?'".format(name))
+    assert len(pieces) > 5 and "".join(pieces) == answer
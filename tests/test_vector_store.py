@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+import os
+import random
+
+import pytest
+
+import vector_store
+from vector_store import save_store, load_store, has_store, quant_path, VectorStore, QuantizedVectorStore
+
+
+def _items():
+    return [
+        {"title": "Walls", "text": "wall", "vector": [1.0, 0.0, 0.0]},
+        {"title": "Floors", "text": "floor", "vector": [0.0, 1.0, 0.0]},
+        {"title": "Roofs", "text": "roof", "vector": [0.0, 0.2, 1.0]},
+    ]
+
+
+def test_save_and_search(tmp_path):
+    kb_path = str(tmp_path / "kb.json")
+    save_store(kb_path, _items())
+    assert has_store(kb_path)
+    store = load_store(kb_path)
+    assert len(store) == 3
+    score, item = store.search([0.1, 0.0, 1.0], top_k=1)[0]
+    assert item["title"] == "Roofs" and "vector" not in item
+
+
+def test_store_is_loaded_once_per_session(tmp_path, monkeypatch):
+    kb_path = str(tmp_path / "kb.json")
+    save_store(kb_path, _items())
+    first = load_store(kb_path)
+
+    loads = []
+    monkeypatch.setattr(vector_store.VectorStore, "load", classmethod(lambda cls, path: loads.append(path)))
+    assert load_store(kb_path) is first
+    assert loads == []
+
+
+def test_session_dict_is_shared():
+    assert vector_store.session_dict("test_dict") is vector_store.session_dict("test_dict")
+
+
+def test_vectors_are_only_read_from_the_binary_store(tmp_path):
+    kb_path = str(tmp_path / "kb.json")
+    with open(kb_path, "w") as f:
+        f.write('[{"title": "Walls", "text": "wall", "vector": [1.0, 0.0]}]')
+    with pytest.raises(IOError):
+        load_store(kb_path)
+
+
+def _random_items(count=300, dim=32, seed=7):
+    rng = random.Random(seed)
+    return [{"title": "T{}".format(i), "text": "t", "vector": [rng.gauss(0, 1) for _ in range(dim)]}
+            for i in range(count)]
+
+
+def _queries(count=20, dim=32, seed=11):
+    rng = random.Random(seed)
+    return [[rng.gauss(0, 1) for _ in range(dim)] for _ in range(count)]
+
+
+@pytest.mark.parametrize("mmap", [True, False])
+def test_int8_ranking_matches_exact_float32(tmp_path, monkeypatch, mmap):
+    if mmap and not vector_store.can_mmap():
+        pytest.skip("memory-mapping needs CPython 3 on a little-endian machine")
+    monkeypatch.setattr(vector_store, "can_mmap", lambda: mmap)
+    items = _random_items()
+    kb_path = str(tmp_path / "kb.json")
+    save_store(kb_path, items, quantization="int8")
+    store = VectorStore.load(kb_path)
+    assert isinstance(store, QuantizedVectorStore)
+    assert (store._full_rows is None) == mmap  # mmap: float32 matrix, else rows read on demand
+
+    exact = VectorStore.from_items(items)
+    for query in _queries():
+        found = store.search_rows(query, top_k=5)
+        expected = exact.search_rows(query, top_k=5)
+        assert [row for _, row in found] == [row for _, row in expected]
+        # Shortlisted rows are re-scored in full precision
+        assert [score for score, _ in found] == pytest.approx([score for score, _ in expected], abs=1e-6)
+    assert list(store.row(42)) == pytest.approx(list(exact.row(42)))
+
+
+def test_int8_scores_are_close_to_exact(tmp_path):
+    items = _random_items(count=50)
+    kb_path = str(tmp_path / "kb.json")
+    save_store(kb_path, items, quantization="int8")
+    store = VectorStore.load(kb_path)
+    exact = VectorStore.from_items(items)
+    query = vector_store.normalize(_queries(1)[0])
+    rows = list(range(50))
+    assert store.approx_scores(query, rows) == pytest.approx(exact.scores(query, rows), abs=0.02)
+
+
+def test_int8_copy_is_written_next_to_the_float32_file(tmp_path):
+    kb_path = str(tmp_path / "kb.json")
+    vec_path, _ = save_store(kb_path, _random_items(count=100), quantization="int8")
+    q_size, vec_size = os.path.getsize(quant_path(kb_path)), os.path.getsize(vec_path)
+    assert vec_size == 100 * 32 * 4
+    assert q_size == 100 * 4 + 100 * 32  # one float32 scale + one byte per number
+    assert (q_size + vec_size) / float(vec_size) == pytest.approx(1.28, abs=0.01)
+
+    save_store(kb_path, _random_items(count=100))  # rebuilt without: the copy is removed
+    assert not os.path.exists(quant_path(kb_path))
+    assert type(VectorStore.load(kb_path)) is VectorStore